@@ -0,0 +1,52 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Run Amaping once and time each of its stages
+# File    : BenchRun.py
+# Date    : Oct. 18th, 2026
+
+# Usage: python BenchRun.py RESULT_FILE AMAPING_ARGS...
+# Writes {"stages": {stage: seconds}, "calls": {stage: count}, "counters", "totalS", "peakMemoryMb", "error"} to RESULT_FILE
+# Stages are the timers of Logger, see Logger.Timer
+
+import os
+import sys
+import json
+import time
+import traceback
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import Logger
+import amaping
+
+if __name__ == '__main__':
+    resultFilename = sys.argv[1]
+    sys.argv = ["amaping.py"] + sys.argv[2:]
+
+    Logger.init(amaping.APP_NAME)
+    startTime = time.perf_counter()
+    error = None
+
+    # Same as amaping.py entry point
+    try:
+        app = amaping.Amaping()
+        amaping.geoLocator = app.create_geo_locator()
+        app.run()
+    except Exception as e:
+        error = str(e)
+        Logger.error("Exit with errors: " + error)
+        Logger.debug(traceback.format_exc())
+
+    metrics = Logger.getMetrics()
+    result = {
+        "stages": {stage: timer["totalS"] for stage, timer in metrics["timers"].items()},
+        "calls": {stage: timer["calls"] for stage, timer in metrics["timers"].items()},
+        "counters": metrics["counters"],
+        "totalS": round(time.perf_counter() - startTime, 4),
+        "peakMemoryMb": metrics["peakMemoryMb"],
+        "error": error
+    }
+    with open(resultFilename, "w") as resultFile:
+        json.dump(result, resultFile, indent=2)
+
+    sys.exit(1 if (error != None) else 0)
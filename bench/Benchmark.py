@@ -0,0 +1,232 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Benchmark Amaping on synthetic members against local stub servers
+# File    : Benchmark.py
+# Date    : Oct. 18th, 2026
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import DataGenerator                            # Synthetic CSV and ODS files
+from StubServers import StubGeocoder, StubTileServer
+
+# Constants
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGE_ORDER = ["ingest", "geocode", "distanceFilter", "report", "odsJoin", "markers", "umap", "render", "paint", "write"]
+
+# Parse "1k", "10k", "2500"...
+def _member_count(value):
+    try:
+        if (value.lower().endswith("k")):
+            return int(float(value[:-1]) * 1000)
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected a member count like 10k but got \"{0}\"".format(value))
+
+def get_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class Benchmark:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    DEFAULT_SIZES = "1k,10k"                     # 100k takes a few minutes
+    DEFAULT_WORK_DIR = "./bench_data"
+    DEFAULT_OUTPUT = "./bench_results.json"
+    DEFAULT_LATENCY_S = 0.005
+    PASSES = ("cold", "warm")                    # Warm runs find their geocodes, tiles and manifest in cache
+
+    # =============
+    # Members
+    # =============
+
+    def __init__(self):
+        parser = argparse.ArgumentParser(description="Time each stage of Amaping on synthetic members")
+        parser.add_argument('--sizes', default=self.DEFAULT_SIZES, dest="sizes", help='specify member counts to run (Ex: 1k,10k,100k)', type=str)
+        parser.add_argument('--seed', default=1, dest="seed", help='specify the seed of generated data', type=int)
+        parser.add_argument('--passes', default=",".join(self.PASSES), dest="passes", help='specify runs for each size, cold (empty caches) and/or warm', type=str)
+        parser.add_argument('--workDir', default=self.DEFAULT_WORK_DIR, dest="workDir", help='specify where data and run files are kept', type=str)
+        parser.add_argument('-o', '--output', default=self.DEFAULT_OUTPUT, dest="output", help='specify the JSON result file', type=str)
+        parser.add_argument('--compare', default="", dest="compare", help='specify a previous JSON result file to compare with', type=str)
+        parser.add_argument('--font', default="Arial.ttf", dest="font", help='specify the font file copied next to runs', type=str)
+        parser.add_argument('--geoLatency', default=self.DEFAULT_LATENCY_S, dest="geoLatency", help='specify the stub geocoder latency in seconds', type=float)
+        parser.add_argument('--tileLatency', default=self.DEFAULT_LATENCY_S, dest="tileLatency", help='specify the stub tile server latency in seconds', type=float)
+        parser.add_argument('-m', '--mapSize', default="4080x4080", dest="mapSize", help='specify the PNG map size', type=str)
+        parser.add_argument('-z', '--zoomLevel', default=14, dest="zoomLevel", help='specify the PNG map zoom level', type=int)
+        parser.add_argument('--ban', default=False, dest="ban", help='geocode from a BAN index of the generated streets, the stub geocoder only gets unmatched addresses', action='store_true')
+        parser.add_argument('--batch', default=False, dest="batch", help='geocode by CSV uploads to the stub geocoder before asking addresses one by one', action='store_true')
+        parser.add_argument('--amapingArgs', default="", dest="amapingArgs", help='specify more Amaping arguments (Ex: "--strips --clusterRadius 40")', type=str)
+        self.args = vars(parser.parse_args())
+
+        self.sizes = [_member_count(value) for value in self.args["sizes"].split(",") if value != ""]
+        self.passes = [value for value in self.args["passes"].split(",") if value != ""]
+        for passName in self.passes:
+            if (not passName in self.PASSES):
+                raise RuntimeError("Unknown pass \"{0}\", use {1}".format(passName, " or ".join(self.PASSES)))
+
+        if (not os.path.isfile(self.args["font"])):
+            raise RuntimeError("Font file \"{0}\" not found, give one with --font".format(self.args["font"]))
+
+    # Give CSV and ODS paths of a member count, generated once
+    def get_data_files(self, memberCount):
+        baseName = os.path.join(self.args["workDir"], "members_{0}_{1}".format(memberCount, self.args["seed"]))
+        csvPath = baseName + ".csv"
+        odsPath = baseName + ".ods"
+
+        if (not os.path.isfile(csvPath)) or (not os.path.isfile(odsPath)):
+            print("Generating {0} members...".format(memberCount))
+            memberList = DataGenerator.generate_members(memberCount, self.args["seed"])
+            DataGenerator.write_csv(memberList, csvPath)
+            DataGenerator.write_ods(memberList, odsPath, self.args["seed"])
+
+        return (os.path.abspath(csvPath), os.path.abspath(odsPath))
+
+    # Give the BAN index directory of generated streets, built once
+    def get_ban_index(self):
+        csvPath = os.path.join(self.args["workDir"], "ban.csv")
+        indexDir = os.path.join(self.args["workDir"], "ban")
+
+        if (not os.path.isfile(os.path.join(indexDir, "meta.json"))):
+            print("Building BAN index...")
+            DataGenerator.write_ban_csv(csvPath)
+            subprocess.check_call([sys.executable, os.path.join(BENCH_DIR, "..", "src", "BanGeocoder.py"), "--csv", csvPath, "--index", indexDir])
+
+        return os.path.abspath(indexDir)
+
+    # Run Amaping in its own process so peak memory is its own
+    def run_once(self, memberCount, passName, geocoder, tileServer):
+        csvPath, odsPath = self.get_data_files(memberCount)
+        # Amaping runs in runDir, paths given to it must not depend on our working directory
+        runDir = os.path.abspath(os.path.join(self.args["workDir"], "run_{0}".format(memberCount)))
+
+        # Cold runs start without any cache
+        if (passName == "cold") and (os.path.isdir(runDir)):
+            shutil.rmtree(runDir)
+        os.makedirs(os.path.join(runDir, "output"), exist_ok=True)
+        shutil.copyfile(self.args["font"], os.path.join(runDir, "Arial.ttf"))
+
+        # A job file, a map asked by -p would be opened in a preview window
+        jobPath = os.path.join(runDir, "job.json")
+        with open(jobPath, "w") as jobFile:
+            json.dump({"outputs": [{"format": "png", "filename": "./output/map.png"}]}, jobFile)
+
+        resultPath = os.path.join(runDir, "result.json")
+        command = [
+            sys.executable, os.path.join(BENCH_DIR, "BenchRun.py"), resultPath,
+            "-c", csvPath,
+            "-d", odsPath,
+            "--job", jobPath,
+            "-u",
+            "-m", self.args["mapSize"],
+            "-z", str(self.args["zoomLevel"]),
+            "--geocoderUrl", geocoder.get_url(),
+            "--geoRate", "10000",
+            "--geoWorkers", "16",
+            "--tileUrl", tileServer.get_template()
+        ] + self.args["amapingArgs"].split()
+        if (self.args["ban"]):
+            command += ["--banIndex", self.get_ban_index()]
+        if (self.args["batch"]):
+            command += ["--batchGeocoderUrl", geocoder.get_url() + "/search/csv/"]
+
+        geoRequestStart = geocoder.requestCount
+        tileRequestStart = tileServer.requestCount
+        print("Running {0} members ({1})...".format(memberCount, passName))
+        with open(os.path.join(runDir, "amaping_{0}.log".format(passName)), "w") as logFile:
+            exitCode = subprocess.call(command, cwd=runDir, stdout=logFile, stderr=subprocess.STDOUT)
+
+        result = {}
+        if (os.path.isfile(resultPath)):
+            with open(resultPath, "r") as resultFile:
+                result = json.load(resultFile)
+            os.remove(resultPath)
+
+        result.update({
+            "members": memberCount,
+            "pass": passName,
+            "exitCode": exitCode,
+            "geocodeRequests": geocoder.requestCount - geoRequestStart,
+            "tileRequests": tileServer.requestCount - tileRequestStart
+        })
+        return result
+
+    def run(self):
+        os.makedirs(self.args["workDir"], exist_ok=True)
+        geocoder = StubGeocoder(self.args["geoLatency"])
+        tileServer = StubTileServer(self.args["tileLatency"])
+        geocoder.start()
+        tileServer.start()
+
+        runList = []
+        try:
+            for memberCount in self.sizes:
+                for passName in self.passes:
+                    runList.append(self.run_once(memberCount, passName, geocoder, tileServer))
+                    print_run(runList[-1])
+        finally:
+            geocoder.stop()
+            tileServer.stop()
+
+        results = {
+            "commit": get_commit(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpuCount": os.cpu_count(),
+            "settings": {key: self.args[key] for key in ("seed", "geoLatency", "tileLatency", "mapSize", "zoomLevel", "ban", "batch", "amapingArgs")},
+            "runs": runList
+        }
+        with open(self.args["output"], "w") as outputFile:
+            json.dump(results, outputFile, indent=2)
+        print("Results written to {0}".format(self.args["output"]))
+
+        if (self.args["compare"] != ""):
+            with open(self.args["compare"], "r") as compareFile:
+                print_comparison(json.load(compareFile), results)
+
+def print_run(run):
+    stages = run.get("stages", {})
+    print("  {0}".format(", ".join("{0} {1:.2f}s".format(stage, stages[stage]) for stage in STAGE_ORDER if stage in stages)))
+    print("  total {0:.2f}s, peak memory {1} MB, {2} geocode request(s), {3} tile request(s){4}".format(
+        run.get("totalS", 0),
+        "?" if (run.get("peakMemoryMb") == None) else int(run["peakMemoryMb"]),
+        run["geocodeRequests"],
+        run["tileRequests"],
+        "" if (run["exitCode"] == 0) else ", FAILED: {0}".format(run.get("error"))
+    ))
+
+# Print new/old time ratio of each stage for runs found in both result files
+def print_comparison(oldResults, newResults):
+    print("Compared with {0} (new/old):".format(oldResults.get("commit")))
+    oldRuns = {(run["members"], run["pass"]): run for run in oldResults["runs"]}
+
+    for run in newResults["runs"]:
+        oldRun = oldRuns.get((run["members"], run["pass"]))
+        if (oldRun == None):
+            continue
+
+        ratios = []
+        for stage in STAGE_ORDER + ["totalS", "peakMemoryMb"]:
+            newValue = run.get("stages", {}).get(stage) if (stage in STAGE_ORDER) else run.get(stage)
+            oldValue = oldRun.get("stages", {}).get(stage) if (stage in STAGE_ORDER) else oldRun.get(stage)
+            if (newValue != None) and (oldValue):
+                ratios.append("{0} x{1:.2f}".format(stage, newValue / oldValue))
+
+        print("  {0} members ({1}): {2}".format(run["members"], run["pass"], ", ".join(ratios)))
+
+if __name__ == '__main__':
+    try:
+        Benchmark().run()
+    except RuntimeError as e:
+        print("Error: " + str(e))
+        sys.exit(1)
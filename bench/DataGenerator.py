@@ -0,0 +1,221 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Generate synthetic member exports (CSV and ODS) for benchmarks
+# File    : DataGenerator.py
+# Date    : Oct. 18th, 2026
+
+import csv
+import zlib
+import random
+import unicodedata
+import pandas                                   # Write ODS files
+
+# Columns of the member CSV export
+CSV_COLUMNS = [
+    "Adresse 1", "Adresse 2", "Ville", "Email", "Email partenaire", "Prénom", "Prénom partenaire",
+    "id", "Nom", "Nom partenaire", "Téléphone", "Téléphone partenaire", "Code postal"
+]
+
+# (street, city, postal code) around the AMAP
+STREETS = [
+    ("rue des Lilas", "Talence", "33400"), ("avenue Sainte-Marie", "Talence", "33400"),
+    ("cours de la Libération", "Talence", "33400"), ("rue Roustaing", "Talence", "33400"),
+    ("avenue de Thouars", "Talence", "33400"), ("rue Lamartine", "Talence", "33400"),
+    ("cours Gambetta", "Talence", "33400"), ("rue Peydavant", "Talence", "33400"),
+    ("avenue Pasteur", "Pessac", "33600"), ("rue de l'Horloge", "Pessac", "33600"),
+    ("avenue Jean Jaurès", "Pessac", "33600"), ("rue Chateaubriand", "Pessac", "33600"),
+    ("cours de l'Argonne", "Bordeaux", "33000"), ("rue de Pessac", "Bordeaux", "33000"),
+    ("rue Sainte-Catherine", "Bordeaux", "33000"), ("cours de la Marne", "Bordeaux", "33800"),
+    ("rue de Bègles", "Bordeaux", "33800"), ("avenue Thiers", "Bordeaux", "33100"),
+    ("rue du Tondu", "Bordeaux", "33000"), ("rue Judaïque", "Bordeaux", "33000"),
+    ("avenue de la Libération", "Gradignan", "33170"), ("rue du Moulin", "Villenave-d'Ornon", "33140"),
+    ("rue Carnot", "Bègles", "33130"), ("avenue du Maréchal Leclerc", "Bègles", "33130"),
+]
+
+# Columns of a Base Adresse Nationale CSV extract
+BAN_COLUMNS = [
+    "id", "id_fantoir", "numero", "rep", "nom_voie", "code_postal", "code_insee", "nom_commune",
+    "code_insee_ancienne_commune", "nom_ancienne_commune", "x", "y", "lon", "lat", "type_position",
+    "alias", "nom_ld", "libelle_acheminement", "nom_afnor", "source_position", "source_nom_voie",
+    "certification_commune", "cad_parcelles"
+]
+BAN_CENTER = (44.805, -0.59)                     # (lat, lon) around the AMAP, as the stub geocoder
+BAN_SPREAD_DEG = 0.08
+BAN_NUMBER_COUNT = 400
+
+# Members who moved far away, the stub geocoder places these cities far from the AMAP
+FAR_STREETS = [("rue de la République", "Lyon", "69002"), ("rue de Siam", "Brest", "29200")]
+
+# Addresses the stub geocoder can't find
+UNKNOWN_STREET = ("lieu-dit Inconnu", "Talence", "33400")
+
+# Syllables of family names, three of them give enough names for 100k members
+NAME_SYLLABLES = [
+    "Ber", "Dou", "Mar", "Lef", "Gal", "Rou", "Mo", "Du", "Lau", "Fau", "Cha", "Bou", "Gué", "Pé",
+    "Thi", "Ro", "La", "Mé", "Vi", "Cor", "Fon", "Bé", "Ri", "Sau", "Tes", "Jol", "Pin", "Dé"
+]
+NAME_ENDINGS = ["nard", "pont", "tin", "reau", "lier", "det", "ssier", "chon", "vier", "ault", "rin", "zac", "lès", "ry"]
+NAME_PARTICLES = ["Le ", "De ", "Saint-", "La "]
+FIRSTNAMES = [
+    "Jean", "Marie", "Hélène", "Pierre", "Zoé", "Noé", "Léa", "Louis", "Inès", "Hugo", "Chloé",
+    "Jérôme", "Anaïs", "Théo", "Manon", "Gaëlle", "Loïc", "Sophie", "Camille", "Élodie"
+]
+ROLES = ["Référent légumes", "Trésorier", "Bénévole", "Référent pain"]
+
+# Share of members with each particularity
+DUPLICATE_ADDRESS_RATE = 0.15                    # Same building or same household
+ADDRESS_VARIANT_RATE = 0.3                       # Duplicate written differently
+PARTNER_RATE = 0.4
+MISSING_ADDRESS_RATE = 0.01
+TWO_ADDRESSES_RATE = 0.02
+UNKNOWN_ADDRESS_RATE = 0.01
+FAR_ADDRESS_RATE = 0.02
+ODS_MISSING_RATE = 0.05                          # Members not in the ODS file
+ODS_UNKNOWN_RATE = 0.01                          # ODS rows matching nobody
+
+def remove_accents(text):
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+# Same address written by someone else
+def address_variant(rand, address):
+    variants = [
+        address.upper(),
+        address.replace("rue", "Rue").replace("avenue", "av."),
+        remove_accents(address),
+        "  " + address.replace(" ", "  ") + " "
+    ]
+    return rand.choice(variants)
+
+# Same name written by someone else, NameIndex must still find it
+def name_variant(rand, name):
+    variants = [name, name.upper(), remove_accents(name), name.replace(" ", "").replace("-", " "), name.lower()]
+    return rand.choice(variants)
+
+def random_name(rand):
+    name = rand.choice(NAME_SYLLABLES) + rand.choice(NAME_SYLLABLES).lower() + rand.choice(NAME_ENDINGS)
+    if (rand.random() < 0.1):
+        name = rand.choice(NAME_PARTICLES) + name
+    if (rand.random() < 0.05):
+        name = name + "-" + rand.choice(NAME_SYLLABLES) + rand.choice(NAME_ENDINGS)
+    return name
+
+def random_phone(rand):
+    return "0{0} {1:02d} {2:02d} {3:02d} {4:02d}".format(rand.choice([5, 6, 7]), *[rand.randrange(100) for i in range(4)])
+
+def random_email(rand, firstname, name):
+    return "{0}.{1}@exemple.net".format(remove_accents(firstname).lower(), remove_accents(name).lower().replace(" ", ""))
+
+# Give a list of member dicts with CSV columns plus the basket type and role used for the ODS file
+def generate_members(memberCount, seed=1):
+    rand = random.Random(seed)
+    addressList = []
+    memberList = []
+
+    for i in range(memberCount):
+        # Address, often shared with another member
+        draw = rand.random()
+        if (draw < MISSING_ADDRESS_RATE):
+            address, city, postalCode = ("", rand.choice(STREETS)[1], "")
+        elif (draw < MISSING_ADDRESS_RATE + UNKNOWN_ADDRESS_RATE):
+            address, city, postalCode = ("{0} {1}".format(rand.randrange(1, 300), UNKNOWN_STREET[0]), UNKNOWN_STREET[1], UNKNOWN_STREET[2])
+        elif (draw < MISSING_ADDRESS_RATE + UNKNOWN_ADDRESS_RATE + FAR_ADDRESS_RATE):
+            street, city, postalCode = rand.choice(FAR_STREETS)
+            address = "{0} {1}".format(rand.randrange(1, 200), street)
+        elif (len(addressList) > 0) and (draw < MISSING_ADDRESS_RATE + UNKNOWN_ADDRESS_RATE + FAR_ADDRESS_RATE + DUPLICATE_ADDRESS_RATE):
+            address, city, postalCode = rand.choice(addressList)
+            if (rand.random() < ADDRESS_VARIANT_RATE):
+                address = address_variant(rand, address)
+        else:
+            street, city, postalCode = rand.choice(STREETS)
+            address = "{0} {1}".format(rand.randrange(1, 400), street)
+            addressList.append((address, city, postalCode))
+
+        name = random_name(rand)
+        firstname = rand.choice(FIRSTNAMES)
+        partnerName = partnerFirstname = partnerEmail = partnerPhone = ""
+        if (rand.random() < PARTNER_RATE):
+            partnerName = name if (rand.random() < 0.5) else random_name(rand)
+            partnerFirstname = rand.choice(FIRSTNAMES)
+            partnerEmail = random_email(rand, partnerFirstname, partnerName)
+            partnerPhone = random_phone(rand)
+
+        address2 = ""
+        if (address != "") and (rand.random() < TWO_ADDRESSES_RATE):
+            street, city2, postalCode2 = rand.choice(STREETS)
+            address2 = "{0} {1}".format(rand.randrange(1, 400), street)
+
+        memberList.append({
+            "Adresse 1": address,
+            "Adresse 2": address2,
+            "Ville": city,
+            "Email": random_email(rand, firstname, name),
+            "Email partenaire": partnerEmail,
+            "Prénom": firstname,
+            "Prénom partenaire": partnerFirstname,
+            "id": str(i + 1),
+            "Nom": name,
+            "Nom partenaire": partnerName,
+            "Téléphone": random_phone(rand),
+            "Téléphone partenaire": partnerPhone,
+            "Code postal": postalCode,
+            "basketType": rand.choice(["hebdo", "hebdo", "pair", "impair", ""]),
+            "role": rand.choice(ROLES) if (rand.random() < 0.05) else "",
+            "onMap": rand.choice(["oui"] * 8 + ["NON", ""])
+        })
+
+    return memberList
+
+def write_csv(memberList, path):
+    with open(path, "w", newline="", encoding="utf-8") as csvFile:
+        writer = csv.writer(csvFile, delimiter=";", quoting=csv.QUOTE_ALL)
+        writer.writerow(CSV_COLUMNS)
+        for member in memberList:
+            writer.writerow([member[column] for column in CSV_COLUMNS])
+
+# BAN extract of STREETS, far and unknown streets are left to the geocoder
+# Each street is a straight line placed with a hash of its name, stable between runs
+def write_ban_csv(path):
+    with open(path, "w", newline="", encoding="utf-8") as csvFile:
+        writer = csv.DictWriter(csvFile, fieldnames=BAN_COLUMNS, delimiter=";", restval="")
+        writer.writeheader()
+        for street, city, postalCode in STREETS:
+            hashValue = zlib.crc32((street + city).encode("utf-8"))
+            lat = BAN_CENTER[0] + ((hashValue & 0xFFFF) / 0xFFFF - 0.5) * BAN_SPREAD_DEG
+            lon = BAN_CENTER[1] + (((hashValue >> 16) & 0xFFFF) / 0xFFFF - 0.5) * BAN_SPREAD_DEG * 1.4
+            for number in range(1, BAN_NUMBER_COUNT + 1):
+                for rep in ([""] if (number % 10 != 0) else ["", "bis"]):
+                    writer.writerow({
+                        "numero": number,
+                        "rep": rep,
+                        "nom_voie": street[0].upper() + street[1:],
+                        "code_postal": postalCode,
+                        "nom_commune": city,
+                        "lon": "{0:.6f}".format(lon + number * 0.00002),
+                        "lat": "{0:.6f}".format(lat + number * 0.00001)
+                    })
+
+# ODS file with COORDONNEES and ENGAGEMENTS sheets, names are written with variants
+def write_ods(memberList, path, seed=1):
+    rand = random.Random(seed + 1)
+    coordinates = []
+    engagements = []
+
+    for member in memberList:
+        if (rand.random() < ODS_MISSING_RATE):
+            continue
+
+        names = [name_variant(rand, member["Nom"]), name_variant(rand, member["Nom partenaire"])]
+        # Couples are sometimes registered under the partner name
+        if (names[1] != "") and (rand.random() < 0.2):
+            names.reverse()
+
+        coordinates.append({"nom": names[0], "nom conjoint": names[1], "Rôles": member["role"], "Framacarte": member["onMap"]})
+        engagements.append({"nom": names[0], "nom conjoint": names[1], "Légumes": member["basketType"]})
+
+    for i in range(int(len(memberList) * ODS_UNKNOWN_RATE)):
+        coordinates.append({"nom": "Inconnu{0}".format(i), "nom conjoint": "", "Rôles": "", "Framacarte": ""})
+
+    with pandas.ExcelWriter(path, engine="odf") as writer:
+        pandas.DataFrame(coordinates, columns=["nom", "nom conjoint", "Rôles", "Framacarte"]).to_excel(writer, sheet_name="COORDONNEES", index=False)
+        pandas.DataFrame(engagements, columns=["nom", "nom conjoint", "Légumes"]).to_excel(writer, sheet_name="ENGAGEMENTS", index=False)
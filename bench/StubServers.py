@@ -0,0 +1,229 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Local stand-ins for Nominatim, adresse.data.gouv.fr and OSM tile servers
+# File    : StubServers.py
+# Date    : Oct. 18th, 2026
+
+import io
+import csv
+import json
+import time
+import zlib
+import argparse
+import threading
+import urllib.parse
+import email.policy
+import email.parser                             # Parse multipart uploads
+from PIL import Image                           # Draw tiles
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Answer requests after a fixed latency, subclasses give the response
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        stub = self.server.stub
+        with stub.lock:
+            stub.requestCount += 1
+
+        time.sleep(stub.latency)
+        status, headers, body = stub.respond(self)
+
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+class StubServer:
+
+    # port 0 picks a free port, see get_url()
+    def __init__(self, latency=0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requestCount = 0
+        self.server = ThreadingHTTPServer((host, port), StubHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.thread = None
+
+    def get_url(self):
+        host, port = self.server.server_address[:2]
+        return "http://{0}:{1}".format(host, port)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+# Nominatim /search giving the same position for the same address
+# Addresses of FAR_CITIES are placed far away, unknown ones are not found
+# POST /search/csv/ works like adresse.data.gouv.fr: the uploaded CSV comes back with
+# positions, "columns" and "postcode" fields give the columns of the query
+class StubGeocoder(StubServer):
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    CENTER = (44.805, -0.59)                     # (lat, lon) around the AMAP
+    SPREAD_DEG = 0.05
+    FAR_CITIES = {"lyon": (45.76, 4.83), "brest": (48.39, -4.49)}
+    UNKNOWN_MARK = "inconnu"
+    HOME_MARK = "salle brama"                    # The AMAP is at the center
+
+    # =============
+    # Members
+    # =============
+
+    # batchFailEvery > 0 answers an error for every Nth row of CSV uploads
+    def __init__(self, latency=0, host="127.0.0.1", port=0, batchFailEvery=0):
+        super().__init__(latency, host, port)
+        self.batchFailEvery = batchFailEvery
+        self.batchRowCount = 0
+
+    # Give the (lat, lon) of a query, None if it is unknown
+    def locate(self, query):
+        key = " ".join(query.lower().split())
+        if (key == "") or (self.UNKNOWN_MARK in key):
+            return None
+
+        if (self.HOME_MARK in key):
+            return self.CENTER
+
+        center = self.CENTER
+        for city in self.FAR_CITIES:
+            if (city in key):
+                center = self.FAR_CITIES[city]
+
+        # Spread addresses with a hash, stable between runs
+        hashValue = zlib.crc32(key.encode("utf-8"))
+        lat = center[0] + ((hashValue & 0xFFFF) / 0xFFFF - 0.5) * self.SPREAD_DEG
+        lon = center[1] + (((hashValue >> 16) & 0xFFFF) / 0xFFFF - 0.5) * self.SPREAD_DEG * 1.4
+        return (lat, lon)
+
+    # Give {name: [values]} of a multipart/form-data body
+    def read_form(self, request):
+        body = request.rfile.read(int(request.headers.get("Content-Length", 0)))
+        header = "Content-Type: {0}\r\n\r\n".format(request.headers.get("Content-Type", "")).encode("utf-8")
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(header + body)
+
+        form = {}
+        if (message.is_multipart()):
+            for part in message.iter_parts():
+                form.setdefault(part.get_param("name", header="content-disposition"), []).append(part.get_payload(decode=True))
+        return form
+
+    def respond(self, request):
+        url = urllib.parse.urlsplit(request.path)
+        if (request.command == "POST") and (url.path.rstrip("/") == "/search/csv"):
+            return self.respond_csv(request)
+
+        query = urllib.parse.parse_qs(url.query).get("q", [""])[0]
+        results = []
+        position = self.locate(query)
+        if (url.path.rstrip("/") == "/search") and (position != None):
+            results.append({"lat": "{0:.7f}".format(position[0]), "lon": "{0:.7f}".format(position[1]), "display_name": query})
+
+        return (200, {"Content-Type": "application/json"}, json.dumps(results).encode("utf-8"))
+
+    # Query of a row is its "columns" values and postcode joined like a Nominatim query
+    def respond_csv(self, request):
+        form = self.read_form(request)
+        if (not "data" in form):
+            return (400, {"Content-Type": "text/plain"}, b"A CSV file must be provided in data field")
+
+        reader = csv.DictReader(io.StringIO(form["data"][0].decode("utf-8-sig")))
+        columns = [column.decode("utf-8") for column in form.get("columns", [])] or reader.fieldnames
+        postcodeColumn = form.get("postcode", [b""])[0].decode("utf-8")
+
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(reader.fieldnames + ["latitude", "longitude", "result_label", "result_score", "result_status"])
+        for row in reader:
+            query = ", ".join([row[column] for column in columns] + ([row[postcodeColumn]] if (postcodeColumn != "") else []))
+            with self.lock:
+                self.batchRowCount += 1
+                isFailed = (self.batchFailEvery > 0) and (self.batchRowCount % self.batchFailEvery == 0)
+
+            position = self.locate(query)
+            if (isFailed):
+                result = ["", "", "", "", "error"]
+            elif (position == None):
+                result = ["", "", "", "", "not-found"]
+            else:
+                result = ["{0:.7f}".format(position[0]), "{0:.7f}".format(position[1]), query, "0.95", "ok"]
+            writer.writerow([row[column] for column in reader.fieldnames] + result)
+
+        return (200, {"Content-Type": "text/csv; charset=utf-8"}, output.getvalue().encode("utf-8"))
+
+# Tile server /{z}/{x}/{y}.png, tiles have ETags so revalidation can be measured
+class StubTileServer(StubServer):
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    TILE_SIZE = 256
+    COLOR_COUNT = 16                             # Tiles are encoded once per color
+
+    # =============
+    # Members
+    # =============
+
+    def __init__(self, latency=0, host="127.0.0.1", port=0):
+        StubServer.__init__(self, latency, host, port)
+        self.tileData = []
+        for i in range(self.COLOR_COUNT):
+            tile = Image.new("RGB", (self.TILE_SIZE, self.TILE_SIZE), (200 + i * 3, 220 - i * 2, 190 + i))
+            stream = io.BytesIO()
+            tile.save(stream, "PNG")
+            self.tileData.append(stream.getvalue())
+
+    # URL template for --tileUrl
+    def get_template(self):
+        return self.get_url() + "/{z}/{x}/{y}.png"
+
+    def respond(self, request):
+        try:
+            z, x, y = [int(part) for part in request.path.split("?")[0].strip("/").replace(".png", "").split("/")[-3:]]
+        except ValueError:
+            return (404, {}, b"")
+
+        etag = '"{0}-{1}-{2}"'.format(z, x, y)
+        if (request.headers.get("If-None-Match") == etag):
+            return (304, {"ETag": etag}, b"")
+
+        return (200, {"Content-Type": "image/png", "ETag": etag}, self.tileData[(x * 7 + y * 3) % self.COLOR_COUNT])
+
+# Run both servers until stopped, Ex:
+#   python StubServers.py --geoPort 8081 --tilePort 8082
+#   python amaping.py --geocoderUrl http://127.0.0.1:8081 --tileUrl "http://127.0.0.1:8082/{z}/{x}/{y}.png" ...
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local geocoder and tile servers for tests and benchmarks")
+    parser.add_argument('--geoPort', default=8081, dest="geoPort", help='specify the geocoder port', type=int)
+    parser.add_argument('--tilePort', default=8082, dest="tilePort", help='specify the tile server port', type=int)
+    parser.add_argument('--geoLatency', default=0.0, dest="geoLatency", help='specify the geocoder latency in seconds', type=float)
+    parser.add_argument('--tileLatency', default=0.0, dest="tileLatency", help='specify the tile server latency in seconds', type=float)
+    parser.add_argument('--batchFailEvery', default=0, dest="batchFailEvery", help='specify N to fail every Nth row of CSV uploads', type=int)
+    args = parser.parse_args()
+
+    geocoder = StubGeocoder(args.geoLatency, port=args.geoPort, batchFailEvery=args.batchFailEvery)
+    tileServer = StubTileServer(args.tileLatency, port=args.tilePort)
+    geocoder.start()
+    tileServer.start()
+    print("Geocoder on {0} (CSV uploads on {0}/search/csv/), tiles on {1}".format(geocoder.get_url(), tileServer.get_template()))
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        geocoder.stop()
+        tileServer.stop()
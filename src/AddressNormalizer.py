@@ -0,0 +1,44 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Give one canonical form to addresses written in different ways
+# File    : AddressNormalizer.py
+# Date    : Oct. 18th, 2026
+
+import re
+from TextFold import fold_text                  # Same folding as member names
+
+# Abbreviations of French street types and titles, after folding
+ABBREVIATIONS = {
+    "av": "avenue", "ave": "avenue", "bd": "boulevard", "bld": "boulevard", "blvd": "boulevard",
+    "boul": "boulevard", "r": "rue", "pl": "place", "imp": "impasse", "all": "allee", "ch": "chemin",
+    "chem": "chemin", "rte": "route", "crs": "cours", "fg": "faubourg", "fbg": "faubourg",
+    "sq": "square", "pass": "passage", "res": "residence", "resid": "residence", "qu": "quai",
+    "prom": "promenade", "esp": "esplanade", "ham": "hameau", "st": "saint", "ste": "sainte",
+    "mal": "marechal", "gal": "general", "gen": "general", "pdt": "president", "prof": "professeur",
+    "dr": "docteur", "cdt": "commandant", "lt": "lieutenant"
+}
+
+# Folded text with abbreviations written in full, Ex: "Av. St-Jean" -> "avenue saint jean"
+def expand_text(text):
+    return " ".join(ABBREVIATIONS.get(word, word) for word in fold_text(text).split())
+
+# Postal codes come as "33400", 33400, "33400.0" or 1000 for 01000, give 5 digits or ""
+def canonical_postal_code(value):
+    value = re.sub(r"\.0*$", "", str(value).strip())
+    if (not re.fullmatch(r"\d{4,5}", value)):
+        return ""
+    return value.zfill(5)
+
+# Give canonical (street, city, postalCode) of a "street, city, postal code" address
+# like AmapMember.get_display_address()
+def split_address(address):
+    parts = str(address).rsplit(",", 2)
+    street = expand_text(parts[0])
+    city = expand_text(parts[1]) if (len(parts) > 1) else ""
+    postalCode = canonical_postal_code(parts[2]) if (len(parts) > 2) else ""
+    return (street, city, postalCode)
+
+# Same address written differently gives the same string, Ex:
+# "12 Av.  Sainte-Marie, TALENCE, 33400.0" -> "12 avenue sainte marie, talence, 33400"
+def canonical_address(address):
+    return ", ".join(split_address(address))
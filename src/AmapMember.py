@@ -6,7 +6,6 @@
 
 import Logger
 import re
-from geopy.distance import geodesic             # Mesure distances
 
 def format_phone(phone):
     cleanPhone = re.sub('[^0-9]+', '', phone)
@@ -18,9 +17,15 @@ class AmapMember:
     # Variables
     # =============
 
+    # No __dict__ per member, they are many and stored in the run manifest
+    __slots__ = ("id", "people", "address", "city", "postalCode", "coords", "color", "shape", "phone",
+                 "isCloseToHome", "email", "typePanier", "role", "isOnMap")
+
     def __init__(self):
         self.people = []
         self.address = ""
+        self.city = ""
+        self.postalCode = ""
         self.coords = None
         self.color = "blue"
         self.shape = "circle"
@@ -37,6 +42,10 @@ class AmapMember:
     def add_people(self, name, firstname):
         self.people.append((name, firstname))
 
+    # Give the list of (name, firstname)
+    def get_people(self):
+        return self.people
+
     # Build a nice string with all declared people
     # in a coma separated list with the id at the end
     def get_display_name(self):
@@ -58,6 +67,9 @@ class AmapMember:
     def set_address(self, address):
         self.address = address
 
+    def get_address(self):
+        return self.address
+
     def set_city(self, city):
         self.city = city
 
@@ -65,6 +77,10 @@ class AmapMember:
     def set_postal_code(self, postalCode):
         self.postalCode = int(postalCode)
 
+    # Tell if the address is complete enough to be geocoded
+    def has_valid_address(self):
+        return (self.address != "") and (self.postalCode != "") and (self.city != "")
+
     # Build a nicec string with address related informations
     def get_display_address(self):
         return "{0}, {1}, {2}".format(self.address, self.city, self.postalCode)
@@ -79,7 +95,11 @@ class AmapMember:
     def get_shape(self):
         return self.shape
 
-    def set_phone(self, phone):
+    def set_phone(self, phone, isFormatted=False):
+        if (isFormatted):
+            self.phone = phone
+            return
+
         try:
             self.phone = format_phone(phone)
         except:
@@ -119,37 +139,59 @@ class AmapMember:
         return self.isCloseToHome
 
     # Return the (lat, lon) pin point location corresponding to the address
-    def req_map_position(self, geoLocator):
+    def req_map_position(self, geoLocator, geoCache=None):
         # Init in case of error
         self.coords = None
 
         # Do nothing if address is not set
-        if ((self.address == "") or (self.postalCode == "") or (self.city == "")):
+        if (not self.has_valid_address()):
             Logger.error("Bad address specified for member {0}".format(self.get_display_address()))
             return self.get_map_position()
 
         # Get complete address
         reqAddr = self.get_display_address()
 
+        # Look in cache first, a cached None means a known bad address
+        if (geoCache != None):
+            isHit, coords = geoCache.get(reqAddr)
+            if (isHit):
+                Logger.debug("Using cached geocode for \"{0}\"".format(reqAddr))
+                if (coords == None):
+                    Logger.error("Unable to find GeoCode for \"{0}\" (cached) !".format(reqAddr))
+                self.coords = coords
+                return self.get_map_position()
+
         # Get location from address
         Logger.debug("Requesting geocode for \"{0}\"".format(reqAddr))
+        Logger.count("geocode.requests")
         try:
             location = geoLocator.geocode(reqAddr)
         except Exception as e:
+            # Network errors are not cached, we will retry next time
             Logger.error("geoLocator failed: " + str(e));
+            Logger.count("geocode.failures")
             return self.get_map_position()
 
         # Check if request succeeded
         if (location == None):
             Logger.error("Unable to find GeoCode for \"{0}\" !".format(reqAddr))
+            Logger.count("geocode.notFound")
+            if (geoCache != None):
+                geoCache.put(reqAddr, None)
             return self.get_map_position()
 
         # Return coords
         self.coords = (location.longitude, location.latitude)
+        if (geoCache != None):
+            geoCache.put(reqAddr, self.coords)
 
         # Return result
         return self.get_map_position()
 
+    # Set a (lon, lat) position resolved elsewhere (See GeocodeEngine)
+    def set_map_position(self, coords):
+        self.coords = coords
+
     def get_map_position(self):
         return self.coords
 
@@ -160,6 +202,8 @@ class AmapMember:
             return False
 
         # Compute the distance between the closePoint and the member location
+        # geopy is slow to import, only load it when needed
+        from geopy.distance import geodesic
         distanceKm = geodesic(self.get_map_position(), closePoint).km
 
         Logger.debug("{0} is {1:.2} km away from close point".format(self.get_display_name(), distanceKm))
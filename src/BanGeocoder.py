@@ -0,0 +1,342 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Geocode French addresses locally from a Base Adresse Nationale extract
+# File    : BanGeocoder.py
+# Date    : Oct. 18th, 2026
+
+import Logger
+import AddressNormalizer
+import os
+import re
+import csv
+import gzip
+import json
+import time
+import argparse
+import collections
+import numpy                                    # Index arrays are memory-mapped
+
+# BAN extracts are CSV files of a département, Ex: adresses-33.csv.gz from
+# https://adresse.data.gouv.fr/data/ban/adresses/latest/csv/
+#
+# The index is a directory of .npy arrays opened memory-mapped, so only the
+# pages a lookup touches are read:
+# - streets (name, city, postal code) sorted by postal code, so streets of a postal
+#   code are a contiguous range of street ids
+# - a trigram index of street names: sorted trigram codes, and one sorted posting
+#   (keyIndex * streetCount + streetId) for each street containing a trigram, so the
+#   streets of a range sharing any query trigram are found by two searches
+# - addresses (number, rep, lon, lat) grouped by street and sorted by number
+# meta.json is written last and tells the index is complete.
+
+INDEX_VERSION = 2                               # Increase when the index or the normalization changes
+ARRAY_NAMES = (
+    "streetPostalCodes", "streetCities", "streetTrigramCounts", "streetAddressOffsets",
+    "streetLabelData", "streetLabelOffsets", "trigramKeys", "trigramPostings",
+    "addressNumbers", "addressReps", "addressLons", "addressLats"
+)
+
+# Location found by BanGeocoder, it has the position attributes of geopy locations
+BanLocation = collections.namedtuple("BanLocation", ["longitude", "latitude", "score", "address"])
+
+# Number at the start of a normalized street, with its repetition (Ex: "12 bis rue...")
+HOUSE_NUMBER_REGEX = re.compile(r"^(\d+) ?(bis|ter|quater|[a-z](?= ))? ?(.*)$")
+
+# Give the sorted codes of the distinct trigrams of a normalized text
+def get_trigrams(text):
+    padded = "  " + text + " "
+    codes = {(ord(padded[i]) << 16) | (ord(padded[i + 1]) << 8) | ord(padded[i + 2]) for i in range(len(padded) - 2)}
+    return numpy.array(sorted(codes), dtype=numpy.int64)
+
+# Give (number, rep, street, city, postalCode) of a "street, city, postal code" address
+# Parts are canonical (see AddressNormalizer), number and postalCode are None when missing
+def parse_address(address):
+    street, city, postalCode = AddressNormalizer.split_address(address)
+    postalCode = int(postalCode) if (postalCode != "") else None
+
+    number = None
+    rep = ""
+    match = HOUSE_NUMBER_REGEX.match(street)
+    if (match != None):
+        number = int(match.group(1))
+        rep = match.group(2) or ""
+        street = match.group(3)
+
+    return (number, rep, street, city, postalCode)
+
+# Build the index of a BAN CSV extract (can be gzipped) in indexDir
+def build_index(csvPath, indexDir):
+    startTime = time.monotonic()
+    streets = {}            # (postalCode, city, street) -> (label, [(number, rep, lon, lat)])
+    cityLabels = {}         # Normalized city -> label
+    reps = {"": 0}          # Rep -> code
+    normalized = {}         # Text -> normalized text, rows of a street repeat its names
+    rowCount = 0
+
+    openFile = gzip.open if csvPath.endswith(".gz") else open
+    with openFile(csvPath, "rt", encoding="utf-8", newline="") as csvFile:
+        for row in csv.DictReader(csvFile, delimiter=";"):
+            try:
+                number = int(row["numero"])
+                postalCode = int(row["code_postal"])
+                lon = float(row["lon"])
+                lat = float(row["lat"])
+            except (KeyError, TypeError, ValueError):
+                continue
+
+            for text in (row["nom_voie"], row["nom_commune"], row.get("rep") or ""):
+                if (not text in normalized):
+                    normalized[text] = AddressNormalizer.expand_text(text)
+
+            street = normalized[row["nom_voie"]]
+            city = normalized[row["nom_commune"]]
+            if (street == ""):
+                continue
+
+            cityLabels.setdefault(city, row["nom_commune"])
+            repCode = reps.setdefault(normalized[row.get("rep") or ""], len(reps))
+            streets.setdefault((postalCode, city, street), (row["nom_voie"], []))[1].append((number, repCode, lon, lat))
+            rowCount += 1
+
+    if (rowCount == 0):
+        raise RuntimeError("No address found in BAN file \"{0}\"".format(csvPath))
+
+    cityCodes = {city: code for code, city in enumerate(sorted(cityLabels))}
+    streetKeys = sorted(streets)
+    postalCodes = []
+    cities = []
+    trigramCounts = []
+    addressCounts = []
+    labels = []
+    addresses = []
+    trigramCodes = []
+    trigramStreets = []
+
+    for streetId, key in enumerate(streetKeys):
+        label, streetAddresses = streets[key]
+        streetAddresses.sort()
+
+        postalCodes.append(key[0])
+        cities.append(cityCodes[key[1]])
+        labels.append(label.encode("utf-8"))
+        addressCounts.append(len(streetAddresses))
+        addresses.extend(streetAddresses)
+
+        trigrams = get_trigrams(key[2])
+        trigramCounts.append(len(trigrams))
+        trigramCodes.append(trigrams)
+        trigramStreets.append(numpy.full(len(trigrams), streetId, dtype=numpy.int32))
+
+    # Postings are sorted by trigram then street id
+    trigramCodes = numpy.concatenate(trigramCodes)
+    trigramStreets = numpy.concatenate(trigramStreets)
+    trigramKeys, keyIndexes = numpy.unique(trigramCodes, return_inverse=True)
+    postings = numpy.sort(keyIndexes.astype(numpy.int64) * len(streetKeys) + trigramStreets)
+
+    addressArray = numpy.array(addresses, dtype=numpy.float64).reshape(-1, 4)
+    arrays = {
+        "streetPostalCodes": numpy.array(postalCodes, dtype=numpy.int32),
+        "streetCities": numpy.array(cities, dtype=numpy.int32),
+        "streetTrigramCounts": numpy.array(trigramCounts, dtype=numpy.int32),
+        "streetAddressOffsets": numpy.concatenate(([0], numpy.cumsum(addressCounts))).astype(numpy.int64),
+        "streetLabelData": numpy.frombuffer(b"".join(labels), dtype=numpy.uint8),
+        "streetLabelOffsets": numpy.concatenate(([0], numpy.cumsum([len(label) for label in labels]))).astype(numpy.int64),
+        "trigramKeys": trigramKeys,
+        "trigramPostings": postings,
+        "addressNumbers": addressArray[:, 0].astype(numpy.int32),
+        "addressReps": addressArray[:, 1].astype(numpy.int16),
+        "addressLons": addressArray[:, 2],
+        "addressLats": addressArray[:, 3]
+    }
+
+    os.makedirs(indexDir, exist_ok=True)
+    for name in ARRAY_NAMES:
+        numpy.save(os.path.join(indexDir, name + ".npy"), arrays[name])
+
+    meta = {
+        "version": INDEX_VERSION,
+        "source": os.path.abspath(csvPath),
+        "addressCount": rowCount,
+        "streetCount": len(streetKeys),
+        "cities": [cityLabels[city] for city in sorted(cityLabels)],
+        "reps": list(reps)
+    }
+    with open(os.path.join(indexDir, "meta.json"), "w", encoding="utf-8") as metaFile:
+        json.dump(meta, metaFile, ensure_ascii=False)
+
+    Logger.info("BAN index of {0} address(es) in {1} street(s) built in {2:.1f}s".format(rowCount, len(streetKeys), time.monotonic() - startTime))
+
+class BanGeocoder:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    DEFAULT_MIN_SCORE = 0.7
+    STREET_WEIGHT = 0.6                          # Score is the street name similarity (Dice
+    POSTAL_CODE_WEIGHT = 0.2                     # coefficient of trigrams) and bonuses for
+    CITY_WEIGHT = 0.2                            # matching postal code and city, a street of
+                                                 # another town stays under DEFAULT_MIN_SCORE
+    OTHER_REP_FACTOR = 0.95                      # Number found without its rep (bis, ter...)
+    NEAREST_NUMBER_FACTOR = 0.9                  # Number not found, closest one used
+    NEAREST_NUMBER_MAX_GAP = 4                   # Beyond, closest number is elsewhere in the street
+    NO_NUMBER_FACTOR = 0.85                      # Address without number, middle of the street
+
+    # =============
+    # Members
+    # =============
+
+    # Lookups scored under minScore give None so another geocoder can be asked
+    def __init__(self, indexDir, minScore=DEFAULT_MIN_SCORE):
+        metaPath = os.path.join(indexDir, "meta.json")
+        if (not os.path.isfile(metaPath)):
+            raise RuntimeError("No BAN index in \"{0}\", build it with: python BanGeocoder.py --csv adresses-XX.csv.gz --index {0}".format(indexDir))
+
+        with open(metaPath, "r", encoding="utf-8") as metaFile:
+            meta = json.load(metaFile)
+        if (meta.get("version") != INDEX_VERSION):
+            raise RuntimeError("BAN index in \"{0}\" was built by another version, build it again".format(indexDir))
+
+        self.minScore = minScore
+        self.cities = meta["cities"]
+        self.cityCodes = {AddressNormalizer.expand_text(city): code for code, city in enumerate(self.cities)}
+        self.reps = meta["reps"]
+        # Plain arrays over the mapped files, numpy.memmap slices are slower to make
+        self.arrays = {name: numpy.asarray(numpy.load(os.path.join(indexDir, name + ".npy"), mmap_mode="r")) for name in ARRAY_NAMES}
+        self.streetCount = len(self.arrays["streetPostalCodes"])
+        Logger.info("BAN index of {0} address(es) opened from \"{1}\"".format(meta["addressCount"], indexDir))
+
+    def get_street_label(self, streetId):
+        start, end = self.arrays["streetLabelOffsets"][streetId:streetId + 2]
+        return self.arrays["streetLabelData"][start:end].tobytes().decode("utf-8")
+
+    # Give (score, streetId) of the street closest to a normalized name among street ids [lo; hi[
+    def find_street(self, trigrams, cityCode, postalCode, lo, hi):
+        keys = self.arrays["trigramKeys"]
+        postings = self.arrays["trigramPostings"]
+
+        keyIndexes = numpy.minimum(numpy.searchsorted(keys, trigrams), len(keys) - 1)
+        keyIndexes = keyIndexes[keys[keyIndexes] == trigrams]
+
+        # Postings of each trigram restricted to the street range, then all gathered
+        starts = numpy.searchsorted(postings, keyIndexes * self.streetCount + lo)
+        lengths = numpy.searchsorted(postings, keyIndexes * self.streetCount + hi) - starts
+        postingCount = int(lengths.sum())
+        if (postingCount == 0):
+            return (0.0, None)
+
+        positions = numpy.repeat(starts - numpy.cumsum(lengths) + lengths, lengths) + numpy.arange(postingCount)
+
+        # Count trigrams shared with each street of the range
+        commonCounts = numpy.bincount(postings[positions] % self.streetCount - lo, minlength=hi - lo)
+        streetIds = numpy.flatnonzero(commonCounts)
+        if (len(streetIds) == 0):
+            return (0.0, None)
+
+        commonCounts = commonCounts[streetIds]
+        streetIds += lo
+
+        scores = self.STREET_WEIGHT * 2 * commonCounts / (len(trigrams) + self.arrays["streetTrigramCounts"][streetIds])
+        scores += self.POSTAL_CODE_WEIGHT * (self.arrays["streetPostalCodes"][streetIds] == postalCode)
+        scores += self.CITY_WEIGHT * (self.arrays["streetCities"][streetIds] == cityCode)
+
+        best = numpy.argmax(scores)
+        return (float(scores[best]), int(streetIds[best]))
+
+    # Give (addressIndex, factor) of a house number in a street, factor lowers the score of approximations
+    def find_number(self, streetId, number, rep):
+        start, end = self.arrays["streetAddressOffsets"][streetId:streetId + 2]
+        streetMiddle = (start + (end - start) // 2, self.NO_NUMBER_FACTOR)
+        if (number == None):
+            return streetMiddle
+
+        numbers = self.arrays["addressNumbers"][start:end]
+        matches = numpy.flatnonzero(numbers == number)
+        if (len(matches) == 0):
+            # A far number isn't closer to the address than the street, Ex: 12 for 240
+            gaps = numpy.abs(numbers - number)
+            nearest = int(numpy.argmin(gaps))
+            if (gaps[nearest] > self.NEAREST_NUMBER_MAX_GAP):
+                return streetMiddle
+            return (start + nearest, self.NEAREST_NUMBER_FACTOR)
+
+        for match in matches:
+            if (self.reps[self.arrays["addressReps"][start + match]] == rep):
+                return (start + match, 1.0)
+
+        return (start + matches[0], self.OTHER_REP_FACTOR)
+
+    # Give the best BanLocation of an address whatever its score, None if no street is close
+    def search(self, address):
+        number, rep, street, city, postalCode = parse_address(address)
+        if (street == ""):
+            return None
+
+        trigrams = get_trigrams(street)
+        cityCode = self.cityCodes.get(city, -1)
+
+        # Streets of the postal code first, all streets if none is good enough
+        score, streetId = (0.0, None)
+        if (postalCode != None):
+            lo, hi = numpy.searchsorted(self.arrays["streetPostalCodes"], (postalCode, postalCode + 1))
+            if (hi > lo):
+                score, streetId = self.find_street(trigrams, cityCode, postalCode, lo, hi)
+
+        if (score < self.minScore):
+            otherScore, otherStreetId = self.find_street(trigrams, cityCode, postalCode, 0, self.streetCount)
+            if (otherScore > score):
+                score, streetId = (otherScore, otherStreetId)
+
+        if (streetId == None):
+            return None
+
+        addressIndex, factor = self.find_number(streetId, number, rep)
+        repCode = self.arrays["addressReps"][addressIndex]
+        label = "{0}{1} {2}, {3} {4}".format(
+            self.arrays["addressNumbers"][addressIndex],
+            (" " + self.reps[repCode]) if (repCode != 0) else "",
+            self.get_street_label(streetId),
+            self.arrays["streetPostalCodes"][streetId],
+            self.cities[self.arrays["streetCities"][streetId]]
+        )
+
+        return BanLocation(
+            float(self.arrays["addressLons"][addressIndex]),
+            float(self.arrays["addressLats"][addressIndex]),
+            min(1.0, score * factor),
+            label
+        )
+
+    # Same as geopy geocoders, None when the address isn't matched well enough
+    def geocode(self, address):
+        location = self.search(address)
+        if (location == None) or (location.score < self.minScore):
+            Logger.debug("BAN - No good match for \"{0}\" (best: {1})".format(address, location))
+            return None
+
+        Logger.debug("BAN - \"{0}\" matched \"{1}\" ({2:.2f})".format(address, location.address, location.score))
+        return location
+
+# Build an index or try addresses, Ex:
+#   python BanGeocoder.py --csv adresses-33.csv.gz --index ./output/ban
+#   python BanGeocoder.py --index ./output/ban --query "12 rue des Lilas, Talence, 33400"
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build and query a local BAN geocoding index")
+    parser.add_argument('--csv', default="", dest="csvFilename", help='specify a BAN CSV extract to build the index from', type=str)
+    parser.add_argument('--index', default="./output/ban", dest="indexDir", help='specify the index directory', type=str)
+    parser.add_argument('--query', default=[], dest="queries", help='specify an address to look up, can be repeated', action='append')
+    args = parser.parse_args()
+
+    Logger.init("BanGeocoder")
+    try:
+        if (args.csvFilename != ""):
+            build_index(args.csvFilename, args.indexDir)
+
+        if (len(args.queries) > 0):
+            geocoder = BanGeocoder(args.indexDir)
+            for query in args.queries:
+                startTime = time.perf_counter()
+                location = geocoder.search(query)
+                print("{0} -> {1} in {2:.0f} us".format(query, location, (time.perf_counter() - startTime) * 1e6))
+    except RuntimeError as e:
+        Logger.error(str(e))
@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Geocode many addresses with a single CSV upload
+# File    : BatchGeocoder.py
+# Date    : Oct. 18th, 2026
+
+import Logger
+import AddressNormalizer
+import io
+import csv
+
+# Client of CSV batch endpoints like https://api-adresse.data.gouv.fr/search/csv/
+# Addresses are uploaded as a CSV file (id, street, city, postcode columns), the
+# answer is the same file with latitude, longitude, result_score and result_status
+# columns added. It is parsed while it is downloaded.
+class BatchGeocoder:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    DEFAULT_URL = "https://api-adresse.data.gouv.fr/search/csv/"
+    DEFAULT_CHUNK_SIZE = 1000                    # Rows per upload, the endpoint takes files up to 50 MB
+    DEFAULT_MIN_SCORE = 0.5                      # Lower scores are guesses, they are retried one by one
+    TIMEOUT_S = 120
+    QUERY_COLUMNS = ["street", "city"]
+
+    # =============
+    # Members
+    # =============
+
+    def __init__(self, url=DEFAULT_URL, chunkSize=DEFAULT_CHUNK_SIZE, minScore=DEFAULT_MIN_SCORE):
+        self.url = url
+        self.chunkSize = max(1, chunkSize)
+        self.minScore = minScore
+
+        # requests is imported here so that runs without batch geocoding don't load it
+        import requests
+        self.session = requests.Session()
+
+    # Split addresses in lists of chunkSize, one upload each
+    def get_chunks(self, addressList):
+        return [addressList[i:i + self.chunkSize] for i in range(0, len(addressList), self.chunkSize)]
+
+    # CSV file of addresses in "street, city, postal code" format, rows are identified by their index
+    def build_csv(self, addressList):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["id"] + self.QUERY_COLUMNS + ["postcode"])
+        for index, address in enumerate(addressList):
+            parts = [part.strip() for part in address.rsplit(",", 2)]
+            street = parts[0]
+            city = parts[1] if (len(parts) > 1) else ""
+            postalCode = AddressNormalizer.canonical_postal_code(parts[2]) if (len(parts) > 2) else ""
+            writer.writerow([index, street, city, postalCode])
+
+        return output.getvalue().encode("utf-8")
+
+    # Give a dict address -> (lon, lat) of addresses found with a good enough score
+    # Missing addresses were not found, raise an exception if the upload failed
+    def geocode_batch(self, addressList):
+        response = self.session.post(
+            self.url,
+            files={"data": ("addresses.csv", self.build_csv(addressList), "text/csv")},
+            data={"columns": self.QUERY_COLUMNS, "postcode": "postcode"},
+            timeout=self.TIMEOUT_S,
+            stream=True
+        )
+
+        positions = {}
+        with response:
+            response.raise_for_status()
+
+            # Read rows as they arrive instead of loading the whole answer, the raw
+            # stream must stay open until TextIOWrapper has read its end
+            response.raw.decode_content = True
+            response.raw.auto_close = False
+            for row in csv.DictReader(io.TextIOWrapper(response.raw, encoding="utf-8-sig", newline="")):
+                try:
+                    address = addressList[int(row["id"])]
+                    score = float(row.get("result_score") or 0)
+                    coords = (float(row["longitude"]), float(row["latitude"]))
+                except (KeyError, IndexError, TypeError, ValueError):
+                    continue
+
+                if (row.get("result_status", "ok") in ("", "ok")) and (score >= self.minScore):
+                    positions[address] = coords
+
+        Logger.count("geocode.batchRows", len(addressList))
+        Logger.debug("Batch geocoder found {0} of {1} address(es)".format(len(positions), len(addressList)))
+        return positions
@@ -0,0 +1,146 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Group close markers depending on the zoom level
+# File    : Cluster.py
+# Date    : Oct. 18th, 2026
+
+import Logger
+import numpy                                    # Build all levels at once
+from MapGenerator import lon_to_tile_x, lat_to_tile_y, tile_x_to_lon, tile_y_to_lat
+
+# Hierarchical grid clustering: at each zoom level, points falling in the same
+# cell of radiusPx pixels are merged, cells of a level are built from the clusters
+# of the level above so a cluster always contains whole clusters of higher zooms.
+# Clusters of each level are bucketed by tile so a query only looks at
+# the tiles it covers, whatever the total number of points.
+class ClusterIndex:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    DEFAULT_RADIUS_PX = 40
+    DEFAULT_MIN_ZOOM = 0
+    DEFAULT_MAX_ZOOM = 18                        # Points are never merged above
+    TILE_SIZE = 256
+
+    # =============
+    # Members
+    # =============
+
+    # categories gives a category name for each point (Ex: basket type) for cluster breakdowns
+    def __init__(self, lons, lats, categories, radiusPx=DEFAULT_RADIUS_PX, minZoom=DEFAULT_MIN_ZOOM, maxZoom=DEFAULT_MAX_ZOOM):
+        self.radiusPx = radiusPx
+        self.minZoom = minZoom
+        self.maxZoom = maxZoom
+        self.categoryNames, categoryIndexes = numpy.unique(numpy.asarray(categories, dtype=str), return_inverse=True)
+        self.levels = {}
+
+        # Leaves: each point is its own cluster
+        pointCount = len(categoryIndexes)
+        xs = lon_to_tile_x(lons, 0)
+        ys = lat_to_tile_y(lats, 0)
+        counts = numpy.ones(pointCount)
+        breakdowns = numpy.zeros((pointCount, len(self.categoryNames)))
+        breakdowns[numpy.arange(pointCount), categoryIndexes] = 1
+        pointIndexes = numpy.arange(pointCount)
+        self.levels[maxZoom + 1] = self.create_level(maxZoom + 1, xs, ys, counts, breakdowns, pointIndexes)
+
+        for zoom in range(maxZoom, minZoom - 1, -1):
+            # Cell size in tile numbers at zoom 0
+            cellSize = radiusPx / self.TILE_SIZE / (2 ** zoom)
+            cells = numpy.stack([numpy.floor(xs / cellSize), numpy.floor(ys / cellSize)], axis=1)
+            cells, firstIndexes, inverse = numpy.unique(cells, axis=0, return_index=True, return_inverse=True)
+            inverse = inverse.reshape(-1)
+
+            # Clusters are placed at the weighted center of their content
+            newCounts = numpy.bincount(inverse, weights=counts)
+            xs = numpy.bincount(inverse, weights=xs * counts) / newCounts
+            ys = numpy.bincount(inverse, weights=ys * counts) / newCounts
+            newBreakdowns = numpy.zeros((len(cells), len(self.categoryNames)))
+            numpy.add.at(newBreakdowns, inverse, breakdowns)
+
+            # A cluster of one point still knows which point it is
+            pointIndexes = numpy.where(newCounts == 1, pointIndexes[firstIndexes], -1)
+            counts = newCounts
+            breakdowns = newBreakdowns
+            self.levels[zoom] = self.create_level(zoom, xs, ys, counts, breakdowns, pointIndexes)
+
+        Logger.debug("Cluster index: {0} point(s), {1} cluster(s) at zoom {2}".format(
+            pointCount,
+            len(self.levels[minZoom]["counts"]),
+            minZoom
+        ))
+
+    # Store a level with its clusters bucketed by tile
+    def create_level(self, zoom, xs, ys, counts, breakdowns, pointIndexes):
+        tileXs = numpy.floor(xs * (2 ** zoom)).astype(numpy.int64)
+        tileYs = numpy.floor(ys * (2 ** zoom)).astype(numpy.int64)
+
+        order = numpy.lexsort((tileYs, tileXs))
+        tiles = {}
+        if (len(order) > 0):
+            sortedTiles = numpy.stack([tileXs[order], tileYs[order]], axis=1)
+            bounds = numpy.nonzero(numpy.any(sortedTiles[1:] != sortedTiles[:-1], axis=1))[0] + 1
+            for start, end in zip(numpy.concatenate([[0], bounds]), numpy.concatenate([bounds, [len(order)]])):
+                tiles[(int(sortedTiles[start, 0]), int(sortedTiles[start, 1]))] = order[start:end]
+
+        return {
+            "xs": xs,
+            "ys": ys,
+            "counts": counts.astype(numpy.int64),
+            "breakdowns": breakdowns.astype(numpy.int64),
+            "pointIndexes": pointIndexes,
+            "tiles": tiles
+        }
+
+    # Give (lon, lat, count, breakdown, pointIndex) of clusters at a zoom level
+    # breakdown is a dict of point count per category, pointIndex is None for more than one point
+    # bbox is (west, south, east, north) in degrees, None for the whole world
+    def get_clusters(self, zoom, bbox=None):
+        zoom = min(max(int(zoom), self.minZoom), self.maxZoom + 1)
+        level = self.levels[zoom]
+
+        if (bbox == None):
+            indexes = numpy.arange(len(level["counts"]))
+        else:
+            west, south, east, north = bbox
+            tileCount = 2 ** zoom
+            xMin = int(numpy.floor(lon_to_tile_x(west, zoom)))
+            xMax = int(numpy.floor(lon_to_tile_x(east, zoom)))
+            yMin = int(numpy.floor(lat_to_tile_y(north, zoom)))
+            yMax = int(numpy.floor(lat_to_tile_y(south, zoom)))
+
+            indexList = []
+            for tileX in range(max(0, xMin), min(tileCount - 1, xMax) + 1):
+                for tileY in range(max(0, yMin), min(tileCount - 1, yMax) + 1):
+                    if ((tileX, tileY) in level["tiles"]):
+                        indexList.append(level["tiles"][(tileX, tileY)])
+
+            indexes = numpy.sort(numpy.concatenate(indexList)) if (len(indexList) > 0) else numpy.array([], dtype=numpy.int64)
+
+            # Tiles go a bit further than the box
+            xs = level["xs"][indexes] * tileCount
+            ys = level["ys"][indexes] * tileCount
+            isInBox = (xs >= lon_to_tile_x(west, zoom)) & (xs <= lon_to_tile_x(east, zoom)) & (ys >= lat_to_tile_y(north, zoom)) & (ys <= lat_to_tile_y(south, zoom))
+            indexes = indexes[isInBox]
+
+        lons = tile_x_to_lon(level["xs"][indexes], 0)
+        lats = tile_y_to_lat(level["ys"][indexes], 0)
+
+        clusterList = []
+        for i, index in enumerate(indexes):
+            breakdown = {}
+            for categoryIndex in numpy.nonzero(level["breakdowns"][index])[0]:
+                breakdown[str(self.categoryNames[categoryIndex])] = int(level["breakdowns"][index][categoryIndex])
+
+            pointIndex = int(level["pointIndexes"][index])
+            clusterList.append((
+                float(lons[i]),
+                float(lats[i]),
+                int(level["counts"][index]),
+                breakdown,
+                pointIndex if (pointIndex >= 0) else None
+            ))
+
+        return clusterList
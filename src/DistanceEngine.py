@@ -0,0 +1,140 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Compute distances between many members at once
+# File    : DistanceEngine.py
+# Date    : Oct. 18th, 2026
+
+import numpy
+
+# Haversine uses a spherical earth, results stay within 0.5% of
+# geopy geodesic() (WGS-84 ellipsoid), that's 25 m for a 5 km threshold
+EARTH_RADIUS_KM = 6371.0088
+
+# Give distances in km between (lon, lat) arrays and a (lon, lat) point
+def haversine_km(lons, lats, point):
+    lons = numpy.radians(numpy.asarray(lons, dtype=numpy.float64))
+    lats = numpy.radians(numpy.asarray(lats, dtype=numpy.float64))
+    lon0, lat0 = numpy.radians(point[0]), numpy.radians(point[1])
+
+    a = numpy.sin((lats - lat0) / 2) ** 2 + numpy.cos(lats) * numpy.cos(lat0) * numpy.sin((lons - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+
+# Convert (lon, lat) arrays to points on a unit sphere
+# Straight distances between those points grow with great-circle distances
+def _to_xyz(lons, lats):
+    lons = numpy.radians(numpy.asarray(lons, dtype=numpy.float64))
+    lats = numpy.radians(numpy.asarray(lats, dtype=numpy.float64))
+    return numpy.column_stack((
+        numpy.cos(lats) * numpy.cos(lons),
+        numpy.cos(lats) * numpy.sin(lons),
+        numpy.sin(lats)
+    ))
+
+# Chord length on the unit sphere for a great-circle distance
+def _km_to_chord(distanceKm):
+    return 2 * numpy.sin(min(distanceKm / EARTH_RADIUS_KM, numpy.pi) / 2)
+
+# KD-tree over member positions for radius queries
+class SpatialIndex:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    LEAF_SIZE = 32
+
+    # =============
+    # Members
+    # =============
+
+    # coords is a list of (lon, lat)
+    def __init__(self, coords):
+        coords = numpy.asarray(coords, dtype=numpy.float64).reshape(-1, 2)
+        self.lons = coords[:, 0]
+        self.lats = coords[:, 1]
+        self.points = _to_xyz(self.lons, self.lats)
+        self.order = numpy.arange(len(self.points))
+
+        # Nodes: bounding box, children (or -1) and point range in self.order
+        self.boxMin = []
+        self.boxMax = []
+        self.children = []
+        self.ranges = []
+
+        if (len(self.points) > 0):
+            self._build(0, len(self.points))
+
+        self.boxMin = numpy.array(self.boxMin)
+        self.boxMax = numpy.array(self.boxMax)
+
+    def _build(self, start, end):
+        nodeId = len(self.ranges)
+        nodePoints = self.points[self.order[start:end]]
+        self.boxMin.append(nodePoints.min(axis=0))
+        self.boxMax.append(nodePoints.max(axis=0))
+        self.ranges.append((start, end))
+        self.children.append((-1, -1))
+
+        if (end - start <= self.LEAF_SIZE):
+            return nodeId
+
+        # Split on the widest axis at the median
+        axis = numpy.argmax(self.boxMax[nodeId] - self.boxMin[nodeId])
+        middle = (end - start) // 2
+        split = numpy.argpartition(nodePoints[:, axis], middle)
+        self.order[start:end] = self.order[start:end][split]
+
+        left = self._build(start, start + middle)
+        right = self._build(start + middle, end)
+        self.children[nodeId] = (left, right)
+
+        return nodeId
+
+    def __len__(self):
+        return len(self.points)
+
+    # Give distances in km from point to every indexed member, in one pass
+    def distances_to(self, point):
+        return haversine_km(self.lons, self.lats, point)
+
+    # Give indexes of members within radiusKm of a (lon, lat) point
+    def query_radius(self, point, radiusKm):
+        if (len(self.points) == 0):
+            return numpy.array([], dtype=numpy.int64)
+
+        center = _to_xyz([point[0]], [point[1]])[0]
+        chord = _km_to_chord(radiusKm)
+        foundList = []
+        stack = [0]
+
+        while stack:
+            nodeId = stack.pop()
+
+            # Skip nodes whose bounding box is too far
+            gap = numpy.maximum(0, numpy.maximum(self.boxMin[nodeId] - center, center - self.boxMax[nodeId]))
+            if (numpy.dot(gap, gap) > chord * chord):
+                continue
+
+            left, right = self.children[nodeId]
+            if (left != -1):
+                stack.append(left)
+                stack.append(right)
+                continue
+
+            start, end = self.ranges[nodeId]
+            indexes = self.order[start:end]
+            delta = self.points[indexes] - center
+            foundList.append(indexes[numpy.einsum("ij,ij->i", delta, delta) <= chord * chord])
+
+        if (len(foundList) == 0):
+            return numpy.array([], dtype=numpy.int64)
+
+        return numpy.sort(numpy.concatenate(foundList))
+
+    # Give a boolean mask telling which members are within radiusKm of at least one point
+    def within_any(self, pointList, radiusKm):
+        mask = numpy.zeros(len(self.points), dtype=bool)
+        for point in pointList:
+            mask[self.query_radius(point, radiusKm)] = True
+
+        return mask
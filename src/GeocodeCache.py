@@ -0,0 +1,109 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Persistent cache of geocoded addresses
+# File    : GeocodeCache.py
+# Date    : Oct. 18th, 2026
+
+import Logger
+import AddressNormalizer
+import time
+from SqliteCache import SqliteCache             # Shared SQLite setup and lastUsed updates
+
+# Build the key used to store an address in cache
+# Case, accents, spaces, abbreviations and postal code format are not relevant for the geocoder
+def normalize_address(address):
+    return AddressNormalizer.canonical_address(address)
+
+class GeocodeCache(SqliteCache):
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    DEFAULT_TTL_DAYS = 180                       # Keep found addresses for 6 months
+    DEFAULT_NEGATIVE_TTL_DAYS = 7                # Retry unknown addresses every week
+    DEFAULT_MAX_ENTRIES = 100000
+    SECONDS_PER_DAY = 24 * 3600
+    LAST_USED_QUERY = "UPDATE geocode SET lastUsed = MAX(lastUsed, ?) WHERE address = ?"
+    CACHE_NAME = "Geocode cache"
+
+    # =============
+    # Members
+    # =============
+
+    def __init__(self, path, ttlDays=DEFAULT_TTL_DAYS, negativeTtlDays=DEFAULT_NEGATIVE_TTL_DAYS, maxEntries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttlDays * self.SECONDS_PER_DAY
+        self.negativeTtl = negativeTtlDays * self.SECONDS_PER_DAY
+        self.maxEntries = maxEntries
+
+        super().__init__(path, [
+            """CREATE TABLE IF NOT EXISTS geocode (
+                address TEXT PRIMARY KEY,
+                lon REAL,
+                lat REAL,
+                found INTEGER NOT NULL,
+                timestamp REAL NOT NULL,
+                lastUsed REAL NOT NULL
+            )""",
+            "CREATE INDEX IF NOT EXISTS geocodeLastUsed ON geocode (lastUsed)"
+        ])
+
+    # Return (isHit, coords), coords is None for a known bad address
+    def get(self, address):
+        key = normalize_address(address)
+        now = time.time()
+
+        with self.lock:
+            row = self.db.execute(
+                "SELECT lon, lat, found, timestamp FROM geocode WHERE address = ?", (key,)
+            ).fetchone()
+
+            # Check expiration, negative results expire sooner
+            if (row != None):
+                lon, lat, found, timestamp = row
+                ttl = self.ttl if found else self.negativeTtl
+                if (now - timestamp > ttl):
+                    row = None
+
+            if (row == None):
+                self.missCount += 1
+                Logger.count("geocodeCache.misses")
+                return (False, None)
+
+            self.touch((key,), now)
+            self.hitCount += 1
+            Logger.count("geocodeCache.hits")
+
+        if (found):
+            return (True, (lon, lat))
+        else:
+            return (True, None)
+
+    # Store a (lon, lat) position, None means the geocoder doesn't know the address
+    def put(self, address, coords):
+        key = normalize_address(address)
+        now = time.time()
+
+        if (coords == None):
+            values = (key, None, None, 0, now, now)
+        else:
+            values = (key, coords[0], coords[1], 1, now, now)
+
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?, ?)", values)
+            self.db.commit()
+
+    # Remove expired entries and keep only the most recently used ones, see SqliteCache.evict()
+    def remove_entries(self, now):
+        cursor = self.db.execute(
+            "DELETE FROM geocode WHERE (found = 1 AND timestamp < ?) OR (found = 0 AND timestamp < ?)",
+            (now - self.ttl, now - self.negativeTtl)
+        )
+        removedCount = cursor.rowcount
+
+        cursor = self.db.execute(
+            "DELETE FROM geocode WHERE address NOT IN "
+            "(SELECT address FROM geocode ORDER BY lastUsed DESC LIMIT ?)",
+            (self.maxEntries,)
+        )
+        return removedCount + cursor.rowcount
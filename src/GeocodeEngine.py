@@ -0,0 +1,293 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Resolve a batch of addresses with a rate limited worker pool
+# File    : GeocodeEngine.py
+# Date    : Oct. 18th, 2026
+
+import Logger
+import AddressNormalizer
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Errors worth a retry, others (bad query, auth...) won't get better
+# geopy is only imported once a request failed, runs served from cache don't need it
+def get_retry_exceptions():
+    from geopy.exc import GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited
+    return (GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited, TimeoutError, ConnectionError)
+
+# Build the geocoder client on first request, factory() gives the real one (Ex: Nominatim)
+class LazyGeocoder:
+    def __init__(self, factory):
+        self.factory = factory
+        self.geoLocator = None
+        self.lock = threading.Lock()
+
+    def geocode(self, address):
+        with self.lock:
+            if (self.geoLocator == None):
+                self.geoLocator = self.factory()
+
+        return self.geoLocator.geocode(address)
+
+# Share a request rate between several threads
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = burst
+        self.lastRefill = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Block until a token is available
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.lastRefill) * self.rate)
+                self.lastRefill = now
+
+                if (self.tokens >= 1):
+                    self.tokens -= 1
+                    return
+
+                waitTime = (1 - self.tokens) / self.rate
+
+            time.sleep(waitTime)
+
+class GeocodeEngine:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    DEFAULT_WORKER_COUNT = 4
+    DEFAULT_RATE = 1.0                           # Nominatim usage policy: 1 req/s max
+    DEFAULT_RETRY_COUNT = 3
+    DEFAULT_BACKOFF_S = 1.0                      # Doubled after each failed attempt
+
+    # =============
+    # Members
+    # =============
+
+    # localGeocoder (Ex: BanGeocoder) is asked before geoLocator, without rate limit,
+    # its geocode() gives None when geoLocator must be asked
+    # batchGeocoder (see BatchGeocoder) is asked next, each upload takes a token of the
+    # rate, addresses it can't find are asked to geoLocator one by one
+    def __init__(self, geoLocator, geoCache=None, workerCount=DEFAULT_WORKER_COUNT, rate=DEFAULT_RATE,
+                 retryCount=DEFAULT_RETRY_COUNT, backoff=DEFAULT_BACKOFF_S, localGeocoder=None, batchGeocoder=None):
+        self.geoLocator = geoLocator
+        self.geoCache = geoCache
+        self.localGeocoder = localGeocoder
+        self.batchGeocoder = batchGeocoder
+        self.workerCount = max(1, workerCount)
+        self.bucket = TokenBucket(rate)
+        self.retryCount = retryCount
+        self.backoff = backoff
+
+        self.requestCount = 0
+        self.retryCounter = 0
+        self.failCount = 0
+        self.savedCount = 0
+        self.statLock = threading.Lock()
+
+    # Geocode a single address, returns (lon, lat) or None
+    # Raise an exception if the geocoder couldn't answer
+    def geocode(self, address):
+        delay = self.backoff
+
+        for attempt in range(0, self.retryCount + 1):
+            self.bucket.acquire()
+            with self.statLock:
+                self.requestCount += 1
+            Logger.count("geocode.requests")
+
+            try:
+                location = self.geoLocator.geocode(address)
+            except get_retry_exceptions() as e:
+                if (attempt == self.retryCount):
+                    raise
+
+                Logger.debug("Geocode of \"{0}\" failed ({1}), retrying in {2:.1f}s".format(address, str(e), delay))
+                with self.statLock:
+                    self.retryCounter += 1
+                Logger.count("geocode.retries")
+                time.sleep(delay)
+                delay = delay * 2
+                continue
+
+            if (location == None):
+                return None
+
+            return (location.longitude, location.latitude)
+
+    def resolve_one(self, address):
+        try:
+            coords = self.geocode(address)
+        except Exception as e:
+            # Network errors are not cached, we will retry next time
+            Logger.error("geoLocator failed for \"{0}\": {1}".format(address, str(e)))
+            with self.statLock:
+                self.failCount += 1
+            Logger.count("geocode.failures")
+            return None
+
+        if (coords == None):
+            Logger.error("Unable to find GeoCode for \"{0}\" !".format(address))
+            Logger.count("geocode.notFound")
+
+        if (self.geoCache != None):
+            self.geoCache.put(address, coords)
+
+        return coords
+
+    # Fill positions with addresses found by the local geocoder, give the other ones
+    # Local answers are not cached, the local index is as fast as the cache
+    def resolve_local(self, addressList, positions):
+        if (self.localGeocoder == None) or (len(addressList) == 0):
+            return addressList
+
+        startTime = time.monotonic()
+        networkList = []
+        for address in addressList:
+            location = self.localGeocoder.geocode(address)
+            if (location == None):
+                networkList.append(address)
+                continue
+
+            positions[address] = (location.longitude, location.latitude)
+
+        Logger.info("Found {0} address(es) locally in {1:.3f}s, {2} left to the geocoder".format(
+            len(addressList) - len(networkList),
+            time.monotonic() - startTime,
+            len(networkList)
+        ))
+        Logger.count("geocode.local", len(addressList) - len(networkList))
+        Logger.count("geocode.localMisses", len(networkList))
+        return networkList
+
+    # Upload a chunk of addresses to the batch geocoder, give address -> (lon, lat) of found ones
+    # A failed upload gives no position, its addresses are retried one by one
+    def geocode_chunk(self, addressList):
+        self.bucket.acquire()
+        with self.statLock:
+            self.requestCount += 1
+        Logger.count("geocode.batchRequests")
+
+        try:
+            return self.batchGeocoder.geocode_batch(addressList)
+        except Exception as e:
+            Logger.warning("Batch geocoding of {0} address(es) failed, they will be retried one by one: {1}".format(len(addressList), str(e)))
+            Logger.count("geocode.batchFailures")
+            return {}
+
+    # Fill positions with addresses found by the batch geocoder, give the other ones
+    def resolve_batch(self, addressList, positions):
+        if (self.batchGeocoder == None) or (len(addressList) == 0):
+            return addressList
+
+        startTime = time.monotonic()
+        chunkList = self.batchGeocoder.get_chunks(addressList)
+        retryList = []
+        with ThreadPoolExecutor(self.workerCount) as pool:
+            for chunk, chunkPositions in zip(chunkList, pool.map(self.geocode_chunk, chunkList)):
+                for address in chunk:
+                    coords = chunkPositions.get(address)
+                    if (coords == None):
+                        retryList.append(address)
+                        continue
+
+                    positions[address] = coords
+                    if (self.geoCache != None):
+                        self.geoCache.put(address, coords)
+
+        Logger.info("Batch geocoded {0} address(es) in {1} upload(s) and {2:.1f}s, {3} left to retry one by one".format(
+            len(addressList),
+            len(chunkList),
+            time.monotonic() - startTime,
+            len(retryList)
+        ))
+        Logger.count("geocode.batchRetries", len(retryList))
+        return retryList
+
+    # Give a dict address -> (lon, lat), None when address is unknown
+    # Addresses with the same canonical form (see AddressNormalizer) are geocoded
+    # once, with the first one written, and all get its position
+    def resolve(self, addressList):
+        groups = {}
+        for address in addressList:
+            groups.setdefault(AddressNormalizer.canonical_address(address), {})[address] = None
+
+        uniqueCount = sum(len(group) for group in groups.values())
+        duplicateCount = len(addressList) - uniqueCount
+        variantCount = uniqueCount - len(groups)
+        self.savedCount += duplicateCount + variantCount
+        Logger.count("geocode.duplicates", duplicateCount)
+        Logger.count("geocode.variants", variantCount)
+        Logger.info("{0} address(es) are {1} distinct one(s): {2} duplicate(s), {3} written differently".format(
+            len(addressList),
+            len(groups),
+            duplicateCount,
+            variantCount
+        ))
+
+        groupPositions = self.resolve_unique([next(iter(group)) for group in groups.values()])
+
+        positions = {}
+        for group in groups.values():
+            coords = groupPositions[next(iter(group))]
+            for address in group:
+                positions[address] = coords
+
+        return positions
+
+    # Same as resolve() for addresses written once
+    def resolve_unique(self, addressList):
+        positions = {}
+        pendingList = []
+
+        # Each address is requested once, cache answers first
+        for address in dict.fromkeys(addressList):
+            if (self.geoCache != None):
+                isHit, coords = self.geoCache.get(address)
+                if (isHit):
+                    positions[address] = coords
+                    continue
+
+            pendingList.append(address)
+
+        Logger.info("Geocoding {0} address(es), {1} from cache".format(len(pendingList), len(positions)))
+        pendingList = self.resolve_local(pendingList, positions)
+        pendingList = self.resolve_batch(pendingList, positions)
+        if (len(pendingList) == 0):
+            return positions
+
+        # Counters also hold batch uploads and previous calls, only log this phase
+        with self.statLock:
+            startCounts = (self.requestCount, self.retryCounter, self.failCount)
+        startTime = time.monotonic()
+        with ThreadPoolExecutor(self.workerCount) as pool:
+            for address, coords in zip(pendingList, pool.map(self.resolve_one, pendingList)):
+                positions[address] = coords
+        elapsedTime = time.monotonic() - startTime
+        requestCount = self.requestCount - startCounts[0]
+
+        Logger.info("Geocoded {0} address(es) in {1:.1f}s ({2:.2f} req/s, {3} retries, {4} failed)".format(
+            len(pendingList),
+            elapsedTime,
+            requestCount / elapsedTime if elapsedTime > 0 else 0,
+            self.retryCounter - startCounts[1],
+            self.failCount - startCounts[2]
+        ))
+
+        return positions
+
+    def get_request_count(self):
+        return self.requestCount
+
+    def get_fail_count(self):
+        return self.failCount
+
+    # Give how many requests were saved by grouping duplicate and variant addresses
+    def get_saved_count(self):
+        return self.savedCount
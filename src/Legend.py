@@ -0,0 +1,164 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Lay out the member list of the side bar on columns and pages
+# File    : Legend.py
+# Date    : Oct. 18th, 2026
+
+import Logger
+import math
+import numpy                                    # Names are composed from glyph arrays
+from PIL import Image                           # Legend pages are rendered as whole images
+from PIL import ImageDraw                       # Used to draw text
+from PIL import ImageFont                       # Used to access text fonts
+
+# Constants
+MIN_ROW_COUNT = 64                              # Rows of the biggest font in the side bar height
+
+# Give the row height of the biggest legend font in a side bar, the title row has this height too
+def get_max_row_height(sideBarHeight):
+    return int(sideBarHeight / MIN_ROW_COUNT)
+
+class Legend:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    FONT_FILE = 'Arial.ttf'
+    MIN_FONT_SIZE = 12                           # Below that, use more pages
+    FONT_SIZE_STEP = 0.9                         # Font reduction between two layout tries
+    MARKER_RATIO = 0.95                          # Marker size relative to row height
+
+    # =============
+    # Members
+    # =============
+
+    # Legend fills a width x height area, maxFontSize is used when there is enough space
+    def __init__(self, width, height, maxFontSize, spriteAtlas):
+        self.width = width
+        self.height = height
+        self.maxFontSize = max(self.MIN_FONT_SIZE, int(maxFontSize))
+        self.spriteAtlas = spriteAtlas
+        self.padding = max(1, int(width * 0.01))
+
+    # Choose font size, rows and columns so that all names fit, biggest font first
+    def layout(self, nameList):
+        # Names are drawn glyph by glyph (See render_column()), their width is the sum
+        # of their glyph advances. Give each character a code to sum them for all names.
+        charCodes = {}
+        codes = numpy.array([charCodes.setdefault(char, len(charCodes)) for name in nameList for char in name], dtype=numpy.int64)
+        nameIds = numpy.repeat(numpy.arange(len(nameList)), [len(name) for name in nameList])
+
+        fontSize = self.maxFontSize
+        while True:
+            rowHeight = fontSize
+            rowsPerColumn = max(1, (self.height - 2 * self.padding) // rowHeight)
+
+            # Every name is measured, a short name of wide glyphs can be the widest
+            font = ImageFont.truetype(self.FONT_FILE, fontSize)
+            advances = numpy.array([font.getlength(char) for char in charCodes], dtype=numpy.float64)
+            textWidth = max(numpy.bincount(nameIds, weights=advances[codes], minlength=1).max(initial=0), 1)
+
+            # [Space][marker of heigh][Space][Text][Space]
+            columnWidth = 3 * self.padding + rowHeight + math.ceil(textWidth)
+            columnCount = max(1, self.width // columnWidth)
+
+            if (rowsPerColumn * columnCount >= len(nameList)) or (fontSize <= self.MIN_FONT_SIZE):
+                break
+
+            fontSize = max(self.MIN_FONT_SIZE, int(fontSize * self.FONT_SIZE_STEP))
+
+        self.fontSize = fontSize
+        self.rowHeight = rowHeight
+        self.rowsPerColumn = rowsPerColumn
+        self.columnCount = columnCount
+        self.columnWidth = self.width // columnCount
+        self.entriesPerPage = rowsPerColumn * columnCount
+        self.pageCount = max(1, math.ceil(len(nameList) / self.entriesPerPage))
+        self.font = font
+        self.glyphs = {}                         # Character -> (mask array, left, top, advance)
+
+        Logger.debug("Legend layout: font {0}px, {1} rows x {2} columns, {3} page(s)".format(
+            self.fontSize,
+            self.rowsPerColumn,
+            self.columnCount,
+            self.pageCount
+        ))
+
+    # Render a page of entries (name, color, shape) as a transparent RGBA image, layout() must be called before
+    def render_page(self, pageIndex, entryList):
+        page = Image.new("RGBA", (self.width, self.height), (0, 0, 0, 0))
+        self.draw_page(page, pageIndex, entryList)
+        return page
+
+    # Give (mask array, left, top, advance) of a character, it is rasterized once
+    # FreeType renders a whole name glyph by glyph on each call, that was most of the legend time
+    def get_glyph(self, char):
+        glyph = self.glyphs.get(char)
+        if (glyph == None):
+            left, top, right, bottom = self.font.getbbox(char)
+            mask = numpy.zeros((0, 0), dtype=numpy.uint8)
+            if (right > left) and (bottom > top):
+                image = Image.new("L", (right - left, bottom - top), 0)
+                ImageDraw.Draw(image).text((-left, -top), char, font=self.font, fill=255)
+                mask = numpy.asarray(image)
+
+            glyph = (mask, left, top, self.font.getlength(char))
+            self.glyphs[char] = glyph
+
+        return glyph
+
+    # Give the L mask of a column of names, one row each, and its margin on each side
+    # The margin keeps glyphs going out of their row (accents, descenders)
+    def render_column(self, nameList):
+        margin = self.rowHeight
+        mask = numpy.zeros((len(nameList) * self.rowHeight + 2 * margin, self.columnWidth + 2 * margin), dtype=numpy.uint8)
+        maskHeight, maskWidth = mask.shape
+
+        for row, name in enumerate(nameList):
+            penX = 0.0
+            rowTop = margin + row * self.rowHeight
+            for char in name:
+                glyphMask, left, top, advance = self.get_glyph(char)
+                x = max(0, margin + int(round(penX)) + left)
+                y = max(0, rowTop + top)
+                penX += advance
+
+                # Text longer than the column is cut
+                height = min(glyphMask.shape[0], maskHeight - y)
+                width = min(glyphMask.shape[1], maskWidth - x)
+                if (height > 0) and (width > 0):
+                    area = mask[y:y + height, x:x + width]
+                    numpy.maximum(area, glyphMask[:height, :width], out=area)
+
+        return (Image.fromarray(mask, "L"), margin)
+
+    # Draw a page of entries on layer with the page top at yOrigin, layout() must be called before
+    # Only rows visible on layer are drawn so a big legend can be drawn strip by strip
+    def draw_page(self, layer, pageIndex, entryList, yOrigin=0):
+        pageEntries = entryList[pageIndex * self.entriesPerPage:(pageIndex + 1) * self.entriesPerPage]
+
+        # Keep one more row on each side for glyphs going out of their row
+        firstRow = max(0, (-yOrigin - self.padding) // self.rowHeight - 1)
+        lastRow = min(self.rowsPerColumn, (layer.height - yOrigin - self.padding) // self.rowHeight + 2)
+        if (firstRow >= lastRow):
+            return
+
+        spriteList = []
+        for columnIndex in range(0, self.columnCount):
+            columnStart = columnIndex * self.rowsPerColumn
+            columnEntries = pageEntries[columnStart + firstRow:columnStart + lastRow]
+            if (len(columnEntries) == 0):
+                break
+
+            # Whole column is written at once through its mask
+            x = columnIndex * self.columnWidth + self.padding
+            y = yOrigin + self.padding + firstRow * self.rowHeight
+            mask, margin = self.render_column([name for name, color, shape in columnEntries])
+            layer.paste("black", (x + self.rowHeight + self.padding - margin, y - margin), mask)
+            mask.close()
+
+            for row, (name, color, shape) in enumerate(columnEntries):
+                spriteList.append((x + self.rowHeight / 2, y + row * self.rowHeight + self.rowHeight / 2, shape, color))
+
+        self.spriteAtlas.paste_all(layer, spriteList, self.rowHeight * self.MARKER_RATIO)
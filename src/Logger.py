@@ -5,9 +5,18 @@
 # Date    : Sept. 11th, 2021
 
 import logging                                  # Use for log message in console
+import os
+import sys
+import json
+import time
+import functools
+import threading
 
 # Globale Variables
 logger = None
+timers = {}                                     # name -> [total seconds, call count]
+counters = {}                                   # name -> value
+metricsLock = threading.Lock()                  # Stages and counters are updated from worker threads
 
 def init(name):
 	global logger
@@ -31,3 +40,133 @@ def info(msg):
 def debug(msg):
 	logger.debug(msg)
 
+
+# Peak resident memory of the process since it started, None if unknown
+def getPeakMemoryMb():
+	try:
+		import resource
+	except ImportError:
+		return None
+
+	# Linux gives kilobytes, macOS gives bytes
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if (sys.platform == "darwin"):
+		return peak / (1024 * 1024)
+	return peak / 1024
+
+# Resident memory of the process now, None if unknown (only Linux gives it)
+def getCurrentMemoryMb():
+	try:
+		with open("/proc/self/statm", "r") as statmFile:
+			residentPages = int(statmFile.read().split()[1])
+		return residentPages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+	except (OSError, ValueError, IndexError, AttributeError):
+		return None
+
+# Highest resident memory of the process while a block runs, sampled by a thread
+# Unlike getPeakMemoryMb(), it tells how much one step needed, Ex:
+#   with Logger.MemoryPeak() as memoryPeak:
+#   memoryPeak.peakMb and memoryPeak.startMb are None if unknown
+class MemoryPeak:
+	SAMPLE_PERIOD_S = 0.01
+
+	def __init__(self):
+		self.startMb = None
+		self.peakMb = None
+		self.stopEvent = threading.Event()
+		self.thread = None
+
+	def __enter__(self):
+		self.startMb = getCurrentMemoryMb()
+		self.peakMb = self.startMb
+		if (self.startMb != None):
+			self.thread = threading.Thread(target=self.sample, daemon=True)
+			self.thread.start()
+		return self
+
+	def __exit__(self, excType, excValue, excTraceback):
+		if (self.thread != None):
+			self.stopEvent.set()
+			self.thread.join()
+			self.update()
+		return False
+
+	def sample(self):
+		while (not self.stopEvent.wait(self.SAMPLE_PERIOD_S)):
+			self.update()
+
+	def update(self):
+		currentMb = getCurrentMemoryMb()
+		if (currentMb != None) and (currentMb > self.peakMb):
+			self.peakMb = currentMb
+
+# =============
+#    METRICS
+# =============
+
+# Time a block or a function under a stage name, times of the same name add up
+#   with Logger.Timer("geocode"):
+#   @Logger.Timer("render")
+class Timer:
+	def __init__(self, name):
+		self.name = name
+		self.startTime = None
+
+	def __enter__(self):
+		self.startTime = time.perf_counter()
+		return self
+
+	def __exit__(self, excType, excValue, excTraceback):
+		addTime(self.name, time.perf_counter() - self.startTime)
+		return False
+
+	def __call__(self, function):
+		@functools.wraps(function)
+		def timedFunction(*args, **kwargs):
+			# Each call has its own timer, the function can run in several threads
+			with Timer(self.name):
+				return function(*args, **kwargs)
+
+		return timedFunction
+
+def addTime(name, seconds):
+	with metricsLock:
+		timer = timers.setdefault(name, [0, 0])
+		timer[0] += seconds
+		timer[1] += 1
+
+# Add value to a counter, Ex: count("geocode.requests")
+def count(name, value=1):
+	with metricsLock:
+		counters[name] = counters.get(name, 0) + value
+
+def getCounter(name):
+	with metricsLock:
+		return counters.get(name, 0)
+
+def resetMetrics():
+	with metricsLock:
+		timers.clear()
+		counters.clear()
+
+# Give timers, counters and process peak memory as a JSON compatible dict
+def getMetrics():
+	with metricsLock:
+		metrics = {
+			"timers": {name: {"totalS": round(timer[0], 4), "calls": timer[1]} for name, timer in sorted(timers.items())},
+			"counters": dict(sorted(counters.items()))
+		}
+
+	metrics["peakMemoryMb"] = getPeakMemoryMb()
+	return metrics
+
+def dumpMetrics(path):
+	with open(path, "w") as metricsFile:
+		json.dump(getMetrics(), metricsFile, indent=2)
+	info("Metrics written to {0}".format(path))
+
+# Log time spent in each stage
+def logTimers():
+	metrics = getMetrics()
+	for name, timer in metrics["timers"].items():
+		debug("{0}: {1:.2f}s in {2} call(s)".format(name, timer["totalS"], timer["calls"]))
@@ -5,26 +5,187 @@
 # Date    : Sept. 11th, 2021
 
 import Logger
+import threading
+import collections
+import numpy                                    # Project many positions at once
+from io import BytesIO
+from math import floor, ceil
+from PIL import Image                           # Decode tiles
+from TileFetcher import TileFetcher             # Download tiles
 from staticmap import *                         # Used to generate a map from OpenStreetMap database
 
+# Web Mercator projection of (lon, lat) arrays to tile numbers, same as staticmap
+def lon_to_tile_x(lons, zoom):
+    lons = numpy.asarray(lons, dtype=numpy.float64)
+    lons = numpy.where((lons < -180) | (lons > 180), (lons + 180) % 360 - 180, lons)
+    return (lons + 180.0) / 360.0 * (2 ** zoom)
+
+def lat_to_tile_y(lats, zoom):
+    lats = numpy.asarray(lats, dtype=numpy.float64)
+    lats = numpy.radians(numpy.where((lats < -90) | (lats > 90), (lats + 90) % 180 - 90, lats))
+    return (1 - numpy.log(numpy.tan(lats) + 1 / numpy.cos(lats)) / numpy.pi) / 2 * (2 ** zoom)
+
+# Inverse of the projection, tile numbers to (lon, lat)
+def tile_x_to_lon(xs, zoom):
+    return numpy.asarray(xs, dtype=numpy.float64) / (2 ** zoom) * 360.0 - 180.0
+
+def tile_y_to_lat(ys, zoom):
+    ys = numpy.asarray(ys, dtype=numpy.float64) / (2 ** zoom)
+    return numpy.degrees(numpy.arctan(numpy.sinh(numpy.pi * (1 - 2 * ys))))
+
+# Give (center, zoomLevel, mapSize) of the smallest map showing all (lon, lat) positions
+# The highest zoom level up to maxZoom where the map fits in maxSize is used
+# trimPercent ignores this percentage of the most extreme positions on each side
+# mustFit positions are always on the map, whatever the trimming
+def fit_map(positions, maxSize, maxZoom, minZoom=0, trimPercent=0, mustFit=[], marginPx=64):
+    positions = numpy.asarray(positions, dtype=numpy.float64).reshape(-1, 2)
+
+    if (trimPercent > 0) and (len(positions) > 0):
+        lonBounds = numpy.percentile(positions[:, 0], [trimPercent, 100 - trimPercent])
+        latBounds = numpy.percentile(positions[:, 1], [trimPercent, 100 - trimPercent])
+        isKept = (positions[:, 0] >= lonBounds[0]) & (positions[:, 0] <= lonBounds[1]) & (positions[:, 1] >= latBounds[0]) & (positions[:, 1] <= latBounds[1])
+        positions = positions[isKept]
+
+    positions = numpy.concatenate([positions, numpy.asarray(mustFit, dtype=numpy.float64).reshape(-1, 2)])
+    if (len(positions) == 0):
+        raise RuntimeError("No position to fit the map on")
+
+    # Work in tile numbers at zoom 0, they only need to be scaled for other zoom levels
+    xs = lon_to_tile_x(positions[:, 0], 0)
+    ys = lat_to_tile_y(positions[:, 1], 0)
+    xMin, xMax = (xs.min(), xs.max())
+    yMin, yMax = (ys.min(), ys.max())
+
+    for zoomLevel in range(maxZoom, minZoom - 1, -1):
+        scale = (2 ** zoomLevel) * MapGenerator.TILE_SIZE
+        mapSize = (
+            int(ceil((xMax - xMin) * scale)) + 2 * marginPx,
+            int(ceil((yMax - yMin) * scale)) + 2 * marginPx
+        )
+        if (mapSize[0] <= maxSize[0]) and (mapSize[1] <= maxSize[1]):
+            break
+
+    if (mapSize[0] > maxSize[0]) or (mapSize[1] > maxSize[1]):
+        raise RuntimeError("Positions don't fit in a {0}x{1} map, even at zoom {2}".format(maxSize[0], maxSize[1], minZoom))
+
+    center = (
+        float(tile_x_to_lon((xMin + xMax) / 2, 0)),
+        float(tile_y_to_lat((yMin + yMax) / 2, 0))
+    )
+    return (center, zoomLevel, mapSize)
+
+# StaticMap taking its tiles from a TileFetcher (and so from the tile cache)
+class TileStaticMap(StaticMap):
+    def __init__(self, width, height, tileFetcher):
+        StaticMap.__init__(self, width, height, url_template=tileFetcher.template)
+        self.tileFetcher = tileFetcher
+
+    # List (x, y, tileX, tileY) of tiles covering the map
+    def get_tile_list(self):
+        x_min = int(floor(self.x_center - (0.5 * self.width / self.tile_size)))
+        y_min = int(floor(self.y_center - (0.5 * self.height / self.tile_size)))
+        x_max = int(ceil(self.x_center + (0.5 * self.width / self.tile_size)))
+        y_max = int(ceil(self.y_center + (0.5 * self.height / self.tile_size)))
+
+        tiles = []
+        max_tile = 2 ** self.zoom
+        for x in range(x_min, x_max):
+            for y in range(y_min, y_max):
+                # x and y may have crossed the date line
+                tiles.append((x, y, (x + max_tile) % max_tile, (y + max_tile) % max_tile))
+
+        return tiles
+
+    def _draw_base_layer(self, image):
+        self.draw_tiles(image, self.get_tile_list())
+
+    # Paste tiles (x, y, tileX, tileY) on image, yOffset is the image top on the map
+    # so tiles can be drawn on a strip of the map
+    def draw_tiles(self, image, tiles, yOffset=0, quiet=False):
+        # The same tile can appear twice on small zoom levels
+        tilePositions = {}
+        for x, y, tileX, tileY in tiles:
+            tilePositions.setdefault((self.zoom, tileX, tileY), []).append((x, y))
+
+        # Paste each tile as soon as it is downloaded
+        def paste_tile(tile, tileData):
+            tile_image = Image.open(BytesIO(tileData)).convert("RGBA")
+            for x, y in tilePositions[tile]:
+                box = [
+                    self._x_to_px(x),
+                    self._y_to_px(y) - yOffset,
+                    self._x_to_px(x + 1),
+                    self._y_to_px(y + 1) - yOffset,
+                ]
+                image.paste(tile_image, box, tile_image)
+
+        self.tileFetcher.fetch_all(list(tilePositions), paste_tile, quiet=quiet)
+
 class MapGenerator:
 
     # CONSTANTS
     MARKER_OUTLINE_COLOR = "white"
+    DEFAULT_TILE_URL = TileFetcher.DEFAULT_TEMPLATE
+    TILE_SIZE = 256
 
     # Prepare a new map
-    def __init__(self, center, zoomLevel = 5, mapSize=(1920, 1080)):
+    # tileFetcher gives tiles ({s} subdomains, cache, offline mode...), see TileFetcher
+    def __init__(self, center, zoomLevel = 5, mapSize=(1920, 1080), tileFetcher=None):
         # Get map base image
         self.zoomLevel = zoomLevel
         self.center = center
-        self.map = StaticMap(mapSize[0], mapSize[1], url_template='http://a.tile.osm.org/{z}/{x}/{y}.png')
+
+        if (tileFetcher == None):
+            tileFetcher = TileFetcher(self.DEFAULT_TILE_URL)
+        self.tileFetcher = tileFetcher
+        self.map = TileStaticMap(mapSize[0], mapSize[1], tileFetcher)
+
+        # Map center in tile numbers, used for projections
+        self.mapSize = mapSize
+        self.xCenter = float(lon_to_tile_x(center[0], zoomLevel))
+        self.yCenter = float(lat_to_tile_y(center[1], zoomLevel))
+
+        if (self.tileFetcher.offline and self.tileFetcher.tileCache == None):
+            raise RuntimeError("Offline rendering needs a tile cache")
 
     # Render by donwloading map from OSM
+    @Logger.Timer("render")
     def render(self):
         Logger.info("Rendering map...")
+
+        # Fail before downloading anything if some tiles are missing
+        if (self.tileFetcher.offline):
+            self.check_offline_tiles()
+
         # Save image to file
         self.image = self.map.render(center=self.center, zoom=self.zoomLevel)
 
+    # Tile list depends on map center, set it without rendering
+    def set_map_center(self):
+        self.map.zoom = self.zoomLevel
+        self.map.x_center = self.xCenter
+        self.map.y_center = self.yCenter
+
+    # Number of tiles to fetch to render the map, known before downloading anything
+    def get_tile_count(self):
+        self.set_map_center()
+        return len(set((tileX, tileY) for x, y, tileX, tileY in self.map.get_tile_list()))
+
+    def check_offline_tiles(self):
+        self.set_map_center()
+
+        missingTiles = []
+        tileCache = self.tileFetcher.tileCache
+        for x, y, tileX, tileY in self.map.get_tile_list():
+            if (not tileCache.contains(self.tileFetcher.template, self.zoomLevel, tileX, tileY)):
+                missingTiles.append("{0}/{1}/{2}".format(self.zoomLevel, tileX, tileY))
+
+        if (len(missingTiles) > 0):
+            raise RuntimeError("{0} tile(s) missing in cache for offline rendering (Ex: {1})".format(
+                len(missingTiles),
+                ", ".join(missingTiles[:5])
+            ))
+
     # Get the image object of the rendered map
     def get_img_obj(self):
         return self.image
@@ -38,16 +199,77 @@ class MapGenerator:
         self.image.save(self.mapFileName)
 
     def lon_lat_to_px(self, markerPos):
-        xTile = staticmap._lon_to_x(markerPos[0], self.zoomLevel)
-        yTile = staticmap._lat_to_y(markerPos[1], self.zoomLevel)
-        markerTilePos = (xTile, yTile)
+        xPx, yPx, isInCanvas = self.lon_lat_to_px_array([markerPos[0]], [markerPos[1]])
+        return (int(xPx[0]), int(yPx[0]))
 
-        return (
-            self.map._x_to_px(markerTilePos[0]),
-            self.map._y_to_px(markerTilePos[1])
-        )
+    # Project arrays of lon/lat to pixels on the map, returns (xPx, yPx, isInCanvas)
+    # margin is the number of pixels a position can be out of the map and still be "in canvas"
+    def lon_lat_to_px_array(self, lons, lats, margin=0):
+        xPx = numpy.rint((lon_to_tile_x(lons, self.zoomLevel) - self.xCenter) * self.TILE_SIZE + self.mapSize[0] / 2).astype(numpy.int64)
+        yPx = numpy.rint((lat_to_tile_y(lats, self.zoomLevel) - self.yCenter) * self.TILE_SIZE + self.mapSize[1] / 2).astype(numpy.int64)
+
+        isInCanvas = (xPx >= -margin) & (xPx < self.mapSize[0] + margin) & (yPx >= -margin) & (yPx < self.mapSize[1] + margin)
+        return (xPx, yPx, isInCanvas)
 
     # Open last saved map
     def show(self):
         im = Image.open(self.mapFileName)
-        im.show()
\ No newline at end of file
+        im.show()
+
+# Rendered maps kept to be reused by other outputs of the same run
+# Each map is only rendered once, even when asked by several threads at the same time
+# maxCount keeps only the last used layers, None to keep them all
+class BaseLayerCache:
+    def __init__(self, maxCount=None):
+        self.lock = threading.Lock()
+        self.layers = collections.OrderedDict()  # key: {"lock", "image"}, last used at the end
+        self.maxCount = maxCount
+        self.hitCount = 0
+        self.renderCount = 0
+
+    # Same tiles at the same place give the same image
+    def get_key(self, mapGen):
+        return (mapGen.tileFetcher.template, mapGen.zoomLevel, mapGen.xCenter, mapGen.yCenter, tuple(mapGen.mapSize))
+
+    # Render mapGen or give it a copy of an already rendered base layer
+    def render(self, mapGen):
+        key = self.get_key(mapGen)
+        with self.lock:
+            if (not key in self.layers):
+                self.layers[key] = {"lock": threading.Lock(), "image": None}
+            self.layers.move_to_end(key)
+            layer = self.layers[key]
+
+            # Forgotten images may still be copied by other threads, let them go on their own
+            while (self.maxCount != None) and (len(self.layers) > self.maxCount):
+                self.layers.popitem(last=False)
+
+        with layer["lock"]:
+            if (layer["image"] == None):
+                mapGen.render()
+                layer["image"] = mapGen.get_img_obj()
+                with self.lock:
+                    self.renderCount += 1
+            else:
+                Logger.debug("Reusing base layer at zoom {0}".format(mapGen.zoomLevel))
+                Logger.count("baseLayers.reused")
+                with self.lock:
+                    self.hitCount += 1
+
+        # Painters draw on their image, keep the cached one clean
+        mapGen.image = layer["image"].copy()
+
+    def get_hit_count(self):
+        return self.hitCount
+
+    def get_render_count(self):
+        return self.renderCount
+
+    def get_layer_count(self):
+        return len(self.layers)
+
+    def close(self):
+        for layer in self.layers.values():
+            if (layer["image"] != None):
+                layer["image"].close()
+        self.layers = collections.OrderedDict()
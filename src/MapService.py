@@ -0,0 +1,247 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Serve maps over HTTP with members and caches kept in memory
+# File    : MapService.py
+# Date    : Oct. 18th, 2026
+
+import Logger
+import io
+import os
+import json
+import time
+import threading
+import tempfile
+import collections
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class MapRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.mapService.handle(self)
+
+    # Requests are counted by the service, don't flood the console
+    def log_message(self, format, *args):
+        Logger.debug("HTTP - " + (format % args))
+
+# Latency statistics of a route
+class RouteMetrics:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    WINDOW_SIZE = 1000                           # Percentiles are computed on the last requests
+
+    # =============
+    # Members
+    # =============
+
+    def __init__(self):
+        self.requestCount = 0
+        self.errorCount = 0
+        self.totalTime = 0
+        self.maxTime = 0
+        self.latencies = collections.deque(maxlen=self.WINDOW_SIZE)
+
+    def add(self, elapsedTime, isError):
+        self.requestCount += 1
+        if (isError):
+            self.errorCount += 1
+        self.totalTime += elapsedTime
+        self.maxTime = max(self.maxTime, elapsedTime)
+        self.latencies.append(elapsedTime)
+
+    def get_percentile(self, percent):
+        latencies = sorted(self.latencies)
+        if (len(latencies) == 0):
+            return 0
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))]
+
+    def get_json_obj(self):
+        return {
+            "requests": self.requestCount,
+            "errors": self.errorCount,
+            "meanMs": round(1000 * self.totalTime / self.requestCount, 1) if (self.requestCount > 0) else 0,
+            "p50Ms": round(1000 * self.get_percentile(50), 1),
+            "p95Ms": round(1000 * self.get_percentile(95), 1),
+            "maxMs": round(1000 * self.maxTime, 1)
+        }
+
+# Render maps on demand from members loaded once, see Amaping.serve()
+# Routes:
+#   /map.png   PNG map, query gives output settings (Ex: ?basketTypes=hebdo,pair&zoomLevel=14)
+#   /map.umap  uMap file, same settings
+#   /metrics   JSON latencies and cache statistics
+#   /health    "OK" once members are loaded
+# Bad settings and maps bigger than the configured maximum are answered with a 400
+class MapService:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    DEFAULT_PORT = 8000
+    DEFAULT_HOST = "127.0.0.1"
+    DEFAULT_MAX_MAP_SIZE = (4096, 4096)          # Bigger maps take minutes and GBs, too much for a request
+    BASE_LAYER_COUNT = 8                         # Base layers kept in memory between requests
+    MAP_ROUTES = {"/map.png": "png", "/map.umap": "umap"}
+    CONTENT_TYPES = {"png": "image/png", "umap": "application/json"}
+    # Parse query values of output settings, see Amaping.create_output()
+    QUERY_TYPES = {
+        "basketTypes": lambda value: [basketType for basketType in value.split(",") if basketType != ""],
+        "mapSize": str,
+        "zoomLevel": int,
+        "autoFit": lambda value: value.lower() in ("1", "true", "yes"),
+        "fitTrim": float,
+        "clusterRadius": int,
+        "strips": lambda value: value.lower() in ("1", "true", "yes"),
+        "compactUmap": lambda value: value.lower() in ("1", "true", "yes")
+    }
+
+    # =============
+    # Members
+    # =============
+
+    # app is an Amaping object with members loaded, tiles and base layers are shared by all requests
+    # Requests asking for a map wider or higher than maxMapSize (width, height) are refused
+    def __init__(self, app, host, port, tileFetcher, baseLayers, maxMapSize=DEFAULT_MAX_MAP_SIZE):
+        self.app = app
+        self.maxMapSize = maxMapSize
+        self.tileFetcher = tileFetcher
+        self.baseLayers = baseLayers
+        self.startTime = time.monotonic()
+        self.lock = threading.Lock()
+        self.routeMetrics = {}
+
+        self.server = ThreadingHTTPServer((host, port), MapRequestHandler)
+        self.server.daemon_threads = True
+        self.server.mapService = self
+
+    def get_address(self):
+        host, port = self.server.server_address[:2]
+        return "http://{0}:{1}".format(host, port)
+
+    def serve_forever(self):
+        Logger.info("Serving maps on {0}/map.png and {0}/map.umap".format(self.get_address()))
+        self.server.serve_forever()
+
+    def shutdown(self):
+        self.server.shutdown()
+
+    def close(self):
+        self.server.server_close()
+
+    def handle(self, request):
+        startTime = time.monotonic()
+        url = urllib.parse.urlsplit(request.path)
+
+        try:
+            status, contentType, body = self.route(url)
+        except Exception as e:
+            Logger.error("Request {0} failed: {1}".format(request.path, str(e)))
+            status, contentType, body = self.get_text_response(500, str(e))
+
+        # Unknown routes share their statistics
+        routeName = url.path if (url.path in self.MAP_ROUTES) or (url.path in ("/metrics", "/health")) else "other"
+
+        elapsedTime = time.monotonic() - startTime
+        with self.lock:
+            if (not routeName in self.routeMetrics):
+                self.routeMetrics[routeName] = RouteMetrics()
+            self.routeMetrics[routeName].add(elapsedTime, status != 200)
+
+        request.send_response(status)
+        request.send_header("Content-Type", contentType)
+        request.send_header("Content-Length", str(len(body)))
+        request.send_header("X-Render-Time-Ms", "{0:.1f}".format(1000 * elapsedTime))
+        request.end_headers()
+        request.wfile.write(body)
+
+    # Give (status, contentType, body) of a request
+    def route(self, url):
+        if (url.path in self.MAP_ROUTES):
+            fileFormat = self.MAP_ROUTES[url.path]
+            try:
+                output = self.parse_output(fileFormat, url.query)
+            except (RuntimeError, ValueError) as e:
+                return self.get_text_response(400, str(e))
+
+            return (200, self.CONTENT_TYPES[fileFormat], self.render(output))
+
+        if (url.path == "/metrics"):
+            return (200, "application/json", json.dumps(self.get_metrics(), indent=2).encode("utf-8"))
+
+        if (url.path == "/health"):
+            return self.get_text_response(200, "OK")
+
+        return self.get_text_response(404, "Unknown route {0}".format(url.path))
+
+    def get_text_response(self, status, text):
+        return (status, "text/plain; charset=utf-8", (text + "\n").encode("utf-8"))
+
+    # Output settings from a query string, files are never written by the service
+    # Bad settings raise RuntimeError or ValueError, they are answered with a 400
+    def parse_output(self, fileFormat, query):
+        values = {"format": fileFormat}
+        for key, value in urllib.parse.parse_qsl(query):
+            if (not key in self.QUERY_TYPES):
+                raise RuntimeError("Unknown output setting: {0}".format(key))
+            values[key] = self.QUERY_TYPES[key](value)
+
+        output = self.app.create_output(values)
+
+        width, height = output["mapSize"]
+        if (width > self.maxMapSize[0]) or (height > self.maxMapSize[1]):
+            raise RuntimeError("Output setting mapSize can't be larger than {0}x{1}, got {2}x{3}".format(
+                self.maxMapSize[0],
+                self.maxMapSize[1],
+                width,
+                height
+            ))
+
+        return output
+
+    def render(self, output):
+        memberIndexes = self.app.get_output_members(output)
+
+        if (output["format"] == "umap"):
+            stream = io.StringIO()
+            self.app.create_umap(output, memberIndexes).write_to(stream)
+            return stream.getvalue().encode("utf-8")
+
+        # Painters write to files, extra legend pages are not sent
+        painter = self.app.paint_png(output, self.tileFetcher, self.baseLayers)
+        try:
+            with tempfile.TemporaryDirectory() as tmpDir:
+                path = os.path.join(tmpDir, "map.png")
+                painter.save(path)
+                with open(path, "rb") as mapFile:
+                    return mapFile.read()
+        finally:
+            painter.close()
+
+    def get_metrics(self):
+        with self.lock:
+            routes = {path: metrics.get_json_obj() for path, metrics in sorted(self.routeMetrics.items())}
+
+        tileCache = self.tileFetcher.tileCache
+        return {
+            "uptimeS": round(time.monotonic() - self.startTime, 1),
+            "members": len(self.app.memberTable),
+            "routes": routes,
+            "baseLayers": {
+                "rendered": self.baseLayers.get_render_count(),
+                "reused": self.baseLayers.get_hit_count(),
+                "inMemory": self.baseLayers.get_layer_count()
+            },
+            "tiles": {
+                "downloaded": self.tileFetcher.downloadCount,
+                "fromCache": self.tileFetcher.cachedCount
+            },
+            "tileCache": {
+                "hits": tileCache.get_hit_count() if (tileCache != None) else 0,
+                "misses": tileCache.get_miss_count() if (tileCache != None) else 0
+            },
+            "geocodeCache": self.app.geocodeStats,
+            "stages": Logger.getMetrics()
+        }
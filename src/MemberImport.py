@@ -0,0 +1,86 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Clean the member CSV export column by column
+# File    : MemberImport.py
+# Date    : Oct. 18th, 2026
+
+import pandas                                   # Vectorized operations on CSV columns
+import numpy
+
+# Used when a name is given without first name
+DEFAULT_FIRSTNAME = "Prénom"
+
+# Same as _isset() but for a whole column
+def isset(column):
+    return column.notna() & (column.astype(str) != "")
+
+# Same as format_phone() but for a whole column
+def format_phone_column(column):
+    cleanPhone = column.astype(str).str.replace(r"[^0-9]+", "", regex=True)
+
+    # French numbers have 10 digits, insert dots by moving characters in a NumPy array
+    isFrench = cleanPhone.str.len() == 10
+    frenchChars = cleanPhone[isFrench].to_numpy(dtype="U10").view(numpy.uint32).reshape(-1, 10)
+    dottedChars = numpy.full((len(frenchChars), 14), ord("."), dtype=numpy.uint32)
+    dottedChars[:, [0, 1, 3, 4, 6, 7, 9, 10, 12, 13]] = frenchChars
+
+    formattedPhone = cleanPhone.copy()
+    formattedPhone[isFrench] = dottedChars.view("U14").ravel()
+    formattedPhone[~isFrench] = cleanPhone[~isFrench].str.replace(r"(\d)(?=(\d{2})+(?!\d))", r"\1.", regex=True)
+
+    return formattedPhone
+
+# Build a column with "NAME firstname" or "" if name isn't set
+def _display_name_column(name, firstname):
+    return (name.astype(str).str.upper() + " " + firstname.astype(str)).where(isset(name), "")
+
+# Give a table with one clean member per CSV row, same index as data:
+# - key, id : member id as string (key) and raw value, None if not set
+# - name, firstname, partnerName, partnerFirstname : people, "" if not set
+# - displayName : same as AmapMember.get_display_name()
+# - address, city, postalCode, phone, email : "" / <NA> if not set
+# - hasAddress, hasTwoAddresses : flags used for reporting
+# - rowHash : hash of the raw row, see RunManifest
+def clean_member_table(data):
+    table = pandas.DataFrame(index=data.index)
+
+    # Manage ID
+    idSet = isset(data['id'])
+    table["id"] = data['id'].astype(object).where(idSet, None)
+    table["key"] = data['id'].astype(str).where(idSet, None)
+
+    # Manage names (first name is optionnal)
+    nameColumns = (
+        ('Nom', 'Prénom', "name", "firstname"),
+        ('Nom partenaire', 'Prénom partenaire', "partnerName", "partnerFirstname")
+    )
+    for nameCol, firstnameCol, nameDest, firstnameDest in nameColumns:
+        nameSet = isset(data[nameCol])
+        table[nameDest] = data[nameCol].astype(str).where(nameSet, "")
+        table[firstnameDest] = data[firstnameCol].astype(str).where(isset(data[firstnameCol]), DEFAULT_FIRSTNAME).where(nameSet, "")
+
+    displayName = _display_name_column(table["name"], table["firstname"])
+    partnerDisplayName = _display_name_column(table["partnerName"], table["partnerFirstname"])
+    bothSet = (displayName != "") & (partnerDisplayName != "")
+    displayName = (displayName + ", ").where(bothSet, displayName) + partnerDisplayName
+    table["displayName"] = displayName.where(displayName != "", "<No name>")
+
+    # Manage address, first one wins
+    address1Set = isset(data['Adresse 1'])
+    address2Set = isset(data['Adresse 2'])
+    table["address"] = data['Adresse 1'].astype(str).where(address1Set, data['Adresse 2'].astype(str).where(address2Set, ""))
+    table["hasAddress"] = address1Set | address2Set
+    table["hasTwoAddresses"] = address1Set & address2Set
+
+    table["city"] = data['Ville'].astype(str).where(isset(data['Ville']), "")
+
+    # Pandas gives a float, cast it to int
+    table["postalCode"] = pandas.to_numeric(data['Code postal'], errors="coerce").astype("Int64")
+
+    table["phone"] = format_phone_column(data['Téléphone']).where(isset(data['Téléphone']), "")
+    table["email"] = data['Email'].astype(str).where(isset(data['Email']), "")
+
+    # Detect changed rows between runs
+    table["rowHash"] = pandas.util.hash_pandas_object(data, index=False).to_numpy()
+
+    return table
@@ -0,0 +1,157 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Store loaded members by columns
+# File    : MemberTable.py
+# Date    : Oct. 18th, 2026
+
+import math
+import numpy                                    # Positions and flags of all members
+
+# Give (codes, categories) of a list of strings, each distinct string is stored once
+def encode_strings(values):
+    categoryCodes = {}
+    codes = numpy.empty(len(values), dtype=numpy.int32)
+    for i, value in enumerate(values):
+        codes[i] = categoryCodes.setdefault(value, len(categoryCodes))
+
+    return (codes, numpy.array(list(categoryCodes) or [""], dtype=str))
+
+# Strings stored end to end in one UTF-8 buffer, like Arrow string arrays
+# A Python string costs about 50 bytes more than its characters
+class StringColumn:
+    def __init__(self, values):
+        encodedValues = [value.encode("utf-8") for value in values]
+        self.offsets = numpy.zeros(len(encodedValues) + 1, dtype=numpy.int64)
+        numpy.cumsum([len(value) for value in encodedValues], out=self.offsets[1:])
+        self.data = b"".join(encodedValues)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.data[self.offsets[index]:self.offsets[index + 1]].decode("utf-8")
+
+# Read only view of a row of a MemberTable, it has the getters of AmapMember
+# so code working on members works on rows too
+class MemberView:
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def get_display_name(self):
+        return self.table.names[self.index]
+
+    def get_address(self):
+        return self.table.streets[self.index]
+
+    def get_display_address(self):
+        return self.table.addresses[self.index]
+
+    def get_map_position(self):
+        return self.table.get_position(self.index)
+
+    def get_color(self):
+        return self.table.get_string("color", self.index)
+
+    def get_shape(self):
+        return self.table.get_string("shape", self.index)
+
+    def get_phone(self):
+        return self.table.phones[self.index]
+
+    def get_email(self):
+        return self.table.emails[self.index]
+
+    def get_type_panier(self):
+        return self.table.get_string("typePanier", self.index)
+
+    def get_role(self):
+        return self.table.get_string("role", self.index)
+
+    def is_on_map(self):
+        return bool(self.table.isOnMap[self.index])
+
+    def is_close_to_home(self):
+        return bool(self.table.isCloseToHome[self.index])
+
+# Members once loaded (geocoded, joined with the ODS file, with markers), one
+# array or list per attribute instead of one object per member.
+# Positions and flags are NumPy arrays so stages can work on all members at once,
+# attributes shared by many members (color, basket type...) are stored as codes.
+# Names, streets, addresses, phones and emails are kept in StringColumn buffers.
+class MemberTable:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    # Category column -> AmapMember getter
+    CATEGORY_COLUMNS = {"color": "get_color", "shape": "get_shape", "typePanier": "get_type_panier", "role": "get_role"}
+
+    # =============
+    # Members
+    # =============
+
+    # memberList contains AmapMember objects, they can be dropped once the table is built
+    def __init__(self, memberList):
+        positions = [member.get_map_position() for member in memberList]
+        self.lons = numpy.array([numpy.nan if (pos == None) else pos[0] for pos in positions], dtype=numpy.float64)
+        self.lats = numpy.array([numpy.nan if (pos == None) else pos[1] for pos in positions], dtype=numpy.float64)
+        self.isOnMap = numpy.array([member.is_on_map() for member in memberList], dtype=bool)
+        self.isCloseToHome = numpy.array([member.is_close_to_home() for member in memberList], dtype=bool)
+
+        self.names = StringColumn([member.get_display_name() for member in memberList])
+        self.streets = StringColumn([member.get_address() for member in memberList])
+        self.addresses = StringColumn([member.get_display_address() for member in memberList])
+        self.phones = StringColumn([member.get_phone() for member in memberList])
+        self.emails = StringColumn([member.get_email() for member in memberList])
+
+        self.codes = {}
+        self.categories = {}
+        for column, getterName in self.CATEGORY_COLUMNS.items():
+            self.codes[column], self.categories[column] = encode_strings([getattr(member, getterName)() for member in memberList])
+
+    def __len__(self):
+        return len(self.lons)
+
+    def get_view(self, index):
+        return MemberView(self, index)
+
+    # Give views of rows at indexes, in the same order
+    def get_views(self, indexes):
+        return [MemberView(self, index) for index in indexes]
+
+    # Give the (lon, lat) of a row, None when it is unknown
+    def get_position(self, index):
+        if (numpy.isnan(self.lons[index])):
+            return None
+        return (float(self.lons[index]), float(self.lats[index]))
+
+    # Give (lon, lat) positions of rows at indexes as a (n, 2) array
+    def get_positions(self, indexes):
+        return numpy.column_stack((self.lons[indexes], self.lats[indexes]))
+
+    def get_string(self, column, index):
+        return str(self.categories[column][self.codes[column][index]])
+
+    # Give values of a category column for rows at indexes as a string array
+    def get_strings(self, column, indexes):
+        return self.categories[column][self.codes[column][indexes]]
+
+    # Tell for rows at indexes if the value of a category column is one of values
+    def is_in(self, column, indexes, values):
+        valueCodes = numpy.flatnonzero(numpy.isin(self.categories[column], list(values)))
+        return numpy.isin(self.codes[column][indexes], valueCodes)
+
+    def is_located(self, indexes):
+        return ~numpy.isnan(self.lons[indexes])
+
+    # Give (name, (lon, lat), color, shape) markers of rows at indexes, see Painter.add_markers()
+    def get_markers(self, indexes):
+        colors = self.get_strings("color", indexes).tolist()
+        shapes = self.get_strings("shape", indexes).tolist()
+        positions = [None if math.isnan(lon) else (lon, lat) for lon, lat in zip(self.lons[indexes].tolist(), self.lats[indexes].tolist())]
+        return [(self.names[index], position, color, shape) for index, position, color, shape in zip(indexes, positions, colors, shapes)]
+
@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Find members by name without scanning the whole list
+# File    : NameIndex.py
+# Date    : Oct. 18th, 2026
+
+import re
+from TextFold import fold_text                  # Remove accents, case and punctuation
+
+# Build a comparable version of a name:
+# "Le Gall", "LE-GALL" and "légall" all give "legall"
+def fold_name(name):
+    return fold_text(name).replace(" ", "")
+
+# Give each part of a compound name: "Saint-Martin" gives "saint" and "martin"
+def split_name(name):
+    return [fold_name(part) for part in re.split(r"[\s\-']+", str(name)) if fold_name(part) != ""]
+
+class NameIndex:
+
+    def __init__(self, memberList):
+        self.fullNames = {}         # Folded name -> {id(member): (member, indexes of people carrying it)}
+        self.nameParts = {}         # Folded part of compound name -> same as fullNames
+
+        for member in memberList:
+            self.add_member(member)
+
+    def add_member(self, member):
+        # Couples are reachable from both names
+        for personIndex, (name, firstname) in enumerate(member.get_people()):
+            self._add_key(self.fullNames, fold_name(name), member, personIndex)
+
+            for part in split_name(name):
+                self._add_key(self.nameParts, part, member, personIndex)
+
+    def _add_key(self, index, key, member, personIndex):
+        if (key == ""):
+            return
+
+        # Members are keyed by identity, insertion order is kept
+        matches = index.setdefault(key, {})
+        if (not id(member) in matches):
+            matches[id(member)] = (member, set())
+        matches[id(member)][1].add(personIndex)
+
+    # Give {id(member): (member, people indexes)} carrying this name,
+    # exact names first, then parts of compound names
+    def lookup(self, name):
+        key = fold_name(name)
+
+        if (key in self.fullNames):
+            return self.fullNames[key]
+
+        return self.nameParts.get(key, {})
+
+    # Give all members matching both names, name2 is optional
+    # Members where both names are carried by two different people come first:
+    # a couple sharing a surname is not mistaken for a single person of that name
+    def find_candidates(self, name1, name2=""):
+        matches1 = self.lookup(name1)
+
+        if (name2 == ""):
+            return [member for member, people in matches1.values()]
+
+        matches2 = self.lookup(name2)
+        candidates = []
+        couples = []
+        for key, (member, people1) in matches1.items():
+            if (not key in matches2):
+                continue
+
+            candidates.append(member)
+            people2 = matches2[key][1]
+            if (len(people1 | people2) > 1):
+                couples.append(member)
+
+        if (len(couples) > 0):
+            return couples
+
+        return candidates
@@ -8,19 +8,26 @@ import Logger
 from PIL import Image                           # Used to display a image file
 from PIL import ImageDraw                       # Used to draw text and forms on images
 from PIL import ImageFont                       # Used to access text fonts
-import math                                     # For Pi constant
+from SpriteAtlas import SpriteAtlas             # Markers are drawn once then pasted
+from Legend import Legend, get_max_row_height   # Side bar layout for many members
+import numpy                                    # Project all markers at once
+import math
+import os
 
 class Painter:
 
-    MAX_SIDEBAR_ROW = 64
+    MAX_CLUSTER_SCALE = 2.5                      # Biggest cluster relative to a marker
 
     def __init__(self, mapGen):
         self.open(mapGen.get_img_obj())
 
-        self.sideBarRowCounter = 0
         self.sideBarWidth = 0
         self.sideBarFont = None
         self.mapGen = mapGen
+        self.spriteAtlas = SpriteAtlas()
+        self.legend = None
+        self.legendEntries = []
+        self.clusterFonts = {}
 
     def open_file(self, imgPath):
         self.imgPath = imgPath
@@ -35,19 +42,46 @@ class Painter:
     def show(self):
         self.img.show()
 
+    @Logger.Timer("write")
     def save(self, path=None):
         if (path == None):
             path = self.imgPath
 
         self.img.save(path)
 
+        # Legend that didn't fit in the side bar goes to map_legend_2.png, map_legend_3.png...
+        # Pages are rendered one at a time, only when written
+        pathBase, pathExt = os.path.splitext(path)
+        for pageIndex in range(1, self.get_legend_page_count()):
+            pagePath = "{0}_legend_{1}{2}".format(pathBase, pageIndex + 1, pathExt)
+            Logger.debug("Saving legend page to file \"{0}\"".format(pagePath))
+
+            # Saved on their own, on the side bar color
+            page = self.legend.render_page(pageIndex, self.legendEntries)
+            background = Image.new(self.img.mode, page.size, self.sideBarColor)
+            background.paste(page, (0, 0), page)
+            background.save(pagePath)
+            background.close()
+            page.close()
+
     def close(self):
         self.imgPath = ""
         self.img.close()
-
-    def add_side_bar(self, sideBarWidth, backColor=0xFFFFFF):
+        self.legend = None
+        self.legendEntries = []
+
+    # Side bar page plus extra legend pages
+    def get_legend_page_count(self):
+        if (self.legend == None):
+            return 1
+        return self.legend.pageCount
+
+    # sideBarHeight taller than the map (Ex: fitted map) extends the image below it
+    @Logger.Timer("paint")
+    def add_side_bar(self, sideBarWidth, backColor=0xFFFFFF, sideBarHeight=0):
         Logger.info("Adding side bar to image...")
         width, height = self.img.size
+        height = max(height, sideBarHeight)
 
         # Create a new image wider, paste previous content and move to this new object
         result = Image.new(self.img.mode, (width + sideBarWidth, height), backColor)
@@ -55,76 +89,19 @@ class Painter:
         self.img.close()
         self.open(result)
 
+        self.set_side_bar_size(sideBarWidth, height, backColor)
+
+    # Compute side bar metrics without touching the image
+    def set_side_bar_size(self, sideBarWidth, height, backColor=0xFFFFFF):
         self.sideBarWidth = sideBarWidth
         self.sideBarHeight = height
-        self.rowHeight = int(self.sideBarHeight / self.MAX_SIDEBAR_ROW)
+        self.sideBarColor = backColor
+        # Title and map markers have the size of the biggest legend font
+        self.rowHeight = get_max_row_height(self.sideBarHeight)
         self.sideBarPadding = int(sideBarWidth * 0.01)
         self.yPadding = self.sideBarPadding
-        # [Space][marker of heigh][Space][Text]
-        self.xPadding = self.sideBarPadding + self.rowHeight + self.sideBarPadding
-        self.markerSize = self.rowHeight * 0.95
-        self.sideBarFont = ImageFont.truetype('Arial.ttf', self.rowHeight)
-
-    def add_map_marker(self, markerPos, color, shape):
-        x, y = self.mapGen.lon_lat_to_px(markerPos)
-
-        # Don't forget the side bar on the left
-        x = x + self.sideBarWidth
-        self.add_icon_marker(x, y, color, shape)
-
-    def add_icon_marker(self, x, y, color, shape):
-        outlineColor = "black"
-        r = self.markerSize / 2
-
-        if (shape == "circle" or shape == "home"):
-            r = r * 0.90
-            self.artist.ellipse((x-r, y-r, x+r, y+r), fill=color, outline=outlineColor)
-        elif (shape == "rectangle"):
-            r = r * 0.80
-            self.artist.rectangle((x-r, y-r, x+r, y+r), fill=color, outline=outlineColor)
-        elif (shape == "triangle"):
-            alpha = (2 * math.pi) / 3 / 2
-            yUp = y - r * math.cos(alpha)
-            xHalfUp = r * math.sin(alpha)
-            xRight = x + xHalfUp
-            xLeft = x - xHalfUp
-
-            self.artist.polygon([(xLeft, yUp), (x, y + r), (xRight, yUp)], fill=color, outline=outlineColor)
-        elif (shape == "cross"):
-            thick = int(r * 0.50)
-            r = r * 0.80
-            line1Pos = (x-r, y-r, x+r, y+r)
-            line2Pos = (x+r, y-r, x-r, y+r)
-            self.artist.line(line1Pos, fill=color, width=thick)
-            self.artist.line(line2Pos, fill=color, width=thick)
-        elif (shape == "star") or (shape == "sun"):
-            if (shape == "star"):
-                picCount = 5
-                radiusFactor = 0.4
-            else:
-                picCount = 10
-                radiusFactor = 0.5
-            polyPoints = []
-            alpha = - math.pi / 2 # Begin at upper point
-            alphaStep = (2 * math.pi) / picCount / 2
-
-            # For each pic, add a sub pic at inferior radius
-            for i in range(0, picCount):
-                for picRadius in [r, r * radiusFactor]:
-                    pX = x + picRadius * math.cos(alpha)
-                    pY = y + picRadius * math.sin(alpha)
-                    polyPoints.append((pX, pY))
-                    alpha = alpha + alphaStep
-            self.artist.polygon(polyPoints, fill=color, outline=outlineColor)
-        else:
-            Logger.error("Unknown shape for marker: \"{0}\"".format(shape))
-            return
-
-    def add_side_bar_marker(self, row, color, shape):
-        x = self.xPadding / 2
-        y = self.yPadding + row * self.rowHeight + self.rowHeight / 2
-
-        self.add_icon_marker(x, y, color, shape)
+        self.markerSize = self.rowHeight * Legend.MARKER_RATIO
+        self.sideBarFont = ImageFont.truetype(Legend.FONT_FILE, self.rowHeight)
 
     def add_legend_title(self, text):
         # Compute position
@@ -134,29 +111,98 @@ class Painter:
         # Add Label
         self.artist.text((x, y), text, font=self.sideBarFont, fill=0x000000)
 
-    def add_legend_name(self, row, name, color, shape):
-        # Compute position
-        x = self.xPadding
-        y = self.yPadding + self.rowHeight * row
-
-        # Add Label
-        self.artist.text((x, y), name, font=self.sideBarFont, fill=0x000000)
-
-        # Add the corresponding marker
-        self.add_side_bar_marker(row, color, shape)
-
-    def add_marker(self, name, markerPos, color, shape):
+    # Add markers of a list of (name, markerPos, color, shape) on the map and their names in the side bar
+    # The legend below the title is laid out on as many columns and pages as needed
+    # and every marker is drawn on the map, even when its name goes to another page
+    # clusterList replaces markers on the map, see get_cluster_items()
+    @Logger.Timer("paint")
+    def add_markers(self, markerList, clusterList=None):
         # Ignore bad positions
-        if (markerPos == None):
-            return
-
-        # Check space left
-        if (self.sideBarRowCounter >= self.MAX_SIDEBAR_ROW):
-            Logger.warning("No more space left in the side bar !")
+        markerList = [marker for marker in markerList if marker[1] != None]
+        if (len(markerList) == 0):
             return
-        else:
-            self.sideBarRowCounter += 1
 
-        # Add to sidebar
-        self.add_legend_name(self.sideBarRowCounter, name, color, shape)
-        self.add_map_marker(markerPos, color, shape)
\ No newline at end of file
+        # First legend page is rendered as a whole then pasted under the title, next ones wait for save()
+        self.legendEntries = [(name, color, shape) for name, markerPos, color, shape in markerList]
+        self.legend = self.create_legend()
+        self.legend.layout([name for name, color, shape in self.legendEntries])
+
+        page = self.legend.render_page(0, self.legendEntries)
+        self.img.paste(page, (0, self.rowHeight), page)
+        page.close()
+
+        if (self.legend.pageCount > 1):
+            Logger.warning("Side bar is full, legend continues on {0} more page(s)".format(self.legend.pageCount - 1))
+
+        spriteList, pieList = self.get_map_items(markerList, clusterList)
+        self.spriteAtlas.paste_all(self.img, spriteList, self.markerSize)
+        self.draw_clusters(self.img, pieList)
+
+    # Legend fills the side bar under the title
+    def create_legend(self):
+        return Legend(self.sideBarWidth - 1, self.sideBarHeight - self.rowHeight, self.rowHeight, self.spriteAtlas)
+
+    # Give (x, y, shape, color) of markers on the image, markers out of the map are not drawn
+    def get_map_sprites(self, markerList):
+        # Project all positions at once
+        positions = numpy.array([marker[1] for marker in markerList], dtype=numpy.float64)
+        xPx, yPx, isInCanvas = self.mapGen.lon_lat_to_px_array(positions[:, 0], positions[:, 1], margin=int(self.markerSize))
+
+        spriteList = []
+        for i in numpy.nonzero(isInCanvas)[0]:
+            name, markerPos, color, shape = markerList[i]
+            spriteList.append((int(xPx[i]) + self.sideBarWidth, int(yPx[i]), shape, color))
+
+        return spriteList
+
+    # Give (spriteList, pieList) to draw on the map
+    # clusterList contains (markerPos, count, slices, marker), clusters of one marker are
+    # drawn as the marker itself, others as a pie of slices (color, count) with the count inside
+    def get_map_items(self, markerList, clusterList=None):
+        if (clusterList == None):
+            return (self.get_map_sprites(markerList), [])
+
+        singleList = [cluster[3] for cluster in clusterList if cluster[1] == 1]
+        groupList = [cluster for cluster in clusterList if cluster[1] > 1]
+        spriteList = self.get_map_sprites(singleList) if (len(singleList) > 0) else []
+
+        pieList = []
+        if (len(groupList) > 0):
+            positions = numpy.array([cluster[0] for cluster in groupList], dtype=numpy.float64)
+            maxRadius = self.markerSize * self.MAX_CLUSTER_SCALE / 2
+            xPx, yPx, isInCanvas = self.mapGen.lon_lat_to_px_array(positions[:, 0], positions[:, 1], margin=int(maxRadius))
+
+            for i in numpy.nonzero(isInCanvas)[0]:
+                markerPos, count, slices, marker = groupList[i]
+                radius = int(min(maxRadius, self.markerSize / 2 * (1 + 0.4 * math.log2(count))))
+                pieList.append((int(xPx[i]) + self.sideBarWidth, int(yPx[i]), radius, count, slices))
+
+        return (spriteList, pieList)
+
+    def get_cluster_font(self, size):
+        size = max(1, int(size))
+        if (not size in self.clusterFonts):
+            self.clusterFonts[size] = ImageFont.truetype('Arial.ttf', size)
+        return self.clusterFonts[size]
+
+    # Draw pies (x, y, radius, count, slices), yOffset is the image top on the whole map
+    def draw_clusters(self, img, pieList, yOffset=0):
+        artist = ImageDraw.Draw(img)
+
+        for x, y, radius, count, slices in pieList:
+            y = y - yOffset
+            box = (x - radius, y - radius, x + radius, y + radius)
+
+            # One slice per category, starting at the top
+            angle = -90
+            for color, sliceCount in slices:
+                sliceAngle = 360 * sliceCount / count
+                artist.pieslice(box, angle, angle + sliceAngle, fill=color)
+                angle += sliceAngle
+            artist.ellipse(box, outline="black", width=2)
+
+            # Count is written in a white disc
+            # Pixel coordinates so clusters drawn by strips look the same
+            innerRadius = int(radius * 0.6)
+            artist.ellipse((x - innerRadius, y - innerRadius, x + innerRadius, y + innerRadius), fill="white", outline="black")
+            artist.text((x, y), str(count), font=self.get_cluster_font(innerRadius), fill="black", anchor="mm")
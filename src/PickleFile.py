@@ -0,0 +1,15 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Store data between runs without leaving a half written file
+# File    : PickleFile.py
+# Date    : Oct. 18th, 2026
+
+import os
+import pickle
+
+# Write to a temporary file first so an interrupted run can't corrupt the previous content
+def dump_pickle(path, content, protocol=pickle.DEFAULT_PROTOCOL):
+    tmpPath = path + ".tmp"
+    with open(tmpPath, 'wb') as f:
+        pickle.dump(content, f, protocol=protocol)
+    os.replace(tmpPath, path)
@@ -0,0 +1,105 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Remember CSV rows processed by the previous run
+# File    : RunManifest.py
+# Date    : Oct. 18th, 2026
+
+import Logger
+import pickle                                   # Store processed members between runs
+from PickleFile import dump_pickle              # Save without corrupting the previous run
+
+class RunManifest:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    VERSION = 4                                  # Increase when the stored member format changes
+
+    # =============
+    # Members
+    # =============
+
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = (self.VERSION, settings)
+        self.previousRows = {}
+        self.rows = {}
+        self.addedCount = 0
+        self.modifiedCount = 0
+        self.unchangedCount = 0
+        self.retriedCount = 0
+
+        self.load()
+
+    def load(self):
+        try:
+            f = open(self.path, 'rb')
+        except Exception as e:
+            Logger.info("There is no run manifest to load")
+            return
+
+        with f:
+            try:
+                content = pickle.load(f)
+            except Exception as e:
+                Logger.warning("Run manifest is unreadable, ignoring it: " + str(e))
+                return
+
+        # Results depend on run settings (home position...), drop them if they changed
+        if (content.get("settings") != self.settings):
+            Logger.info("Run settings changed, all rows will be processed")
+            return
+
+        self.previousRows = content["rows"]
+
+    # Give the stored [member, reportLines] if the row didn't change, None otherwise
+    # Rows are identified by member id, rows without id (None) are always processed
+    # Rows that failed last time are processed again
+    def get(self, rowKey, rowHash):
+        # Duplicated ids are processed each time
+        if (rowKey == None) or (rowKey in self.rows):
+            return None
+
+        entry = self.previousRows.get(rowKey)
+        if (entry == None):
+            self.addedCount += 1
+            return None
+
+        storedHash, result, failed = entry
+        if (storedHash != rowHash):
+            self.modifiedCount += 1
+            return None
+
+        if (failed):
+            self.retriedCount += 1
+            return None
+
+        self.unchangedCount += 1
+        self.rows[rowKey] = entry
+        return result
+
+    # failed tells the row couldn't be processed (Ex: address not found), only its hash is kept
+    def set(self, rowKey, rowHash, result, failed=False):
+        if (rowKey == None):
+            return
+
+        self.rows[rowKey] = (rowHash, None if failed else result, failed)
+
+    # Only rows seen during this run are kept, removed members are forgotten
+    def save(self):
+        removedCount = len(set(self.previousRows) - set(self.rows))
+        Logger.info("Run manifest: {0} unchanged, {1} added, {2} modified, {3} retried, {4} removed row(s)".format(
+            self.unchangedCount,
+            self.addedCount,
+            self.modifiedCount,
+            self.retriedCount,
+            removedCount
+        ))
+
+        failedCount = sum(1 for storedHash, result, failed in self.rows.values() if failed)
+        if (failedCount > 0):
+            Logger.info("Run manifest: {0} failed row(s) will be retried next run".format(failedCount))
+
+        dump_pickle(self.path, {"settings": self.settings, "rows": self.rows})
+        Logger.debug("Saving run manifest to file")
@@ -0,0 +1,83 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Read spreadsheet sheets once and keep them while the file doesn't change
+# File    : SheetCache.py
+# Date    : Oct. 18th, 2026
+
+import Logger
+import os
+import pickle                                   # Store parsed sheets between runs
+from PickleFile import dump_pickle              # Save without corrupting the previous cache
+import pandas                                   # Read ODS files
+
+# The odf engine parses the whole zipped XML document for each read, that's the
+# slowest part of the ODS join. Sheets are read in a single pass and the data
+# frames are pickled with the file path, modification time and size: an unchanged
+# workbook is loaded from the pickle on later runs.
+class SheetCache:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    VERSION = 1                                  # Increase when the stored format changes
+
+    # =============
+    # Members
+    # =============
+
+    # path is the pickle file, None to parse workbooks on each read
+    def __init__(self, path):
+        self.path = path
+
+    # Identify a workbook version, any change of the file gives another key
+    def get_key(self, filename, sheetNames):
+        stat = os.stat(filename)
+        return (self.VERSION, os.path.abspath(filename), stat.st_mtime_ns, stat.st_size, tuple(sheetNames))
+
+    # Give {sheetName: DataFrame} of the sheets of a workbook
+    def read(self, filename, sheetNames):
+        key = self.get_key(filename, sheetNames)
+        sheets = self.load(key)
+        if (sheets != None):
+            Logger.info("ODS - Using cached sheets of " + filename)
+            Logger.count("sheetCache.hits")
+            return sheets
+
+        Logger.info("ODS - Reading sheets " + ", ".join(sheetNames))
+        Logger.count("sheetCache.misses")
+
+        # A sheet list makes pandas open the document once for all sheets
+        sheets = pandas.read_excel(filename, engine='odf', sheet_name=list(sheetNames))
+        self.save(key, sheets)
+        return sheets
+
+    def load(self, key):
+        if (self.path == None):
+            return None
+
+        try:
+            f = open(self.path, 'rb')
+        except Exception as e:
+            Logger.debug("There is no sheet cache to load")
+            return None
+
+        with f:
+            try:
+                content = pickle.load(f)
+            except Exception as e:
+                Logger.warning("Sheet cache is unreadable, ignoring it: " + str(e))
+                return None
+
+        if (content.get("key") != key):
+            Logger.debug("Workbook changed since it was cached")
+            return None
+
+        return content["sheets"]
+
+    def save(self, key, sheets):
+        if (self.path == None):
+            return
+
+        dump_pickle(self.path, {"key": key, "sheets": sheets}, protocol=pickle.HIGHEST_PROTOCOL)
+        Logger.debug("Saving sheet cache to file")
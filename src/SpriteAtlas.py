@@ -0,0 +1,170 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Draw each kind of marker once and reuse it
+# File    : SpriteAtlas.py
+# Date    : Oct. 18th, 2026
+
+import Logger
+import math                                     # For Pi constant
+import numpy                                    # Select markers of each band
+from PIL import Image                           # Sprites are small RGBA images
+from PIL import ImageDraw                       # Used to draw forms on sprites
+
+# Draw a marker shape centered on (x, y) with radius r
+def draw_shape(artist, x, y, r, color, shape, lineWidth=1):
+    outlineColor = "black"
+
+    if (shape == "circle" or shape == "home"):
+        r = r * 0.90
+        artist.ellipse((x-r, y-r, x+r, y+r), fill=color, outline=outlineColor, width=lineWidth)
+    elif (shape == "rectangle"):
+        r = r * 0.80
+        artist.rectangle((x-r, y-r, x+r, y+r), fill=color, outline=outlineColor, width=lineWidth)
+    elif (shape == "triangle"):
+        alpha = (2 * math.pi) / 3 / 2
+        yUp = y - r * math.cos(alpha)
+        xHalfUp = r * math.sin(alpha)
+        xRight = x + xHalfUp
+        xLeft = x - xHalfUp
+
+        artist.polygon([(xLeft, yUp), (x, y + r), (xRight, yUp)], fill=color, outline=outlineColor, width=lineWidth)
+    elif (shape == "cross"):
+        thick = int(r * 0.50)
+        r = r * 0.80
+        line1Pos = (x-r, y-r, x+r, y+r)
+        line2Pos = (x+r, y-r, x-r, y+r)
+        artist.line(line1Pos, fill=color, width=thick)
+        artist.line(line2Pos, fill=color, width=thick)
+    elif (shape == "star") or (shape == "sun"):
+        if (shape == "star"):
+            picCount = 5
+            radiusFactor = 0.4
+        else:
+            picCount = 10
+            radiusFactor = 0.5
+        polyPoints = []
+        alpha = - math.pi / 2 # Begin at upper point
+        alphaStep = (2 * math.pi) / picCount / 2
+
+        # For each pic, add a sub pic at inferior radius
+        for i in range(0, picCount):
+            for picRadius in [r, r * radiusFactor]:
+                pX = x + picRadius * math.cos(alpha)
+                pY = y + picRadius * math.sin(alpha)
+                polyPoints.append((pX, pY))
+                alpha = alpha + alphaStep
+        artist.polygon(polyPoints, fill=color, outline=outlineColor, width=lineWidth)
+    else:
+        return False
+
+    return True
+
+class SpriteAtlas:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    SUPERSAMPLING = 4                            # Draw 4x bigger then reduce for antialiasing
+    BAND_HEIGHT = 128                            # Image rows painted together, they stay in CPU cache
+
+    # =============
+    # Members
+    # =============
+
+    def __init__(self):
+        self.sprites = {}
+        self.premultiplied = {}                  # Same sprites in RGBa mode
+
+    # Give (RGBA image, x offset, y offset) of the marker, None if shape is unknown
+    # Offsets give the position of the image top left corner from the marker center
+    def get_sprite(self, shape, color, size):
+        key = (shape, color, size)
+        if (key in self.sprites):
+            return self.sprites[key]
+
+        # Keep some space for lines going out of the radius
+        r = size / 2
+        side = 2 * math.ceil(r * 1.1) + 2
+        scale = self.SUPERSAMPLING
+
+        bigSprite = Image.new("RGBA", (side * scale, side * scale), (0, 0, 0, 0))
+        artist = ImageDraw.Draw(bigSprite)
+        center = side * scale / 2
+        if (not draw_shape(artist, center, center, r * scale, color, shape, lineWidth=scale)):
+            Logger.error("Unknown shape for marker: \"{0}\"".format(shape))
+            self.sprites[key] = None
+            return None
+
+        # Remove transparent borders, less pixels to blend on each paste
+        sprite = bigSprite.resize((side, side), Image.Resampling.BOX)
+        box = sprite.getbbox()
+        self.sprites[key] = (sprite.crop(box), box[0] - side / 2, box[1] - side / 2)
+
+        return self.sprites[key]
+
+    # Give (RGBa image, x offset, y offset) of the marker, colors are multiplied by alpha
+    # so that blending it on a RGB image costs less, None if shape is unknown
+    def get_premultiplied(self, shape, color, size):
+        key = (shape, color, size)
+        if (not key in self.premultiplied):
+            entry = self.get_sprite(shape, color, size)
+            if (entry != None):
+                sprite, xOffset, yOffset = entry
+                entry = (sprite.convert("RGBa"), xOffset, yOffset)
+                entry[0].load()
+            self.premultiplied[key] = entry
+
+        return self.premultiplied[key]
+
+    # Paste many sprites in one pass, markerList contains (x, y, shape, color)
+    # Markers are drawn in list order so overlapping ones look the same as before
+    def paste_all(self, img, markerList, size):
+        # Transparent layers (Ex: legend) are blended with the sprites as they are
+        getSprite = self.get_premultiplied if (img.mode == "RGB") else self.get_sprite
+
+        spriteList = []
+        for x, y, shape, color in markerList:
+            entry = getSprite(shape, color, size)
+            if (entry == None):
+                continue
+
+            sprite, xOffset, yOffset = entry
+            spriteList.append((int(round(x + xOffset)), int(round(y + yOffset)), sprite))
+
+        if (img.mode != "RGB"):
+            for left, top, sprite in spriteList:
+                img.paste(sprite, (left, top), sprite)
+            return
+
+        self.paste_bands(img, spriteList)
+
+    # Paste premultiplied (left, top, sprite) on a RGB image band by band
+    # Sprites are pasted in a copy of the band, small enough to stay in CPU cache, instead
+    # of jumping all over the image. Sprites crossing bands are cut and keep list order in
+    # each band, the result is the same.
+    def paste_bands(self, img, spriteList):
+        if (len(spriteList) == 0):
+            return
+
+        tops = numpy.array([top for left, top, sprite in spriteList], dtype=numpy.int64)
+        bottoms = tops + numpy.array([sprite.size[1] for left, top, sprite in spriteList], dtype=numpy.int64)
+        width, height = img.size
+
+        for bandTop in range(max(0, int(tops.min())), min(height, int(bottoms.max())), self.BAND_HEIGHT):
+            bandBottom = min(height, bandTop + self.BAND_HEIGHT)
+            indexes = numpy.nonzero((tops < bandBottom) & (bottoms > bandTop))[0]
+            if (len(indexes) == 0):
+                continue
+
+            band = img.crop((0, bandTop, width, bandBottom))
+            band.load()
+            for index in indexes.tolist():
+                left, top, sprite = spriteList[index]
+                top -= bandTop
+
+                # Sprites going out of the band are clipped
+                band.paste(sprite, (left, top), sprite)
+
+            img.paste(band, (0, bandTop))
+            band.close()
@@ -0,0 +1,86 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : On-disk cache shared by threads and runs, base of GeocodeCache and TileCache
+# File    : SqliteCache.py
+# Date    : Oct. 18th, 2026
+
+import Logger
+import sqlite3                                  # On-disk storage, safe to share between runs
+import threading
+import time
+
+# Subclasses give their table schema, their LAST_USED_QUERY and their eviction
+# policy in remove_entries()
+class SqliteCache:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    BUSY_TIMEOUT_S = 30                          # Wait for other runs holding the lock
+    LAST_USED_BATCH = 1000                       # Pending lastUsed updates written at once
+    LAST_USED_QUERY = None                       # UPDATE of lastUsed taking (lastUsed, *key)
+    CACHE_NAME = "Cache"                         # For logs
+
+    # =============
+    # Members
+    # =============
+
+    # schema is the list of statements creating tables and indexes
+    def __init__(self, path, schema):
+        self.path = path
+        self.hitCount = 0
+        self.missCount = 0
+        self.lastUsed = {}                       # Key tuple -> last hit time, not written yet
+
+        # Connection is shared between threads, serialize access ourselves
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=self.BUSY_TIMEOUT_S, check_same_thread=False)
+
+        # WAL lets several runs read while another one is writing
+        self.db.execute("PRAGMA journal_mode=WAL")
+        for statement in schema:
+            self.db.execute(statement)
+        self.db.commit()
+
+    # Remember a hit on key, lock must be held
+    # Hits don't write, lastUsed is only needed by evict()
+    def touch(self, key, now):
+        self.lastUsed[key] = now
+        if (len(self.lastUsed) >= self.LAST_USED_BATCH):
+            self.write_last_used()
+
+    # Write pending lastUsed updates in one transaction, lock must be held
+    def write_last_used(self):
+        if (len(self.lastUsed) == 0):
+            return
+
+        self.db.executemany(self.LAST_USED_QUERY, [(lastUsed,) + key for key, lastUsed in self.lastUsed.items()])
+        self.db.commit()
+        self.lastUsed = {}
+
+    # Write pending lastUsed updates then remove entries chosen by remove_entries()
+    def evict(self):
+        with self.lock:
+            self.write_last_used()
+            removedCount = self.remove_entries(time.time())
+            self.db.commit()
+
+        if (removedCount > 0):
+            Logger.debug("{0}: {1} entries evicted".format(self.CACHE_NAME, removedCount))
+
+    # Delete entries not worth keeping at time now and give their count, lock must be held
+    # Nothing is removed by default
+    def remove_entries(self, now):
+        return 0
+
+    def get_hit_count(self):
+        return self.hitCount
+
+    def get_miss_count(self):
+        return self.missCount
+
+    def close(self):
+        self.evict()
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,245 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Paint very large maps strip by strip to keep memory bounded
+# File    : StripPainter.py
+# Date    : Oct. 18th, 2026
+
+import Logger
+import os
+import zlib                                     # PNG compression
+import struct
+import numpy                                    # PNG row filtering
+from PIL import Image
+from PIL import ImageDraw
+from Painter import Painter                     # Same layout as a regular map
+from SpriteAtlas import SpriteAtlas
+
+# Write a RGB PNG file row by row, nothing but the current rows is kept in memory
+class PngWriter:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    SIGNATURE = b'\x89PNG\r\n\x1a\n'
+    CHUNK_SIZE = 256 * 1024                      # Size of IDAT chunks
+    COMPRESS_LEVEL = 6
+    FILTER_SUB = 1                               # Each byte minus the one of the previous pixel
+
+    # =============
+    # Members
+    # =============
+
+    # File is written next to path then moved to path on close()
+    def __init__(self, path, width, height):
+        self.path = path
+        self.tmpPath = path + ".tmp"
+        self.width = width
+        self.height = height
+        self.rowCount = 0
+        self.compressor = zlib.compressobj(self.COMPRESS_LEVEL)
+        self.pending = []
+        self.pendingSize = 0
+
+        self.file = open(self.tmpPath, "wb")
+        self.file.write(self.SIGNATURE)
+        # 8 bits per channel, color type 2 (RGB), no interlace
+        self.write_chunk(b'IHDR', struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def write_chunk(self, chunkType, data):
+        self.file.write(struct.pack(">I", len(data)))
+        self.file.write(chunkType)
+        self.file.write(data)
+        self.file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunkType))))
+
+    # Append a RGB image having the PNG width as next rows
+    def write_image(self, img):
+        if (img.size[0] != self.width) or (self.rowCount + img.size[1] > self.height):
+            raise RuntimeError("Strip of size {0}x{1} doesn't fit in PNG".format(img.size[0], img.size[1]))
+
+        rows = numpy.frombuffer(img.tobytes(), dtype=numpy.uint8).reshape(img.size[1], self.width * 3)
+
+        # Filter byte then filtered row, uint8 wraps around as PNG expects
+        filtered = numpy.empty((rows.shape[0], rows.shape[1] + 1), dtype=numpy.uint8)
+        filtered[:, 0] = self.FILTER_SUB
+        filtered[:, 1:4] = rows[:, :3]
+        numpy.subtract(rows[:, 3:], rows[:, :-3], out=filtered[:, 4:])
+
+        self.add_data(self.compressor.compress(filtered.tobytes()))
+        self.rowCount += img.size[1]
+
+    def add_data(self, data):
+        self.pending.append(data)
+        self.pendingSize += len(data)
+        if (self.pendingSize >= self.CHUNK_SIZE):
+            self.flush()
+
+    def flush(self):
+        if (self.pendingSize > 0):
+            self.write_chunk(b'IDAT', b''.join(self.pending))
+        self.pending = []
+        self.pendingSize = 0
+
+    def close(self):
+        if (self.rowCount != self.height):
+            self.file.close()
+            os.remove(self.tmpPath)
+            raise RuntimeError("PNG has {0} rows, {1} expected".format(self.rowCount, self.height))
+
+        self.add_data(self.compressor.flush())
+        self.flush()
+        self.write_chunk(b'IEND', b'')
+        self.file.close()
+        os.replace(self.tmpPath, self.path)
+
+# Same output as Painter but the map, side bar and markers are
+# drawn one tile row at a time and streamed to the PNG file
+class StripPainter(Painter):
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    LEGEND_STRIP_HEIGHT = 256                    # Extra legend pages have no tiles to follow
+
+    # =============
+    # Members
+    # =============
+
+    # The map is not rendered before, tiles are fetched strip by strip
+    # sideBarHeight taller than the map extends the image below it, see Painter.add_side_bar()
+    def __init__(self, mapGen, sideBarWidth, backColor=0xFFFFFF, sideBarHeight=0):
+        self.mapGen = mapGen
+        self.spriteAtlas = SpriteAtlas()
+        self.legend = None
+        self.legendEntries = []
+        self.clusterFonts = {}
+        self.title = None
+        self.markerList = []
+        self.clusterList = None
+
+        self.width = mapGen.mapSize[0] + sideBarWidth
+        self.height = max(mapGen.mapSize[1], sideBarHeight)
+        self.set_side_bar_size(sideBarWidth, self.height, backColor)
+
+    def add_legend_title(self, text):
+        self.title = text
+
+    def add_markers(self, markerList, clusterList=None):
+        # Ignore bad positions
+        self.markerList = [marker for marker in markerList if marker[1] != None]
+        self.clusterList = clusterList
+
+    # List (top, bottom, tiles) of strips, one strip per row of tiles
+    # then strips without tiles for the side bar below the map
+    def get_strip_list(self):
+        staticMap = self.mapGen.map
+        self.mapGen.set_map_center()
+
+        tileRows = {}
+        for tile in staticMap.get_tile_list():
+            tileRows.setdefault(tile[1], []).append(tile)
+
+        mapHeight = self.mapGen.mapSize[1]
+        stripList = []
+        for y in sorted(tileRows):
+            top = max(0, staticMap._y_to_px(y))
+            bottom = min(mapHeight, staticMap._y_to_px(y + 1))
+            if (bottom > top):
+                stripList.append((top, bottom, tileRows[y]))
+
+        for top in range(mapHeight, self.height, self.LEGEND_STRIP_HEIGHT):
+            stripList.append((top, min(self.height, top + self.LEGEND_STRIP_HEIGHT), []))
+
+        return stripList
+
+    # Painting and writing can't be told apart, both are timed as write
+    @Logger.Timer("write")
+    def save(self, path):
+        Logger.info("Painting map by strips...")
+        if (self.mapGen.tileFetcher.offline):
+            self.mapGen.check_offline_tiles()
+
+        entryList = [(name, color, shape) for name, markerPos, color, shape in self.markerList]
+        legend = self.create_legend()
+        legend.layout([name for name, color, shape in entryList])
+
+        # Markers are selected for each strip by their y position
+        spriteList, pieList = ([], [])
+        if (len(self.markerList) > 0):
+            spriteList, pieList = self.get_map_items(self.markerList, self.clusterList)
+        spriteYs = numpy.array([sprite[1] for sprite in spriteList], dtype=numpy.int64)
+        pieYs = numpy.array([pie[1] for pie in pieList], dtype=numpy.int64)
+        pieMargin = int(self.markerSize * self.MAX_CLUSTER_SCALE)
+
+        pngWriter = PngWriter(path, self.width, self.height)
+        stripList = self.get_strip_list()
+        tileCount = 0
+
+        for top, bottom, tiles in stripList:
+            strip = Image.new("RGB", (self.width, bottom - top), self.sideBarColor)
+
+            # Map is clipped to its own area, as when rendered as a whole
+            if (len(tiles) > 0):
+                mapStrip = Image.new("RGB", (self.mapGen.mapSize[0], bottom - top), self.mapGen.map.background_color)
+                self.mapGen.map.draw_tiles(mapStrip, tiles, yOffset=top, quiet=True)
+                strip.paste(mapStrip, (self.sideBarWidth - 1, 0))
+                mapStrip.close()
+                tileCount += len(tiles)
+
+            if (self.title != None):
+                ImageDraw.Draw(strip).text((self.sideBarPadding, self.yPadding - top), self.title, font=self.sideBarFont, fill=0x000000)
+
+            self.draw_legend_strip(strip, top, legend, 0, entryList, self.rowHeight)
+
+            # Keep markers overlapping the strip, in list order
+            margin = int(self.markerSize)
+            indexes = numpy.nonzero((spriteYs >= top - margin) & (spriteYs < bottom + margin))[0]
+            stripSprites = [(x, y - top, shape, color) for x, y, shape, color in (spriteList[i] for i in indexes)]
+            self.spriteAtlas.paste_all(strip, stripSprites, self.markerSize)
+
+            indexes = numpy.nonzero((pieYs >= top - pieMargin) & (pieYs < bottom + pieMargin))[0]
+            self.draw_clusters(strip, [pieList[i] for i in indexes], yOffset=top)
+
+            pngWriter.write_image(strip)
+            strip.close()
+
+        pngWriter.close()
+        Logger.info("Painted {0} tile(s) in {1} strip(s)".format(tileCount, len(stripList)))
+
+        # Legend that didn't fit in the side bar goes to map_legend_2.png, map_legend_3.png...
+        if (legend.pageCount > 1):
+            Logger.warning("Side bar is full, legend continues on {0} more page(s)".format(legend.pageCount - 1))
+
+        pathBase, pathExt = os.path.splitext(path)
+        for pageIndex in range(1, legend.pageCount):
+            pagePath = "{0}_legend_{1}{2}".format(pathBase, pageIndex + 1, pathExt)
+            Logger.debug("Saving legend page to file \"{0}\"".format(pagePath))
+            self.save_legend_page(pagePath, legend, pageIndex, entryList)
+
+    # Draw the part of a legend page between top and bottom on strip
+    # Legend is drawn on a transparent layer first, as Painter does
+    def draw_legend_strip(self, strip, top, legend, pageIndex, entryList, legendTop):
+        layer = Image.new("RGBA", (legend.width, strip.size[1]), (0, 0, 0, 0))
+        legend.draw_page(layer, pageIndex, entryList, yOrigin=legendTop - top)
+        strip.paste(layer, (0, 0), layer)
+        layer.close()
+
+    def save_legend_page(self, path, legend, pageIndex, entryList):
+        pngWriter = PngWriter(path, legend.width, legend.height)
+
+        for top in range(0, legend.height, self.LEGEND_STRIP_HEIGHT):
+            bottom = min(legend.height, top + self.LEGEND_STRIP_HEIGHT)
+            strip = Image.new("RGB", (legend.width, bottom - top), self.sideBarColor)
+            self.draw_legend_strip(strip, top, legend, pageIndex, entryList, 0)
+            pngWriter.write_image(strip)
+            strip.close()
+
+        pngWriter.close()
+
+    # The whole image is never in memory
+    def show(self):
+        Logger.warning("Map preview is not available when painting by strips")
+
+    def close(self):
+        self.markerList = []
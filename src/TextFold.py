@@ -0,0 +1,15 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Compare texts whatever their case, accents and punctuation
+# File    : TextFold.py
+# Date    : Oct. 18th, 2026
+
+import re
+import unicodedata                              # Remove accents
+
+# Lower case ASCII words, Ex: "Av. de l'Église" -> "av de l eglise"
+# Used by NameIndex for names and by AddressNormalizer for addresses
+def fold_text(text):
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return " ".join(re.sub("[^a-z0-9]+", " ", text).split())
@@ -0,0 +1,117 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Persistent cache of map tiles
+# File    : TileCache.py
+# Date    : Oct. 18th, 2026
+
+import Logger
+import time
+from SqliteCache import SqliteCache             # Shared SQLite setup and lastUsed updates
+
+class TileCache(SqliteCache):
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    DEFAULT_MAX_SIZE_MB = 512
+    DEFAULT_MAX_AGE_DAYS = 7                     # OSM tile usage policy, revalidate after
+    SECONDS_PER_DAY = 24 * 3600
+    LAST_USED_QUERY = "UPDATE tile SET lastUsed = MAX(lastUsed, ?) WHERE template = ? AND z = ? AND x = ? AND y = ?"
+    CACHE_NAME = "Tile cache"
+
+    # =============
+    # Members
+    # =============
+
+    def __init__(self, path, maxSizeMb=DEFAULT_MAX_SIZE_MB, maxAgeDays=DEFAULT_MAX_AGE_DAYS):
+        self.maxSize = maxSizeMb * 1024 * 1024
+        self.maxAge = maxAgeDays * self.SECONDS_PER_DAY
+
+        super().__init__(path, [
+            """CREATE TABLE IF NOT EXISTS tile (
+                template TEXT NOT NULL,
+                z INTEGER NOT NULL,
+                x INTEGER NOT NULL,
+                y INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                etag TEXT,
+                lastModified TEXT,
+                timestamp REAL NOT NULL,
+                lastUsed REAL NOT NULL,
+                PRIMARY KEY (template, z, x, y)
+            )""",
+            "CREATE INDEX IF NOT EXISTS tileLastUsed ON tile (lastUsed)"
+        ])
+
+    # Return a dict with data, etag, lastModified and isFresh, None if not in cache
+    def get(self, template, z, x, y):
+        now = time.time()
+
+        with self.lock:
+            row = self.db.execute(
+                "SELECT data, etag, lastModified, timestamp FROM tile WHERE template = ? AND z = ? AND x = ? AND y = ?",
+                (template, z, x, y)
+            ).fetchone()
+
+            if (row == None):
+                self.missCount += 1
+                Logger.count("tileCache.misses")
+                return None
+
+            self.touch((template, z, x, y), now)
+            self.hitCount += 1
+            Logger.count("tileCache.hits")
+
+        data, etag, lastModified, timestamp = row
+        return {
+            "data": data,
+            "etag": etag,
+            "lastModified": lastModified,
+            "isFresh": (now - timestamp) <= self.maxAge
+        }
+
+    def contains(self, template, z, x, y):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT 1 FROM tile WHERE template = ? AND z = ? AND x = ? AND y = ?",
+                (template, z, x, y)
+            ).fetchone()
+
+        return row != None
+
+    def put(self, template, z, x, y, data, etag=None, lastModified=None):
+        now = time.time()
+
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO tile VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (template, z, x, y, data, etag, lastModified, now, now)
+            )
+            self.db.commit()
+
+    # Server told us the cached tile is still valid
+    def revalidate(self, template, z, x, y):
+        with self.lock:
+            self.db.execute(
+                "UPDATE tile SET timestamp = ? WHERE template = ? AND z = ? AND x = ? AND y = ?",
+                (time.time(), template, z, x, y)
+            )
+            self.db.commit()
+
+    # Remove least recently used tiles until the cache fits in its max size, see SqliteCache.evict()
+    def remove_entries(self, now):
+        totalSize = self.db.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM tile").fetchone()[0]
+        if (totalSize <= self.maxSize):
+            return 0
+
+        cursor = self.db.execute("SELECT template, z, x, y, LENGTH(data) FROM tile ORDER BY lastUsed ASC")
+        toRemove = []
+        for template, z, x, y, size in cursor:
+            if (totalSize <= self.maxSize):
+                break
+            toRemove.append((template, z, x, y))
+            totalSize -= size
+
+        self.db.executemany("DELETE FROM tile WHERE template = ? AND z = ? AND x = ? AND y = ?", toRemove)
+        return len(toRemove)
@@ -0,0 +1,177 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Download map tiles in parallel with a pooled HTTP session
+# File    : TileFetcher.py
+# Date    : Oct. 18th, 2026
+
+import Logger
+import time
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+class TileFetcher:
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    DEFAULT_TEMPLATE = 'http://{s}.tile.osm.org/{z}/{x}/{y}.png'
+    DEFAULT_WORKER_COUNT = 8
+    DEFAULT_HOST_CONCURRENCY = 2                 # OSM tile usage policy: 2 connections per server
+    DEFAULT_RETRY_COUNT = 3
+    DEFAULT_BACKOFF_S = 0.5                      # Doubled after each failed attempt
+    DEFAULT_TIMEOUT_S = 10
+    SUBDOMAINS = ["a", "b", "c"]                 # Replace {s} in URL templates
+    USER_AGENT = "Amaping"
+
+    # =============
+    # Members
+    # =============
+
+    # template can be a local tile directory, Ex: file:///data/tiles/{z}/{x}/{y}.png
+    def __init__(self, template, tileCache=None, offline=False, workerCount=DEFAULT_WORKER_COUNT,
+                 hostConcurrency=DEFAULT_HOST_CONCURRENCY, retryCount=DEFAULT_RETRY_COUNT, timeout=DEFAULT_TIMEOUT_S):
+        self.template = template
+        self.tileCache = tileCache
+        self.offline = offline
+        self.workerCount = max(1, workerCount)
+        self.hostConcurrency = max(1, hostConcurrency)
+        self.retryCount = retryCount
+        self.timeout = timeout
+
+        # Keep connections alive between tiles, one pool per host
+        # requests is imported here so that runs without PNG output don't load it
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = self.USER_AGENT
+        adapter = HTTPAdapter(pool_connections=len(self.SUBDOMAINS), pool_maxsize=self.hostConcurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.hostSemaphores = {}
+        self.lock = threading.Lock()
+        self.downloadCount = 0
+        self.cachedCount = 0
+
+    # Spread tiles over subdomains, the same tile always gets the same URL
+    def get_url(self, z, x, y):
+        subdomain = self.SUBDOMAINS[(x + y) % len(self.SUBDOMAINS)]
+        return self.template.format(s=subdomain, z=z, x=x, y=y)
+
+    def _get_host_semaphore(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        with self.lock:
+            if (not host in self.hostSemaphores):
+                self.hostSemaphores[host] = threading.Semaphore(self.hostConcurrency)
+            return self.hostSemaphores[host]
+
+    # Give PNG data of a tile, from cache if possible
+    def get_tile(self, z, x, y):
+        entry = None
+        if (self.tileCache != None):
+            entry = self.tileCache.get(self.template, z, x, y)
+            if (entry != None) and (entry["isFresh"] or self.offline):
+                with self.lock:
+                    self.cachedCount += 1
+                Logger.count("tiles.cached")
+                return entry["data"]
+
+        if (self.offline):
+            raise RuntimeError("Tile {0}/{1}/{2} is not in cache, can't render offline".format(z, x, y))
+
+        url = self.get_url(z, x, y)
+
+        # Local tile directory
+        if (url.startswith("file://")):
+            Logger.count("tiles.local")
+            with open(url[len("file://"):], "rb") as f:
+                return f.read()
+
+        # Ask the server if our old tile is still valid
+        headers = {}
+        if (entry != None):
+            if (entry["etag"] != None):
+                headers["If-None-Match"] = entry["etag"]
+            if (entry["lastModified"] != None):
+                headers["If-Modified-Since"] = entry["lastModified"]
+
+        res = self._request(url, headers)
+        with self.lock:
+            self.downloadCount += 1
+        Logger.count("tiles.downloaded")
+
+        if (res.status_code == 304) and (entry != None):
+            Logger.count("tiles.revalidated")
+            self.tileCache.revalidate(self.template, z, x, y)
+            return entry["data"]
+
+        if (self.tileCache != None):
+            self.tileCache.put(self.template, z, x, y, res.content, res.headers.get("ETag"), res.headers.get("Last-Modified"))
+
+        return res.content
+
+    # Send a request, retry on network errors and server overload
+    def _request(self, url, headers):
+        import requests
+        delay = self.DEFAULT_BACKOFF_S
+
+        for attempt in range(0, self.retryCount + 1):
+            isLastAttempt = attempt == self.retryCount
+
+            try:
+                with self._get_host_semaphore(url):
+                    res = self.session.get(url, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                if (isLastAttempt):
+                    raise RuntimeError("Tile request failed ({0}): {1}".format(str(e), url))
+                res = None
+
+            if (res != None):
+                if (res.status_code in (200, 304)):
+                    return res
+
+                # Client errors won't get better
+                if (isLastAttempt) or (res.status_code < 500 and res.status_code != 429):
+                    raise RuntimeError("Tile request failed [{0}]: {1}".format(res.status_code, url))
+
+            Logger.debug("Tile request failed, retrying in {0:.1f}s: {1}".format(delay, url))
+            time.sleep(delay)
+            delay = delay * 2
+
+    # Fetch all (z, x, y) tiles, onTile(tile, data) is called from the calling
+    # thread as soon as each tile arrives so they don't need to be kept in memory
+    # quiet only logs stats in debug, for callers fetching many small lists
+    def fetch_all(self, tileList, onTile, quiet=False):
+        startTime = time.monotonic()
+
+        # Counters are shared by threads fetching other maps at the same time
+        with self.lock:
+            downloadStart = self.downloadCount
+            cachedStart = self.cachedCount
+
+        with ThreadPoolExecutor(self.workerCount) as pool:
+            futures = {pool.submit(self.get_tile, *tile): tile for tile in tileList}
+
+            try:
+                for future in as_completed(futures):
+                    onTile(futures.pop(future), future.result())
+            except Exception:
+                # Don't wait for remaining tiles
+                for future in futures:
+                    future.cancel()
+                raise
+
+        elapsedTime = time.monotonic() - startTime
+        log = Logger.debug if quiet else Logger.info
+        log("Fetched {0} tile(s) in {1:.1f}s ({2:.1f} tiles/s, {3} downloaded, {4} from cache)".format(
+            len(tileList),
+            elapsedTime,
+            len(tileList) / elapsedTime if elapsedTime > 0 else 0,
+            self.downloadCount - downloadStart,
+            self.cachedCount - cachedStart
+        ))
+
+    def close(self):
+        self.session.close()
@@ -7,17 +7,27 @@
 
 import time
 import signal, os
+import json                                     # Read job files
 import traceback                                # For debugging unhandled exceptions
 import argparse                                 # To parse command line arguments
-from geopy.geocoders import Nominatim           # Get GeoCode from text address
-import pandas                                   # Read CSV file
-import pickle                                   # Used to load/save context an speedup developpement
+import urllib.parse                             # To split geocoder URL
+import functools                                # Give uMap layers their marker source
+from concurrent.futures import ThreadPoolExecutor   # Paint several maps at once
 
-from Painter import Painter
-from MapGenerator import MapGenerator
+# Only light modules are imported here, heavy ones (pandas, numpy, geopy, PIL,
+# staticmap...) are imported where they are used: arguments are checked first
+# and a run only loads what its outputs need (Ex: no PIL without PNG output)
 import Logger
-import Framacarte                               # To generate umap files
+import framacarte                               # To generate umap files
 from AmapMember import AmapMember               # Define a member
+from GeocodeCache import GeocodeCache           # Avoid requesting the same address twice
+from GeocodeEngine import GeocodeEngine, LazyGeocoder   # Resolve all addresses at once
+from BatchGeocoder import BatchGeocoder         # Geocode addresses by CSV uploads
+from RunManifest import RunManifest             # Only process changed rows
+from NameIndex import NameIndex                 # Find members from ODS names
+from TileCache import TileCache                 # Don't download the same tiles on each run
+from TileFetcher import TileFetcher             # Download tiles in parallel
+from MapService import MapService               # Render maps on demand
 
 # Constants
 APP_NAME = "Amaping"
@@ -28,6 +38,7 @@ geoLocator = None
 
 # Tell is value is considered as set or not
 def _isset(value):
+    import pandas
     if (pandas.isna(value)):
         return False
     elif (value == ""):
@@ -35,6 +46,27 @@ def _isset(value):
     else:
         return True
 
+# Parse a "lon,lat" command line argument
+def _lon_lat(value):
+    try:
+        lon, lat = map(float, value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected lon,lat but got \"{0}\"".format(value))
+
+    return (lon, lat)
+
+# Parse a "widthxheight" command line argument
+def _map_size(value):
+    try:
+        width, height = map(int, value.split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected widthxheight but got \"{0}\"".format(value))
+
+    if (width <= 0) or (height <= 0):
+        raise argparse.ArgumentTypeError("expected positive sizes but got \"{0}\"".format(value))
+
+    return (width, height)
+
 class Amaping:
 
     # =============
@@ -47,16 +79,42 @@ class Amaping:
     DEFAULT_OUTPUT_MAP_NAME = './output/map.png'
     DEFAULT_MAP_ZOOM_LEVEL = 16
     DEFAULT_MAP_SIZE = "4080x4080"
+    DEFAULT_GEOCODE_CACHE = './output/geocode.sqlite'
+    DEFAULT_MANIFEST = './output/manifest.obj'
+    DEFAULT_TILE_CACHE = './output/tiles.sqlite'
+    DEFAULT_SHEET_CACHE = './output/sheets.pickle'
+    DEFAULT_BAN_MIN_SCORE = 0.7                  # See BanGeocoder
+    DEFAULT_MAX_DISTANCE_KM = 5
+    UMAP_CLUSTER_MIN_ZOOM = 10                   # Clusters of this zoom are shown when zoomed out more
+    UMAP_DETAIL_ZOOM = 15                        # Members are shown one by one from this zoom
+    UMAP_BATCH_SIZE = 1024                       # Members read from the table at once while writing uMap files
+    DEFAULT_JOB_WORKERS = os.cpu_count() or 1
+    OUTPUT_FORMATS = ("png", "umap")
+    BASKET_TYPES = ("hebdo", "pair", "impair", "autre")
+    # Settings an output of a job file can have, see create_output()
+    JOB_OUTPUT_KEYS = ("format", "filename", "basketTypes", "mapSize", "zoomLevel", "autoFit", "fitTrim", "clusterRadius", "strips", "compactUmap")
+    # Type of each setting in job files, bool is not accepted as a number
+    JOB_OUTPUT_TYPES = {
+        "format": str, "filename": str, "mapSize": str, "zoomLevel": int, "fitTrim": (int, float),
+        "clusterRadius": int, "autoFit": bool, "strips": bool, "compactUmap": bool
+    }
     AMAP_ADDRESS = "Salle Brama, Avenue Sainte-Marie"
     AMAP_CITY = "Talence"
     AMAP_POSTAL_CODE = "33400"
+    ODS_SHEETS = ("COORDONNEES", "ENGAGEMENTS")
 
     # =============
     # Variables
     # =============
 
     config = None             # Store the configuration
-    amapMemberArray = []      # Store data of all members
+    amapMemberArray = []      # Store data of all members while they are loaded
+    memberTable = None        # Loaded members by columns, see MemberTable
+    geoCache = None           # Store geocodes between runs
+    nameIndex = None          # Find members by name
+    salleBrama = None         # AMAP location, center of maps
+    outputList = []           # Files to generate, see create_output()
+    geocodeStats = {}         # Geocode cache statistics of the last load
 
     # =============
     # Members
@@ -74,6 +132,12 @@ class Amaping:
         parser = argparse.ArgumentParser(description=APP_DESC)
         parser.add_argument('-v', '--verbose', help='enable verbose logs', default=False, action='store_true')
         parser.add_argument('-u', '--umap', default=False, dest="umap", help='enable umap file generation', action='store_true')
+        parser.add_argument('--compactUmap', default=False, dest="compactUmap", help='write a smaller umap file (no indentation, coordinates rounded to 1m)', action='store_true')
+        parser.add_argument('-j', '--job', default="", dest="jobFilename", help='specify a JSON job file listing files to generate in one run (Ex: {"outputs": [{"format": "png", "filename": "hebdo.png", "basketTypes": ["hebdo"]}]})', type=str)
+        parser.add_argument('--jobWorkers', default=self.DEFAULT_JOB_WORKERS, dest="jobWorkers", help='specify how many PNG files of a job can be painted in parallel', type=int)
+        parser.add_argument('--serve', default=0, dest="servePort", help='after loading members, serve maps over HTTP on this port (Ex: {0}), see MapService'.format(MapService.DEFAULT_PORT), type=int)
+        parser.add_argument('--serveHost', default=MapService.DEFAULT_HOST, dest="serveHost", help='specify the address to serve maps on', type=str)
+        parser.add_argument('--serveMaxSize', default=MapService.DEFAULT_MAX_MAP_SIZE, dest="serveMaxSize", help='specify the biggest map size in pixel a served map can ask for (Ex: 4096x4096)', type=_map_size)
         parser.add_argument('-p', '--png', default=False, dest="png", help='enable PNG file generation', action='store_true')
         parser.add_argument('-c', '--csv', default=self.DEFAULT_CSV_FILENAME, dest="csvFilename", help='specify CSV data file', type=str)
         parser.add_argument('-d', '--ods', default=self.DEFAULT_ODS_FILENAME, dest="odsFilename", help='specify ODS data file', type=str)
@@ -81,6 +145,32 @@ class Amaping:
         parser.add_argument('-o', '--output', default=self.DEFAULT_OUTPUT_MAP_NAME, dest="mapFilename", help='specify a map filename', type=str)
         parser.add_argument('-m', '--mapSize', default=self.DEFAULT_MAP_SIZE, dest="mapSize", help='specify a size in pixel for map generation (Ex: 1920x1080)', type=str)
         parser.add_argument('-z', '--zoomLevel', default=self.DEFAULT_MAP_ZOOM_LEVEL, dest="zoomLevel", help='specify a zoom level for map generation', type=int)
+        parser.add_argument('--autoFit', default=False, dest="autoFit", help='fit the PNG map on members, zoom level and map size become maximums', action='store_true')
+        parser.add_argument('--fitTrim', default=0, dest="fitTrim", help='specify the percentage of most extreme member positions ignored on each side by --autoFit (Ex: 1)', type=float)
+        parser.add_argument('--tileUrl', default=TileFetcher.DEFAULT_TEMPLATE, dest="tileUrl", help='specify the tile server URL template ({s} for a/b/c subdomains), can be a file:// directory', type=str)
+        parser.add_argument('--tileWorkers', default=TileFetcher.DEFAULT_WORKER_COUNT, dest="tileWorkers", help='specify how many tiles can be downloaded in parallel', type=int)
+        parser.add_argument('--tileHostConcurrency', default=TileFetcher.DEFAULT_HOST_CONCURRENCY, dest="tileHostConcurrency", help='specify how many tiles can be downloaded in parallel from the same server', type=int)
+        parser.add_argument('--tileCache', default=self.DEFAULT_TILE_CACHE, dest="tileCache", help='specify the tile cache file, empty to disable it', type=str)
+        parser.add_argument('--tileCacheSize', default=TileCache.DEFAULT_MAX_SIZE_MB, dest="tileCacheSize", help='specify the max size of the tile cache in MB', type=int)
+        parser.add_argument('--offline', default=False, dest="offline", help='render the map from the tile cache only', action='store_true')
+        parser.add_argument('--clusterRadius', default=0, dest="clusterRadius", help='group members closer than this radius in pixels on maps (Ex: 40), 0 to disable', type=int)
+        parser.add_argument('--strips', default=False, dest="strips", help='paint the PNG file by strips to keep memory low on very large maps (no preview)', action='store_true')
+        parser.add_argument('--maxDistance', default=self.DEFAULT_MAX_DISTANCE_KM, dest="maxDistance", help='specify the max distance in km between members and the AMAP to be on the PNG map', type=float)
+        parser.add_argument('--refPoint', default=[], dest="refPoints", help='specify another point (Ex: -0.58,44.83) members can be close to, can be repeated', type=_lon_lat, action='append')
+        parser.add_argument('-g', '--geocodeCache', default=self.DEFAULT_GEOCODE_CACHE, dest="geocodeCache", help='specify the geocode cache file, empty to disable it', type=str)
+        parser.add_argument('--manifest', default=self.DEFAULT_MANIFEST, dest="manifest", help='specify the run manifest file used to process only changed rows, empty to disable it', type=str)
+        parser.add_argument('--sheetCache', default=self.DEFAULT_SHEET_CACHE, dest="sheetCache", help='specify the file keeping parsed ODS sheets until the ODS file changes, empty to disable it', type=str)
+        parser.add_argument('--geocodeTtl', default=GeocodeCache.DEFAULT_TTL_DAYS, dest="geocodeTtl", help='specify how many days a geocode stays in cache', type=int)
+        parser.add_argument('--geocoderUrl', default="", dest="geocoderUrl", help='specify a Nominatim server (Ex: http://localhost:8080), public one by default', type=str)
+        parser.add_argument('--geoWorkers', default=GeocodeEngine.DEFAULT_WORKER_COUNT, dest="geoWorkers", help='specify how many geocode requests can run in parallel', type=int)
+        parser.add_argument('--metrics', default="", dest="metricsFilename", help='specify a JSON file to write stage timings and counters to at the end of the run', type=str)
+        parser.add_argument('--profile', default="", dest="profileFilename", help='specify a file to write a cProfile profile of the run to (see python -m pstats)', type=str)
+        parser.add_argument('--geoRate', default=GeocodeEngine.DEFAULT_RATE, dest="geoRate", help='specify the max geocode requests per second', type=float)
+        parser.add_argument('--banIndex', default="", dest="banIndex", help='specify a BAN index directory (see BanGeocoder.py) to geocode addresses locally, the geocoder is only asked for addresses the index can\'t match', type=str)
+        parser.add_argument('--batchGeocoderUrl', default="", dest="batchGeocoderUrl", help='specify a CSV batch geocoding endpoint (Ex: ' + BatchGeocoder.DEFAULT_URL + '), addresses it can\'t find are sent one by one to the geocoder', type=str)
+        parser.add_argument('--batchSize', default=BatchGeocoder.DEFAULT_CHUNK_SIZE, dest="batchSize", help='specify how many addresses are sent in each CSV upload', type=int)
+        parser.add_argument('--batchMinScore', default=BatchGeocoder.DEFAULT_MIN_SCORE, dest="batchMinScore", help='specify the score (0 to 1) under which a batch answer is retried one by one', type=float)
+        parser.add_argument('--banMinScore', default=self.DEFAULT_BAN_MIN_SCORE, dest="banMinScore", help='specify the match score (0 to 1) under which a BAN index answer is not trusted', type=float)
 
         # Use vars() to get python dict from Namespace object
         self.args = vars(parser.parse_args())
@@ -89,56 +179,220 @@ class Amaping:
         if self.args["verbose"]:
             Logger.setLevelDebug()
 
-        if not self.args["png"] and not self.args["umap"]:
-            raise RuntimeError("At least one type of file generation is needed, use -u or -p !")
+        if not self.args["png"] and not self.args["umap"] and self.args["jobFilename"] == "" and self.args["servePort"] == 0:
+            raise RuntimeError("At least one type of file generation is needed, use -u, -p, --job or --serve !")
+
+        if (self.args["geoRate"] <= 0):
+            raise RuntimeError("Geocode rate must be positive")
+
+        if (self.args["banMinScore"] < 0) or (self.args["banMinScore"] > 1):
+            raise RuntimeError("BAN min score must be between 0 and 1")
+
+        if (self.args["batchSize"] <= 0):
+            raise RuntimeError("Batch size must be positive")
+
+        if (self.args["batchMinScore"] < 0) or (self.args["batchMinScore"] > 1):
+            raise RuntimeError("Batch min score must be between 0 and 1")
+
+        if (self.args["offline"] and self.args["tileCache"] == ""):
+            raise RuntimeError("Offline mode needs a tile cache, don't disable it")
+
+        # Check outputs before doing anything
+        self.outputList = self.get_output_list()
+
+    # List files to generate, from the job file then -u and -p
+    def get_output_list(self):
+        outputList = []
+        if (self.args["jobFilename"] != ""):
+            for values in self.load_job(self.args["jobFilename"]):
+                outputList.append(self.create_output(values))
+
+        if self.args["umap"]:
+            outputList.append(self.create_output({"format": "umap"}))
+        if self.args["png"]:
+            outputList.append(self.create_output({"format": "png", "filename": self.args["mapFilename"]}))
+
+        # Outputs painted at the same time can't share a file
+        fileList = [(output["format"], output["filename"]) for output in outputList]
+        for fileFormat, filename in set(fileList):
+            if (fileList.count((fileFormat, filename)) > 1):
+                raise RuntimeError("Several {0} outputs would be written to {1}".format(fileFormat, filename or "the default file"))
+
+        return outputList
+
+    # Give the output list of a job file
+    def load_job(self, jobFilename):
+        Logger.debug("Reading job file \"{0}\"".format(jobFilename))
+        with open(jobFilename, "r", encoding="utf-8") as jobFile:
+            try:
+                job = json.load(jobFile)
+            except ValueError as e:
+                raise RuntimeError("Job file \"{0}\" is not valid JSON: {1}".format(jobFilename, str(e)))
+
+        if (not isinstance(job, dict)) or (not isinstance(job.get("outputs"), list)) or (len(job["outputs"]) == 0):
+            raise RuntimeError("Job file \"{0}\" needs a non empty \"outputs\" list".format(jobFilename))
+
+        return job["outputs"]
+
+    # Build the settings of an output, command line values are used for missing ones
+    # basketTypes keeps members of some basket types only, None for all members
+    def create_output(self, values):
+        if (not isinstance(values, dict)):
+            raise RuntimeError("Outputs must be JSON objects, got {0}".format(json.dumps(values)))
+
+        unknownKeys = [key for key in values if not key in self.JOB_OUTPUT_KEYS]
+        if (len(unknownKeys) > 0):
+            raise RuntimeError("Unknown output setting(s): {0}".format(", ".join(unknownKeys)))
+
+        for key, valueType in self.JOB_OUTPUT_TYPES.items():
+            value = values.get(key)
+            if (value == None):
+                continue
+
+            isBool = isinstance(value, bool)
+            if (not isinstance(value, valueType)) or (isBool and (valueType != bool)):
+                raise RuntimeError("Output setting {0} has a bad type, got {1}".format(key, json.dumps(value)))
+
+        output = {"format": "png", "filename": None, "basketTypes": None}
+        for key in ("mapSize", "zoomLevel", "autoFit", "fitTrim", "clusterRadius", "strips", "compactUmap"):
+            output[key] = self.args[key]
+        output.update(values)
+
+        if (not output["format"] in self.OUTPUT_FORMATS):
+            raise RuntimeError("Output format must be one of {0}".format(", ".join(self.OUTPUT_FORMATS)))
+
+        if (output["format"] == "png") and (output["filename"] == None):
+            output["filename"] = self.args["mapFilename"]
+
+        if (output["basketTypes"] != None):
+            if (not isinstance(output["basketTypes"], list)) or (not all(basketType in self.BASKET_TYPES for basketType in output["basketTypes"])):
+                raise RuntimeError("Basket types must be a list of {0}".format(", ".join(self.BASKET_TYPES)))
+
+        try:
+            output["mapSize"] = tuple(map(int, output["mapSize"].split('x')))
+        except (AttributeError, ValueError):
+            output["mapSize"] = None
+
+        if (output["mapSize"] == None) or (len(output["mapSize"]) != 2) or (min(output["mapSize"]) <= 0):
+            raise RuntimeError("Output setting mapSize must be two positive sizes like 1920x1080, got \"{0}\"".format(values.get("mapSize", self.args["mapSize"])))
 
         # See https://wiki.openstreetmap.org/wiki/Zoom_levels
         # 20 might not be available everywhere
-        if (self.args["zoomLevel"] < 0) or (self.args["zoomLevel"] > 20):
+        if (output["zoomLevel"] < 0) or (output["zoomLevel"] > 20):
             raise RuntimeError("Zoom level must be in range [0; 20]")
 
-    def save_context(self):
-        f = open('./output/amapMemberArray.obj', 'wb')
-        pickle.dump(self.amapMemberArray, f)
-        Logger.debug("Saving context to file")
+        if (output["fitTrim"] < 0) or (output["fitTrim"] >= 50):
+            raise RuntimeError("Fit trim must be in range [0; 50[")
 
-    def load_context(self):
-        try:
-            f = open('./output/amapMemberArray.obj', 'rb')
-        except Exception as e:
-            Logger.info("There is no context to load")
-            return -1
+        if (output["clusterRadius"] < 0):
+            raise RuntimeError("Output setting clusterRadius must be positive or 0")
 
-        self.amapMemberArray = pickle.load(f)
-        return 0
+        return output
 
-    def open_ods_sheet(self, odsFile, sheetName):
-        Logger.info("ODS - Reading sheet " +  sheetName)
-        return pandas.read_excel(odsFile, engine='odf', sheet_name=sheetName)
+    # Give the geocoder client, it is only built if an address is not in cache
+    def create_geo_locator(self):
+        return LazyGeocoder(self.create_nominatim)
 
-    def find_member_by(self, name1, name2):
-        # Find a match in our member list
-        for member in self.amapMemberArray:
-            displayName = member.get_display_name().lower()
+    # Build the Nominatim client, a self hosted one can be used
+    def create_nominatim(self):
+        from geopy.geocoders import Nominatim
+        if (self.args["geocoderUrl"] == ""):
+            return Nominatim(user_agent="http")
 
-            # Check name 1
-            if (not name1.lower() in displayName):
-                continue
+        url = urllib.parse.urlsplit(self.args["geocoderUrl"])
+        Logger.info("Using geocoder at {0}".format(self.args["geocoderUrl"]))
+        return Nominatim(user_agent="http", domain=url.netloc + url.path.rstrip("/"), scheme=url.scheme)
 
-            #  Check name 2
-            if (name2 != ""):
-                if (not name2.lower() in displayName):
-                    continue
+    def open_geocode_cache(self):
+        if (self.args["geocodeCache"] == ""):
+            Logger.info("Geocode cache is disabled")
+            return None
 
-            # Return found member
-            return member
+        Logger.debug("Opening geocode cache \"{0}\"".format(self.args["geocodeCache"]))
+        return GeocodeCache(self.args["geocodeCache"], ttlDays=self.args["geocodeTtl"])
 
-        # Member not found
-        msg = "Couldn't find a match in known members for {0}".format(name1)
+    # Give the BAN geocoder answering before the network one, None if there is no index
+    def open_ban_index(self):
+        if (self.args["banIndex"] == ""):
+            return None
+
+        from BanGeocoder import BanGeocoder
+        return BanGeocoder(self.args["banIndex"], minScore=self.args["banMinScore"])
+
+    # Give the CSV batch geocoder, None if it is not used
+    def create_batch_geocoder(self):
+        if (self.args["batchGeocoderUrl"] == ""):
+            return None
+
+        Logger.info("Using batch geocoder at {0}".format(self.args["batchGeocoderUrl"]))
+        return BatchGeocoder(self.args["batchGeocoderUrl"], chunkSize=self.args["batchSize"], minScore=self.args["batchMinScore"])
+
+    def open_tile_cache(self):
+        if (self.args["tileCache"] == ""):
+            Logger.info("Tile cache is disabled")
+            return None
+
+        Logger.debug("Opening tile cache \"{0}\"".format(self.args["tileCache"]))
+        return TileCache(self.args["tileCache"], maxSizeMb=self.args["tileCacheSize"])
+
+    def open_manifest(self, home, columns):
+        if (self.args["manifest"] == ""):
+            Logger.info("Run manifest is disabled, all rows will be processed")
+            return None
+
+        # Distance filtering depends on reference points, row hashes on columns
+        settings = (self.get_reference_points(home), self.args["maxDistance"], columns)
+        return RunManifest(self.args["manifest"], settings=settings)
+
+    def close_geocode_cache(self):
+        if (self.geoCache == None):
+            return
+
+        self.geocodeStats = {
+            "hits": self.geoCache.get_hit_count(),
+            "misses": self.geoCache.get_miss_count()
+        }
+        Logger.info("Geocode cache: {0} hit(s), {1} miss(es)".format(
+            self.geocodeStats["hits"],
+            self.geocodeStats["misses"]
+        ))
+        self.geoCache.close()
+        self.geoCache = None
+
+    # Give {sheetName: DataFrame} of ODS_SHEETS, parsed once and cached, see SheetCache
+    def read_ods_sheets(self, odsFile):
+        from SheetCache import SheetCache
+        cachePath = self.args["sheetCache"]
+        if (cachePath == ""):
+            Logger.info("Sheet cache is disabled")
+            cachePath = None
+
+        return SheetCache(cachePath).read(odsFile, self.ODS_SHEETS)
+
+    def find_member_by(self, name1, name2):
+        # Find a match in our member list
+        candidates = self.nameIndex.find_candidates(name1, name2)
+
+        msg = name1
         if (name2 != ""):
             msg += "/" + name2
 
-        Logger.warning(msg)
+        # Return found member
+        if (len(candidates) == 1):
+            return candidates[0]
+
+        # Several members share these names, don't pick one randomly
+        if (len(candidates) > 1):
+            Logger.warning("Ambiguous match in known members for {0}: {1}".format(
+                msg,
+                " / ".join(member.get_display_name() for member in candidates)
+            ))
+            Logger.count("ods.ambiguous")
+            return None
+
+        # Member not found
+        Logger.warning("Couldn't find a match in known members for {0}".format(msg))
+        Logger.count("ods.unmatched")
         return None
 
     def find_member_from_row(self, row, index):
@@ -158,164 +412,398 @@ class Amaping:
 
         return matchMember
 
-    def run(self):
-        # Load CSV file
-        data = pandas.read_csv(self.args["csvFilename"], sep=self.args["csvSeparator"], header=0)
+    # Build a member from a clean CSV row (See MemberImport), None if it can't be placed on a map
+    def build_member(self, row, reportLines):
+        import pandas
+        member = AmapMember()
+
+        # Manage ID
+        if (row.id != None):
+            member.set_id(row.id)
+
+        # Manage names
+        if (row.name != ""):
+            member.add_people(row.name, row.firstname)
+
+        if (row.partnerName != ""):
+            member.add_people(row.partnerName, row.partnerFirstname)
+
+        # Manage address
+        if (not row.hasAddress):
+            Logger.warning("No address detected for member {0}".format(row.displayName))
+            reportLines.append("Pas d'adresse pour {0}\n".format(row.displayName))
+            Logger.count("members.removed.noAddress")
+            return None
+
+        member.set_address(row.address)
+        if (row.hasTwoAddresses):
+            Logger.warning("2 addresses detected for member {0}, choosing {1}".format(
+                row.displayName,
+                row.address))
+
+        member.set_city(row.city)
+
+        if (not pandas.isna(row.postalCode)):
+            member.set_postal_code(row.postalCode)
+
+        member.set_phone(row.phone, isFormatted=True)
+        member.set_email(row.email)
+
+        return member
+
+    # Apply geocoding result
+    def locate_member(self, member, positions, reportLines):
+        if (not member.has_valid_address()):
+            Logger.error("Bad address specified for member {0}".format(member.get_display_address()))
+        member.set_map_position(positions.get(member.get_display_address()))
+
+        if (member.get_map_position() == None):
+            Logger.count("members.removed.unknownAddress")
+            reportLines.append("Le membre {0} a une adresse non reconnue : \"{1}\"\n".format(
+                member.get_display_name(),
+                member.get_display_address()
+            ))
+
+    # Give the (lon, lat) points members must be close to
+    def get_reference_points(self, home):
+        return [home.get_map_position()] + self.args["refPoints"]
+
+    # Filter out members with far locations, all at once
+    # resultList contains [member, reportLines] of located members
+    @Logger.Timer("distanceFilter")
+    def filter_far_members(self, resultList, home):
+        from DistanceEngine import SpatialIndex
+        if (len(resultList) == 0):
+            return
+
+        spatialIndex = SpatialIndex([member.get_map_position() for member, reportLines in resultList])
+        closeMask = spatialIndex.within_any(self.get_reference_points(home), self.args["maxDistance"])
+        homeDistances = spatialIndex.distances_to(home.get_map_position())
+
+        for (member, reportLines), isCloseToHome, distanceKm in zip(resultList, closeMask, homeDistances):
+            Logger.debug("{0} is {1:.2} km away from close point".format(member.get_display_name(), distanceKm))
+
+            member.set_close_to_home(bool(isCloseToHome))
+            if (not isCloseToHome):
+                Logger.count("members.farFromHome")
+                Logger.warning("Member {0} is too far away from {1}".format(
+                    member.get_display_name(),
+                    home.get_display_name())
+                )
+                reportLines.append("Le membre {0} est trop éloigné de {1} pour être affiché sur la map PNG\n".format(
+                    member.get_display_name(),
+                    home.get_display_name()
+                ))
+
+    # Indexes of members on the map with a known position, home included
+    def get_located_members(self, memberIndexes):
+        return memberIndexes[self.memberTable.isOnMap[memberIndexes] & self.memberTable.is_located(memberIndexes)]
+
+    # Keep indexes of members drawn inside the map
+    def keep_markers_on_map(self, markerIndexes, mapGen):
+        table = self.memberTable
+        markerIndexes = markerIndexes[table.is_located(markerIndexes)]
+        if (len(markerIndexes) == 0):
+            return markerIndexes
+
+        xPx, yPx, isInCanvas = mapGen.lon_lat_to_px_array(table.lons[markerIndexes], table.lats[markerIndexes])
+
+        keptIndexes = markerIndexes[isInCanvas]
+        if (len(keptIndexes) < len(markerIndexes)):
+            Logger.warning("{0} member(s) out of the fitted map".format(len(markerIndexes) - len(keptIndexes)))
+
+        return keptIndexes
+
+    # Basket types used to break clusters down, for members at indexes
+    def get_member_categories(self, memberIndexes):
+        import numpy
+        basketTypes = self.memberTable.get_strings("typePanier", memberIndexes)
+        return numpy.where(basketTypes == "", "autre", basketTypes)
+
+    # Split located members between the home, never merged, and the clustered ones
+    # values are given back with member indexes in (index, value) entries
+    def split_cluster_entries(self, memberIndexes, values, radiusPx):
+        import numpy
+        from Cluster import ClusterIndex
+        table = self.memberTable
+        memberIndexes = numpy.asarray(memberIndexes, dtype=numpy.int64)
+        isLocated = table.is_located(memberIndexes)
+        isHome = table.is_in("shape", memberIndexes, ["home"])
+
+        homeList = [(index, value) for index, value, isKept in zip(memberIndexes, values, isLocated & isHome) if isKept]
+        clusterEntries = [(index, value) for index, value, isKept in zip(memberIndexes, values, isLocated & ~isHome) if isKept]
+
+        clusterIndexes = memberIndexes[isLocated & ~isHome]
+        categories = self.get_member_categories(clusterIndexes)
+        clusterIndex = ClusterIndex(
+            table.lons[clusterIndexes],
+            table.lats[clusterIndexes],
+            categories,
+            radiusPx=radiusPx
+        )
+
+        # Members of the same basket type have the same color
+        categoryColors = dict(zip(categories.tolist(), table.get_strings("color", clusterIndexes).tolist()))
+
+        return (homeList, clusterEntries, clusterIndex, categoryColors)
+
+    # Clusters (markerPos, count, slices, marker) of the PNG map, see Painter.get_map_items()
+    # markerList contains markers of the legend of members at markerIndexes
+    def get_png_clusters(self, markerIndexes, markerList, zoom, radiusPx):
+        homeList, clusterEntries, clusterIndex, categoryColors = self.split_cluster_entries(markerIndexes, markerList, radiusPx)
+
+        clusterList = [(marker[1], 1, [], marker) for index, marker in homeList]
+        for lon, lat, count, breakdown, pointIndex in clusterIndex.get_clusters(zoom):
+            marker = None
+            if (pointIndex != None):
+                marker = clusterEntries[pointIndex][1]
+
+            slices = [(categoryColors[category], breakdown[category]) for category in sorted(breakdown)]
+            clusterList.append(((lon, lat), count, slices, marker))
+
+        Logger.info("{0} member(s) grouped in {1} marker(s)".format(len(clusterEntries), len(clusterList) - len(homeList)))
+        return clusterList
+
+    # One layer of grouped members per zoom level until members can be told apart
+    # memberIndexes are members on the map, layers are filled while the file is written
+    def create_cluster_collections(self, memberIndexes, radiusPx):
+        import numpy
+        homeList, clusterEntries, clusterIndex, categoryColors = self.split_cluster_entries(memberIndexes, memberIndexes, radiusPx)
+        homeIndexes = numpy.array([index for index, value in homeList], dtype=numpy.int64)
+        clusterIndexes = numpy.array([index for index, value in clusterEntries], dtype=numpy.int64)
+
+        collectionList = []
+        for zoom in range(self.UMAP_CLUSTER_MIN_ZOOM, self.UMAP_DETAIL_ZOOM):
+            fromZoom = zoom if (zoom > self.UMAP_CLUSTER_MIN_ZOOM) else None
+            markerSource = functools.partial(self.iter_cluster_markers, zoom, homeIndexes, clusterIndexes, clusterIndex, categoryColors)
+            collectionList.append(framacarte.Collection("Groupes (zoom {0})".format(zoom), fromZoom=fromZoom, toZoom=zoom, markerSource=markerSource))
+
+        return collectionList
+
+    # Give markers of a layer of create_cluster_collections(): groups first, then the home
+    # and the members alone in their group
+    def iter_cluster_markers(self, zoom, homeIndexes, clusterIndexes, clusterIndex, categoryColors):
+        import numpy
+        clusterList = clusterIndex.get_clusters(zoom)
+
+        for lon, lat, count, breakdown, pointIndex in clusterList:
+            if (pointIndex != None):
+                continue
+
+            description = "\n".join("Légumes {0} : {1}".format(category.capitalize(), breakdown[category]) for category in sorted(breakdown))
+            mainCategory = max(sorted(breakdown), key=breakdown.get)
+            yield framacarte.create_cluster_marker((lon, lat), count, categoryColors[mainCategory], description)
+
+        pointIndexes = numpy.array([cluster[4] for cluster in clusterList if cluster[4] != None], dtype=numpy.int64)
+        yield from self.iter_umap_markers(numpy.concatenate([homeIndexes, clusterIndexes[pointIndexes]]))
+
+    # Load CSV and ODS files, geocode members and choose their markers
+    # Done once, whatever the number of outputs
+    def load_members(self):
+        # Already known addresses won't be requested again
+        self.geoCache = self.open_geocode_cache()
+        salleBrama = self.locate_home()
+
+        rowResults, pendingRows, manifest = self.read_csv_members(salleBrama)
+        locatedResults = self.geocode_members(pendingRows, manifest)
+        self.filter_far_members(locatedResults, salleBrama)
+
+        if (manifest != None):
+            manifest.save()
+
+        self.write_report(rowResults)
+
+        # Geocoding is done, flush cache statistics
+        self.close_geocode_cache()
+
+        # ========================
+        #        ODS FILE
+        # ========================
+
+        if (self.args["odsFilename"] != ""):
+            self.join_ods(self.args["odsFilename"])
+
+        # ========================
+        #    COLORS AND SHAPES
+        # ========================
+
+        self.set_member_markers(salleBrama)
+        self.salleBrama = salleBrama
 
+        # ========================
+        #       MEMBER TABLE
+        # ========================
+
+        # Members won't change anymore, keep them by columns and drop member objects
+        from MemberTable import MemberTable
+        self.memberTable = MemberTable(self.amapMemberArray)
+        self.amapMemberArray = []
+        self.nameIndex = None
+
+    # Give the AMAP as a member
+    @Logger.Timer("geocode")
+    def locate_home(self):
         # Get AMAP address
         salleBrama = AmapMember()
         salleBrama.add_people("Salle", "Brama")
         salleBrama.set_address(self.AMAP_ADDRESS)
         salleBrama.set_city(self.AMAP_CITY)
         salleBrama.set_postal_code(self.AMAP_POSTAL_CODE)
-        if (salleBrama.req_map_position(geoLocator) == None):
+        if (salleBrama.req_map_position(geoLocator, self.geoCache) == None):
             raise RuntimeError("Unable to find AMAP address: \"{0}\"".format(salleBrama.get_display_address()))
 
+        return salleBrama
+
+    # Give ([member, reportLines] of each CSV row, rows to geocode, manifest)
+    # Members of rows unchanged since last run come from the manifest
+    @Logger.Timer("ingest")
+    def read_csv_members(self, salleBrama):
+        import pandas
+        import MemberImport                     # Clean CSV data
+
+        # Load CSV file
+        data = pandas.read_csv(self.args["csvFilename"], sep=self.args["csvSeparator"], header=0)
+
         # Clear output array
         self.amapMemberArray = []
 
         self.csvDataRowCount = len(data.index)
         Logger.debug("Found {0} rows in CSV file \"{1}\"".format(self.csvDataRowCount, self.args["csvFilename"]))
 
-        if self.load_context() == -1:
-            # Open a report file to log what needs to be modified in DB
-            reportFile = open("./output/report.txt", "w")
-
-            # For each line in the CSV...
-            for index, rowdata in data.iterrows():
-                member = AmapMember()
-
-                # Manage ID
-                if (_isset(rowdata['id'])):
-                    member.set_id(rowdata['id'])
-
-                # Manage names (first name is optionnal)
-                if (_isset(rowdata['Nom'])):
-                    if (_isset(rowdata['Prénom'])):
-                        prenom = rowdata['Prénom']
-                    else:
-                        prenom = "Prénom"
-                    member.add_people(rowdata['Nom'], prenom)
-
-                if (_isset(rowdata['Nom partenaire'])):
-                    if (_isset(rowdata['Prénom partenaire'])):
-                        prenom = rowdata['Prénom partenaire']
-                    else:
-                        prenom = "Prénom"
-                    member.add_people(rowdata['Nom partenaire'], prenom)
-
-                # Manage address
-                if (_isset(rowdata['Adresse 1']) and _isset(rowdata['Adresse 2'])):
-                    member.set_address(rowdata['Adresse 1'])
-
-                    # Display warning
-                    Logger.warning("2 addresses detected for member {0}, choosing {1}".format(
-                        member.get_display_name(),
-                        member.get_address()))
-                elif (_isset(rowdata['Adresse 1'])):
-                    member.set_address(rowdata['Adresse 1'])
-                elif (_isset(rowdata['Adresse 2'])):
-                    member.set_address(rowdata['Adresse 2'])
+        # Clean all rows at once, see MemberImport
+        table = MemberImport.clean_member_table(data)
+        Logger.debug("{0} rows without address".format(len(table.index) - table["hasAddress"].sum()))
+
+        # Rows unchanged since last run are taken from the manifest
+        manifest = self.open_manifest(salleBrama, list(data.columns))
+        rowResults = []         # [member, reportLines] for each CSV row
+        pendingRows = []        # Rows to process during this run
+
+        # For each line in the CSV...
+        for row in table.itertuples(index=False):
+            result = None
+            if (manifest != None):
+                result = manifest.get(row.key, row.rowHash)
+
+            # Member objects are only built for new rows
+            if (result == None):
+                reportLines = []
+                result = [self.build_member(row, reportLines), reportLines]
+                pendingRows.append((row.key, row.rowHash, result))
+
+            rowResults.append(result)
+
+        Logger.count("members.rows", len(rowResults))
+        Logger.count("members.fromManifest", len(rowResults) - len(pendingRows))
+        return (rowResults, pendingRows, manifest)
+
+    # Locate members of new rows, give [member, reportLines] of located ones
+    @Logger.Timer("geocode")
+    def geocode_members(self, pendingRows, manifest):
+        # Get Geocode of all new members, see GeocodeEngine
+        geocodeMembers = [result[0] for rowKey, rowHash, result in pendingRows if result[0] != None]
+        geoEngine = GeocodeEngine(
+            geoLocator,
+            self.geoCache,
+            workerCount=self.args["geoWorkers"],
+            rate=self.args["geoRate"],
+            localGeocoder=self.open_ban_index(),
+            batchGeocoder=self.create_batch_geocoder()
+        )
+        positions = geoEngine.resolve([m.get_display_address() for m in geocodeMembers if m.has_valid_address()])
+
+        locatedResults = []
+        for rowKey, rowHash, result in pendingRows:
+            member, reportLines = result
+            failed = False
+            if (member != None):
+                self.locate_member(member, positions, reportLines)
+
+                # Ignore member if it failed, the manifest tells to retry it next time
+                if (member.get_map_position() == None):
+                    result[0] = None
+                    failed = True
                 else:
-                    Logger.warning("No address detected for member {0}".format(member.get_display_name()))
-                    reportFile.write("Pas d'adresse pour {0}\n".format(member.get_display_name()))
-                    continue
-
-                if (_isset(rowdata['Ville'])):
-                    member.set_city(rowdata['Ville'])
-
-                if (_isset(rowdata['Code postal'])):
-                    member.set_postal_code(rowdata['Code postal'])
-
-                # Get Geocode, ignore if it failed
-                if (member.req_map_position(geoLocator) == None):
-                    reportFile.write("Le membre {0} a une adresse non reconnue : \"{1}\"\n".format(
-                        member.get_display_name(),
-                        member.get_display_address()
-                    ))
-                    continue
-
-                # Filter out member with far locations
-                isCloseToHome = member.is_close_to(salleBrama.get_map_position())
-                member.set_close_to_home(isCloseToHome)
-                if (not isCloseToHome):
-                    Logger.warning("Member {0} is too far away from {1}".format(
-                        member.get_display_name(),
-                        salleBrama.get_display_name())
-                    )
-                    reportFile.write("Le membre {0} est trop éloigné de {1} pour être affiché sur la map PNG\n".format(
-                        member.get_display_name(),
-                        salleBrama.get_display_name()
-                    ))
-
-                if (_isset(rowdata['Téléphone'])):
-                    member.set_phone(rowdata['Téléphone'])
-
-                if (_isset(rowdata['Email'])):
-                    member.set_email(rowdata['Email'])
-
-                # Add member to output array
-                self.amapMemberArray.append(member)
+                    locatedResults.append(result)
 
+            if (manifest != None):
+                manifest.set(rowKey, rowHash, result, failed)
 
-            # Check remove members
-            self.removeMemberCount = self.csvDataRowCount - len(self.amapMemberArray)
-            if (self.removeMemberCount > 0):
-                Logger.warning("{0} members will not be on the map because of above warnings/errors !".format(self.removeMemberCount))
-                reportFile.write("{0} membre(s) nécessite(nt) de l'attention\n".format(self.removeMemberCount))
+        return locatedResults
 
-            # Close the report file, we don't need it anymore
-            reportFile.close()
+    # Fill the member list and log what needs to be modified in DB
+    @Logger.Timer("report")
+    def write_report(self, rowResults):
+        # Open a report file to log what needs to be modified in DB
+        reportFile = open("./output/report.txt", "w")
 
-            # Save context to speed up latter execution
-            self.save_context()
-        else:
-            Logger.info("Using cached context file")
+        # Keep members and report in CSV order
+        for member, reportLines in rowResults:
+            for line in reportLines:
+                reportFile.write(line)
 
-        # ========================
-        #        ODS FILE
-        # ========================
+            # Add member to output array
+            if (member != None):
+                self.amapMemberArray.append(member)
 
-        if (self.args["odsFilename"] != ""):
-            Logger.info("ODS - Reading file " +  self.args["odsFilename"])
+        # Check remove members
+        self.removeMemberCount = self.csvDataRowCount - len(self.amapMemberArray)
+        Logger.count("members.removed", self.removeMemberCount)
+        if (self.removeMemberCount > 0):
+            Logger.warning("{0} members will not be on the map because of above warnings/errors !".format(self.removeMemberCount))
+            reportFile.write("{0} membre(s) nécessite(nt) de l'attention\n".format(self.removeMemberCount))
 
-            # Analyse 1st sheet
-            odsContent = self.open_ods_sheet(self.args["odsFilename"], "COORDONNEES")
+        # Close the report file, we don't need it anymore
+        reportFile.close()
 
-            # Iterate over each lines of the file
-            for index, row in odsContent.iterrows():
-                matchMember = self.find_member_from_row(row, index)
-                if (matchMember == None):
-                    continue
+    # Add roles and basket types from the ODS file
+    @Logger.Timer("odsJoin")
+    def join_ods(self, odsFilename):
+        Logger.info("ODS - Reading file " +  odsFilename)
 
-                # Add info
-                if (_isset(row['Rôles'])):
-                    matchMember.set_role(row['Rôles'])
-                else:
-                    matchMember.set_role("Adhérent")
+        # Index members by name once for all ODS rows
+        self.nameIndex = NameIndex(self.amapMemberArray)
 
-                if (_isset(row['Framacarte'])):
-                    isOnMap = row['Framacarte'].upper() == "OUI"
-                    matchMember.set_on_map(isOnMap)
+        # Both sheets are read at once
+        odsSheets = self.read_ods_sheets(odsFilename)
 
-            # Analyse 1st sheet
-            odsContent = self.open_ods_sheet(self.args["odsFilename"], "ENGAGEMENTS")
+        # Analyse 1st sheet
+        odsContent = odsSheets["COORDONNEES"]
 
-            # Iterate over each lines of the file
-            for index, row in odsContent.iterrows():
-                matchMember = self.find_member_from_row(row, index)
-                if (matchMember == None):
-                    continue
+        # Iterate over each lines of the file
+        for index, row in odsContent.iterrows():
+            matchMember = self.find_member_from_row(row, index)
+            if (matchMember == None):
+                continue
 
-                # Add info
-                if (row['Légumes'] in ("hebdo", "pair", "impair")):
-                    matchMember.set_type_panier(row['Légumes'])
+            # Add info
+            if (_isset(row['Rôles'])):
+                matchMember.set_role(row['Rôles'])
+            else:
+                matchMember.set_role("Adhérent")
+
+            if (_isset(row['Framacarte'])):
+                isOnMap = row['Framacarte'].upper() == "OUI"
+                matchMember.set_on_map(isOnMap)
+                if (not isOnMap):
+                    Logger.count("members.hiddenFromMap")
+
+        # Analyse 2nd sheet
+        odsContent = odsSheets["ENGAGEMENTS"]
+
+        # Iterate over each lines of the file
+        for index, row in odsContent.iterrows():
+            matchMember = self.find_member_from_row(row, index)
+            if (matchMember == None):
+                continue
 
-        # ========================
-        #    COLORS AND SHAPES
-        # ========================
+            # Add info
+            if (row['Légumes'] in ("hebdo", "pair", "impair")):
+                matchMember.set_type_panier(row['Légumes'])
 
-        # Define color and shape for each members
+    # Define color and shape for each members
+    @Logger.Timer("markers")
+    def set_member_markers(self, salleBrama):
         markerShapes = ["star", "triangle", "sun", "circle", "rectangle", "cross"]
         for member in self.amapMemberArray:
             color = "gray"
@@ -334,103 +822,259 @@ class Amaping:
         salleBrama.set_marker("red", "home")
         self.amapMemberArray.insert(0, salleBrama)
 
-        # ========================
-        #           GEOJSON
-        # ========================
+    # Indexes of the members of an output in the member table, the AMAP is always kept
+    def get_output_members(self, output):
+        import numpy
+        memberIndexes = numpy.arange(len(self.memberTable))
+        if (output["basketTypes"] == None):
+            return memberIndexes
+
+        isHome = self.memberTable.is_in("shape", memberIndexes, ["home"])
+        return memberIndexes[isHome | numpy.isin(self.get_member_categories(memberIndexes), output["basketTypes"])]
+
+    def write_umap(self, output, memberIndexes):
+        Logger.info("Generating UMap file...")
+        self.create_umap(output, memberIndexes).write_file(output["filename"])
+
+    # Build the uMap of an output without writing it
+    # Layers only keep member indexes, their markers are built while the file is written
+    @Logger.Timer("umap")
+    def create_umap(self, output, memberIndexes):
+        import numpy
+        table = self.memberTable
+
+        isOnMap = table.isOnMap[memberIndexes]
+        for index in memberIndexes[~isOnMap]:
+            Logger.info("Member {0} don't want to appear on the map".format(table.names[index]))
+        memberIndexes = memberIndexes[isOnMap]
+
+        # One layer per basket type, in order of their first member
+        basketTypes = table.get_strings("typePanier", memberIndexes)
+        collectionNames = numpy.where(basketTypes == "", "Autre", basketTypes)
+        nameList, firstPositions = numpy.unique(collectionNames, return_index=True)
+
+        umapObj = framacarte.UMap("BRAMA", compact=output["compactUmap"])
+        for collectionName in nameList[numpy.argsort(firstPositions)].tolist():
+            markerSource = functools.partial(self.iter_umap_markers, memberIndexes[collectionNames == collectionName])
+            collection = framacarte.Collection(collectionName.capitalize(), markerSource=markerSource)
+
+            # Members are only shown one by one when zoomed in
+            if (output["clusterRadius"] > 0):
+                collection.fromZoom = self.UMAP_DETAIL_ZOOM
+            umapObj.add_collection(collection)
+
+        if (output["clusterRadius"] > 0):
+            for collection in self.create_cluster_collections(memberIndexes, output["clusterRadius"]):
+                umapObj.add_collection(collection)
+
+        return umapObj
+
+    # Give uMap markers of members at indexes, columns are read by batches
+    def iter_umap_markers(self, memberIndexes):
+        table = self.memberTable
+
+        for start in range(0, len(memberIndexes), self.UMAP_BATCH_SIZE):
+            batchIndexes = memberIndexes[start:start + self.UMAP_BATCH_SIZE]
+            markerList = table.get_markers(batchIndexes)
+            basketTypes = table.get_strings("typePanier", batchIndexes).tolist()
+            roles = table.get_strings("role", batchIndexes).tolist()
+
+            for index, marker, basketType, role in zip(batchIndexes, markerList, basketTypes, roles):
+                # Set description
+                description = table.addresses[index]
 
-        if self.args["umap"]:
-            Logger.info("Generating UMap file...")
+                # Add info if we got one
+                phone = table.phones[index]
+                email = table.emails[index]
+                if (basketType != ""):
+                    description += "\nLégumes : " + basketType.capitalize()
+                if (phone != ""):
+                    description += "\nTel. : " + phone
+                if (email != ""):
+                    description += "\nEmail : " + email
+                if (role != "" and role != "Adhérent"):
+                    description += "\nRôle : " + role
+
+                # (name, position, color, shape) then the description
+                yield framacarte.create_marker(*marker, description)
+
+    # Paint PNG outputs, tiles and base layers are shared by all of them
+    # Maps are independent so several ones are painted at the same time
+    def write_png_list(self, outputList):
+        from MapGenerator import BaseLayerCache
+        tileCache = self.open_tile_cache()
+        tileFetcher = self.create_tile_fetcher(tileCache)
+        baseLayers = BaseLayerCache()
 
-            amapBramaCollection = {}
-            for member in self.amapMemberArray:
-                # Set description
-                description = member.get_display_address()
+        try:
+            if (len(outputList) == 1):
+                # Preview is only opened for a map asked on the command line
+                self.write_png(outputList[0], tileFetcher, baseLayers, preview=(self.args["jobFilename"] == ""))
+            else:
+                workerCount = max(1, min(self.args["jobWorkers"], len(outputList)))
+                Logger.info("Painting {0} PNG files with {1} worker(s)...".format(len(outputList), workerCount))
+
+                with ThreadPoolExecutor(workerCount) as pool:
+                    futures = [pool.submit(self.write_png, output, tileFetcher, baseLayers) for output in outputList]
+                    for future in futures:
+                        future.result()
+
+                Logger.info("Base layers: {0} rendered, {1} reused".format(baseLayers.get_render_count(), baseLayers.get_hit_count()))
+        finally:
+            baseLayers.close()
+            tileFetcher.close()
+
+            if (tileCache != None):
+                Logger.info("Tile cache: {0} hit(s), {1} miss(es)".format(tileCache.get_hit_count(), tileCache.get_miss_count()))
+                tileCache.close()
+
+        # Whole run peak, each map gave its own in write_png()
+        peakMemory = Logger.getPeakMemoryMb()
+        if (peakMemory != None):
+            Logger.info("Process peak memory: {0:.0f} MB".format(peakMemory))
+
+    # Serve maps until stopped, members, tiles and base layers stay in memory between requests
+    def serve(self):
+        from MapGenerator import BaseLayerCache
+        tileCache = self.open_tile_cache()
+        tileFetcher = self.create_tile_fetcher(tileCache)
+        baseLayers = BaseLayerCache(maxCount=MapService.BASE_LAYER_COUNT)
+        service = MapService(self, self.args["serveHost"], self.args["servePort"], tileFetcher, baseLayers, maxMapSize=self.args["serveMaxSize"])
 
-                if (member.is_on_map() == False):
-                    Logger.info("Member {0} don't want to appear on the map".format(member.get_display_name()))
-                    continue
+        try:
+            service.serve_forever()
+        finally:
+            service.close()
+            baseLayers.close()
+            tileFetcher.close()
+            if (tileCache != None):
+                tileCache.close()
+
+    def create_tile_fetcher(self, tileCache):
+        return TileFetcher(
+            self.args["tileUrl"],
+            tileCache=tileCache,
+            offline=self.args["offline"],
+            workerCount=self.args["tileWorkers"],
+            hostConcurrency=self.args["tileHostConcurrency"]
+        )
+
+    def write_png(self, output, tileFetcher, baseLayers, preview=False):
+        Logger.info("Generating PNG file {0}...".format(output["filename"]))
+
+        # Maps painted at the same time by other workers are counted too
+        with Logger.MemoryPeak() as memoryPeak:
+            painter = self.paint_png(output, tileFetcher, baseLayers)
+            painter.save(output["filename"])
+
+        if (memoryPeak.peakMb != None):
+            Logger.info("PNG file {0}: peak memory {1:.0f} MB, {2:.0f} MB more than before painting".format(
+                output["filename"],
+                memoryPeak.peakMb,
+                memoryPeak.peakMb - memoryPeak.startMb
+            ))
+
+        if (preview):
+            Logger.info("Openning output file...")
+            painter.show()
+        painter.close()
+
+    # Give the painter of an output with its map and markers, ready to be saved
+    def paint_png(self, output, tileFetcher, baseLayers):
+        from MapGenerator import MapGenerator, fit_map
+        from Painter import Painter
+        from StripPainter import StripPainter   # Paint big maps with bounded memory
+        table = self.memberTable
+        memberIndexes = self.get_output_members(output)
+
+        # Genarate map
+        mapSize = output["mapSize"]
+        center = self.salleBrama.get_map_position()
+        zoomLevel = output["zoomLevel"]
+        if (output["autoFit"]):
+            center, zoomLevel, mapSize = fit_map(
+                table.get_positions(self.get_located_members(memberIndexes)),
+                mapSize,
+                zoomLevel,
+                trimPercent=output["fitTrim"],
+                mustFit=[self.salleBrama.get_map_position()]
+            )
 
-                # Add info if we got one
-                if (member.get_type_panier() != ""):
-                    description += "\nLégumes : " + member.get_type_panier().capitalize()
-                if (member.get_phone() != ""):
-                    description += "\nTel. : " + member.get_phone()
-                if (member.get_email() != ""):
-                    description += "\nEmail : " + member.get_email()
-                if (member.get_role() != "" and member.get_role() != "Adhérent"):
-                    description += "\nRôle : " + member.get_role()
-
-                if (member.get_type_panier() != ""):
-                    collectionName = member.get_type_panier()
-                else:
-                    collectionName = "Autre"
+        mapGen = MapGenerator(
+            center=center,
+            zoomLevel=zoomLevel,
+            mapSize=mapSize,
+            tileFetcher=tileFetcher
+        )
+        Logger.info("Map of {0}x{1} px at zoom {2}: {3} tile(s) to fetch".format(
+            mapSize[0],
+            mapSize[1],
+            zoomLevel,
+            mapGen.get_tile_count()
+        ))
+        # Side bar depends on the asked map size only, a fitted map keeps the same legend pages
+        sideBarWidth = int(output["mapSize"][0] / 3)
+        sideBarHeight = output["mapSize"][1]
+
+        if (output["strips"]):
+            # Tiles are fetched while painting
+            painter = StripPainter(mapGen, sideBarWidth, sideBarHeight=sideBarHeight)
+        else:
+            baseLayers.render(mapGen)
 
-                # Create collection if needed
-                if (not collectionName in amapBramaCollection):
-                    amapBramaCollection[collectionName] = Framacarte.Collection(collectionName.capitalize())
+            # Reopend map with painter and sidebar
+            painter = Painter(mapGen=mapGen)
+            painter.add_side_bar(sideBarWidth, sideBarHeight=sideBarHeight)
 
-                curCollection = amapBramaCollection[collectionName]
+        # Add title
+        painter.add_legend_title("{0} membres de l'AMAP Pétal :".format(len(memberIndexes)))
 
-                # Add the marker
-                curCollection.add_marker(
-                    member.get_display_name(),
-                    member.get_map_position(),
-                    member.get_color(),
-                    member.get_shape(),
-                    description
-                )
+        # Add markers
+        Logger.info("Adding markers...")
+        isShown = table.isOnMap[memberIndexes]
 
-            umapObj = Framacarte.UMap("BRAMA")
-            for curCollection in amapBramaCollection:
-                umapObj.add_collection(amapBramaCollection[curCollection])
-            umapObj.write_file()
+        # Ignore far members, the fitted map is made to show them
+        if (not output["autoFit"]):
+            isShown = isShown & table.isCloseToHome[memberIndexes]
+        markerIndexes = memberIndexes[isShown]
 
-        # ========================
-        #           PNG
-        # ========================
+        # Trimmed members are out of the fitted map, don't list them
+        if (output["autoFit"]):
+            markerIndexes = self.keep_markers_on_map(markerIndexes, mapGen)
+        markerList = table.get_markers(markerIndexes)
 
-        if self.args["png"]:
-            Logger.info("Generating PNG file...")
-
-            # Genarate map
-            mapSize = tuple(map(int, self.args["mapSize"].split('x')))
-            mapGen = MapGenerator(
-                center=salleBrama.get_map_position(),
-                zoomLevel=self.args["zoomLevel"],
-                mapSize=mapSize
-            )
-            mapGen.render()
+        clusterList = None
+        if (output["clusterRadius"] > 0):
+            clusterList = self.get_png_clusters(markerIndexes, markerList, mapGen.zoomLevel, output["clusterRadius"])
+        painter.add_markers(markerList, clusterList)
 
-            # Reopend map with painter and sidebar
-            painter = Painter(mapGen=mapGen)
+        return painter
 
-            sideBarWidth = int(mapSize[0] / 3)
-            painter.add_side_bar(sideBarWidth)
+    def run(self):
+        self.load_members()
 
-            # Add title
-            painter.add_legend_title("{0} membres de l'AMAP Pétal :".format(len(self.amapMemberArray)))
+        # ========================
+        #           GEOJSON
+        # ========================
 
-            # Add markers
-            Logger.info("Adding markers...")
-            for member in self.amapMemberArray:
-                # Ignore far members
-                if (not member.is_close_to_home()):
-                    continue
+        for output in self.outputList:
+            if (output["format"] == "umap"):
+                self.write_umap(output, self.get_output_members(output))
 
-                if (member.is_on_map() == False):
-                    continue
+        # ========================
+        #           PNG
+        # ========================
 
-                painter.add_marker(
-                    member.get_display_name(),
-                    member.get_map_position(),
-                    member.get_color(),
-                    member.get_shape()
-                )
+        pngOutputs = [output for output in self.outputList if output["format"] == "png"]
+        if (len(pngOutputs) > 0):
+            self.write_png_list(pngOutputs)
 
-            Logger.info("Openning output file...")
-            painter.save(self.args["mapFilename"])
-            painter.show()
-            painter.close()
+        # ========================
+        #          SERVICE
+        # ========================
+
+        if (self.args["servePort"] != 0):
+            self.serve()
 
         # ========================
         #           DONE
@@ -438,6 +1082,7 @@ class Amaping:
 
         Logger.info("Work done !")
 
+
 # ========================
 #       ENTRY POINT
 # ========================
@@ -446,20 +1091,39 @@ if __name__ == '__main__':
     # Logging
     Logger.init(APP_NAME)
 
-    # Init global variables
-    geoLocator = Nominatim(user_agent="http")
+    app = None
+    profiler = None
 
     try:
         # Init app
         app = Amaping()
 
+        # Init global variables
+        geoLocator = app.create_geo_locator()
+
         # Configure signal handler
         signal.signal(signal.SIGINT, app.handler_sigint);
 
-        app.run()
+        if (app.args["profileFilename"] != ""):
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        with Logger.Timer("run"):
+            app.run()
     except Exception as e:
         Logger.error("Exit with errors: " + str(e));
         Logger.debug(traceback.format_exc())
+    finally:
+        if (profiler != None):
+            profiler.disable()
+            profiler.dump_stats(app.args["profileFilename"])
+            Logger.info("Profile written to {0}".format(app.args["profileFilename"]))
+
+        # Failed runs are worth measuring too
+        Logger.logTimers()
+        if (app != None) and (app.args["metricsFilename"] != ""):
+            Logger.dumpMetrics(app.args["metricsFilename"])
 
 
 
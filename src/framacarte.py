@@ -4,7 +4,10 @@
 # File    : framacarte.py
 # Date    : Sept. 11th, 2021
 
-import geojson        # To build GeoJSON files, can be imported on FramaCarte
+import os
+import json           # To build GeoJSON files, can be imported on FramaCarte
+import itertools
+import Logger
 
 # FramaCarte won't recognized the shapes used in Amaping so we need to convert them to icons
 # Some icons are made available by FramaCarte
@@ -37,47 +40,101 @@ def convert_icon(shape):
 	# Give the converted icon
 	return baseUrl + markerIcons[index]
 
+# Give a marker of a Collection
+def create_marker(name, pos, color, shape, description = ""):
+	# Use Defaut icon for home point (Salle Brama for exemple)
+	if shape == "home":
+		iconClass = "Default"
+	else:
+		iconClass = "Drop"
+
+	return (name, pos, color, iconClass, convert_icon(shape), description)
+
+# Give a marker of a group of count members, uMap shows the count in the marker
+def create_cluster_marker(pos, count, color, description = ""):
+	return ("{0} membres".format(count), pos, color, "Drop", str(count), description)
+
 # Define a set of markers
-# Each collection will generate a new file
+# Each collection will generate a new layer, shown between fromZoom and toZoom if set
+# markerSource is a function giving more markers (See create_marker()) each time the
+# layer is written: markers are built while the file is written, the layer is never
+# in memory as a whole
 class Collection:
-	def __init__(self, name):
-		self.featuresList = []
+	def __init__(self, name, fromZoom = None, toZoom = None, markerSource = None):
+		self.markerList = []
+		self.markerSource = markerSource
 		self.name = name
+		self.fromZoom = fromZoom
+		self.toZoom = toZoom
 
 	def get_name(self):
 		return self.name
 
 	def add_marker(self, name, pos, color, shape, description = ""):
-		# Use Defaut icon for home point (Salle Brama for exemple)
-		if shape == "home":
-			iconClass = "Default"
-		else:
-			iconClass = "Drop"
-
-		properties = {
-			"name": name,
-			"description": description,
-			"_umap_options": {
-				"color": color,
-				"iconClass": iconClass,
-				"iconUrl": convert_icon(shape)
+		self.markerList.append(create_marker(name, pos, color, shape, description))
+
+	def add_cluster(self, pos, count, color, description = ""):
+		self.markerList.append(create_cluster_marker(pos, count, color, description))
+
+	# Added markers then the ones of markerSource
+	def iter_markers(self):
+		if (self.markerSource == None):
+			return iter(self.markerList)
+		return itertools.chain(self.markerList, self.markerSource())
+
+	# Give GeoJSON features one by one, coordinates are rounded to precision digits
+	def iter_features(self, precision):
+		for name, pos, color, iconClass, iconUrl, description in self.iter_markers():
+			coordinates = []
+			if (pos != None):
+				coordinates = [round(float(coord), precision) for coord in pos]
+
+			yield {
+				"type": "Feature",
+				"geometry": {
+					"type": "Point",
+					"coordinates": coordinates
+				},
+				"properties": {
+					"name": name,
+					"description": description,
+					"_umap_options": {
+						"color": color,
+						"iconClass": iconClass,
+						"iconUrl": iconUrl
+					}
+				}
 			}
+
+	def get_json_obj(self, precision = 6):
+		return {
+			"type": "FeatureCollection",
+			"features": list(self.iter_features(precision))
 		}
 
-		newFeature = geojson.Feature(
-			geometry = geojson.Point(pos),
-			properties = properties
-		)
+class UMap:
+	# Same precision as the geojson module, about 10cm
+	DEFAULT_PRECISION = 6
+	# About 1m, enough to place a house
+	COMPACT_PRECISION = 5
+	INDENT = 2
+
+	# compact mode writes without indentation and with less coordinate digits
+	def __init__(self, name, compact = False, precision = None):
+		self.name = name
+		self.compact = compact
+		self.collectionList = []
 
-		self.featuresList.append(newFeature)
+		if (precision == None):
+			precision = self.COMPACT_PRECISION if compact else self.DEFAULT_PRECISION
+		self.precision = precision
 
-	def get_json_obj(self):
-		collection = geojson.FeatureCollection(self.featuresList)
-		return collection
+		# Same encoder for each feature
+		if (compact):
+			self.encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+		else:
+			self.encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, indent=self.INDENT)
 
-class UMap:
-	def __init__(self, name):
-		self.name = name
 		self.umapContent = {
 		  "type": "umap",
 		  "uri": "",
@@ -108,28 +165,85 @@ class UMap:
 		      -0.5893993377685548,
 		      44.81928998732381
 		    ]
-		  },
-		  "layers": []
+		  }
 		}
 
 	def add_collection(self, collection):
-		layer = collection.get_json_obj()
-		layer["_umap_options"] = {
-	        "displayOnLoad": True,
-	        "browsable": True,
-	        "remoteData": {},
-	        "name": collection.get_name()
-	    }
-		self.umapContent["layers"].append(layer)
-
-	def write_file(self):
-		dump = geojson.dumps(self.umapContent, indent=2)
-		filename = "./output/FramaCarte_" + self.name + ".umap"
-
-		outputFile = open(filename, "w")
-		outputFile.write(dump)
-		outputFile.close()
-
-
-
+		self.collectionList.append(collection)
+
+	def get_layer_options(self, collection):
+		options = {
+			"displayOnLoad": True,
+			"browsable": True,
+			"remoteData": {},
+			"name": collection.get_name()
+		}
 
+		if (collection.fromZoom != None):
+			options["fromZoom"] = collection.fromZoom
+		if (collection.toZoom != None):
+			options["toZoom"] = collection.toZoom
+
+		return options
+
+	# Serialize obj with its first line at the given nesting level
+	def dumps(self, obj, level):
+		text = self.encoder.encode(obj)
+		if (self.compact):
+			return text
+		return text.replace("\n", "\n" + " " * (self.INDENT * level))
+
+	# Text to write at the given nesting level, nothing in compact mode
+	def newline(self, level):
+		if (self.compact):
+			return ""
+		return "\n" + " " * (self.INDENT * level)
+
+	# Stream layers feature by feature, only one feature is in memory at a time
+	def write_to(self, outputFile):
+		space = "" if self.compact else " "
+
+		# Header is the content without the closing brace
+		header = self.dumps(self.umapContent, 0)
+		outputFile.write(header[:-1].rstrip())
+		outputFile.write("," + self.newline(1) + '"layers":' + space + "[")
+
+		for layerIndex, collection in enumerate(self.collectionList):
+			if (layerIndex > 0):
+				outputFile.write(",")
+			outputFile.write(self.newline(2) + "{")
+			outputFile.write(self.newline(3) + '"type":' + space + '"FeatureCollection",')
+			outputFile.write(self.newline(3) + '"features":' + space + "[")
+
+			featureCount = 0
+			for feature in collection.iter_features(self.precision):
+				if (featureCount > 0):
+					outputFile.write(",")
+				outputFile.write(self.newline(4) + self.dumps(feature, 4))
+				featureCount += 1
+
+			if (featureCount > 0):
+				outputFile.write(self.newline(3))
+			outputFile.write("],")
+			outputFile.write(self.newline(3) + '"_umap_options":' + space + self.dumps(self.get_layer_options(collection), 3))
+			outputFile.write(self.newline(2) + "}")
+
+		if (len(self.collectionList) > 0):
+			outputFile.write(self.newline(1))
+		outputFile.write("]" + self.newline(0) + "}")
+
+	# File is written next to its path then renamed, a failed run keeps the previous file
+	@Logger.Timer("write")
+	def write_file(self, filename = None):
+		if (filename == None):
+			filename = "./output/FramaCarte_" + self.name + ".umap"
+		tmpFilename = filename + ".tmp"
+
+		try:
+			with open(tmpFilename, "w", encoding="utf-8") as outputFile:
+				self.write_to(outputFile)
+		except Exception:
+			os.remove(tmpFilename)
+			raise
+
+		os.replace(tmpFilename, filename)
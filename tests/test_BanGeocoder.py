@@ -0,0 +1,99 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Check street matching and house number choice of the BAN geocoder
+# File    : test_BanGeocoder.py
+# Date    : Oct. 18th, 2026
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import Logger
+from BanGeocoder import BanGeocoder, build_index
+
+# (numero, rep, nom_voie, code_postal, nom_commune), positions are made from the number
+BAN_ROWS = [
+    (2, "", "Rue des Lilas", 33400, "Talence"),
+    (4, "", "Rue des Lilas", 33400, "Talence"),
+    (6, "", "Rue des Lilas", 33400, "Talence"),
+    (8, "", "Rue des Lilas", 33400, "Talence"),
+    (12, "", "Rue des Lilas", 33400, "Talence"),
+    (12, "bis", "Rue des Lilas", 33400, "Talence"),
+    (20, "", "Rue des Lilas", 33400, "Talence"),
+    (1, "", "Avenue Jean Jaurès", 33400, "Talence"),
+    (1, "", "Rue des Acacias", 33600, "Pessac")
+]
+
+# Position of a number of the Talence streets, the rep moves it a bit
+def get_position(number, rep=""):
+    return (-0.5 + number / 1000 + (0.0001 if (rep != "") else 0), 44.8)
+
+class TestBanGeocoder(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        Logger.init("test")
+        cls.tmpDir = tempfile.TemporaryDirectory()
+        csvPath = os.path.join(cls.tmpDir.name, "adresses-33.csv")
+        with open(csvPath, "w", encoding="utf-8") as csvFile:
+            csvFile.write("numero;rep;nom_voie;code_postal;nom_commune;lon;lat\n")
+            for number, rep, street, postalCode, city in BAN_ROWS:
+                lon, lat = get_position(number, rep)
+                csvFile.write("{0};{1};{2};{3};{4};{5};{6}\n".format(number, rep, street, postalCode, city, lon, lat))
+
+        cls.indexDir = os.path.join(cls.tmpDir.name, "ban")
+        build_index(csvPath, cls.indexDir)
+        cls.geocoder = BanGeocoder(cls.indexDir)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.geocoder = None
+        cls.tmpDir.cleanup()
+
+    def assertLocation(self, location, position, score):
+        self.assertNotEqual(location, None)
+        self.assertAlmostEqual(location.longitude, position[0])
+        self.assertAlmostEqual(location.latitude, position[1])
+        self.assertAlmostEqual(location.score, score)
+
+    def test_exact_address(self):
+        self.assertLocation(self.geocoder.geocode("12 rue des Lilas, Talence, 33400"), get_position(12), 1.0)
+
+    def test_abbreviation_and_accents(self):
+        location = self.geocoder.geocode("1 av. jean jaures, TALENCE, 33400")
+        self.assertLocation(location, get_position(1), 1.0)
+        self.assertEqual(location.address, "1 Avenue Jean Jaurès, 33400 Talence")
+
+    def test_misspelled_street(self):
+        location = self.geocoder.geocode("12 rue des Lilias, Talence, 33400")
+        self.assertEqual(location.address, "12 Rue des Lilas, 33400 Talence")
+        self.assertLess(location.score, 1.0)
+
+    def test_rep(self):
+        self.assertLocation(self.geocoder.geocode("12 bis rue des Lilas, Talence, 33400"), get_position(12, "bis"), 1.0)
+        self.assertLocation(self.geocoder.geocode("12 ter rue des Lilas, Talence, 33400"), get_position(12), BanGeocoder.OTHER_REP_FACTOR)
+
+    def test_close_number(self):
+        self.assertLocation(self.geocoder.geocode("10 rue des Lilas, Talence, 33400"), get_position(8), BanGeocoder.NEAREST_NUMBER_FACTOR)
+
+    # Closest number is 20, too far: middle of the street with the score of an address without number
+    def test_far_number_gives_street_middle(self):
+        self.assertLocation(self.geocoder.geocode("240 rue des Lilas, Talence, 33400"), get_position(8), BanGeocoder.NO_NUMBER_FACTOR)
+        self.assertLocation(self.geocoder.geocode("rue des Lilas, Talence, 33400"), get_position(8), BanGeocoder.NO_NUMBER_FACTOR)
+
+    def test_street_of_another_town(self):
+        self.assertEqual(self.geocoder.geocode("1 rue des Acacias, Talence, 33400"), None)
+        self.assertLess(self.geocoder.search("1 rue des Acacias, Talence, 33400").score, BanGeocoder.DEFAULT_MIN_SCORE)
+
+    def test_unknown_street(self):
+        self.assertEqual(self.geocoder.geocode("3 impasse Zola, Talence, 33400"), None)
+
+    def test_missing_index(self):
+        with self.assertRaises(RuntimeError):
+            BanGeocoder(os.path.join(self.tmpDir.name, "none"))
+
+if __name__ == '__main__':
+    unittest.main()
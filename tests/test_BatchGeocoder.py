@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Check the upload and the answer parsing of the batch geocoder
+# File    : test_BatchGeocoder.py
+# Date    : Oct. 18th, 2026
+
+import os
+import sys
+import io
+import csv
+import threading
+import unittest
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import Logger
+from BatchGeocoder import BatchGeocoder
+
+# Answers every upload with the CSV of the server, keeps the uploaded bodies
+class CsvHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        self.server.uploads.append(self.rfile.read(int(self.headers["Content-Length"])))
+        body = self.server.answer.encode("utf-8")
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestBatchGeocoder(unittest.TestCase):
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    # Postal codes with a space are not canonical, they are sent empty
+    ADDRESS_LIST = [
+        "12 rue des Lilas, Talence, 33 400",
+        "1 avenue Jean Jaurès, Talence, 33400",
+        "3 impasse Zola, Pessac, 33600",
+        "nowhere",
+        "5 rue du Port, Bègles, 33130"
+    ]
+
+    # Answer rows: good, under the score, not found, failed, good with an empty status, unknown id
+    ANSWER = (
+        "\ufeffid,street,city,postcode,latitude,longitude,result_score,result_status\r\n"
+        "0,12 rue des Lilas,Talence,33400,44.8,-0.59,0.97,ok\r\n"
+        "1,1 avenue Jean Jaurès,Talence,33400,44.81,-0.58,0.31,ok\r\n"
+        "2,3 impasse Zola,Pessac,33600,,,,not-found\r\n"
+        "3,nowhere,,,44.9,-0.6,0.9,error\r\n"
+        "4,5 rue du Port,Bègles,33130,44.79,-0.55,0.5,\r\n"
+        "9,out of the list,,,44.0,-0.1,0.99,ok\r\n"
+    )
+
+    # =============
+    # Members
+    # =============
+
+    def setUp(self):
+        Logger.init("test")
+        self.server = HTTPServer(("127.0.0.1", 0), CsvHandler)
+        self.server.uploads = []
+        self.server.answer = self.ANSWER
+        self.server.status = 200
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.geocoder = BatchGeocoder(url="http://127.0.0.1:{0}/search/csv/".format(self.server.server_port))
+
+    def test_build_csv(self):
+        rows = list(csv.reader(io.StringIO(self.geocoder.build_csv(self.ADDRESS_LIST).decode("utf-8"))))
+        self.assertEqual(rows[0], ["id", "street", "city", "postcode"])
+        self.assertEqual(rows[1], ["0", "12 rue des Lilas", "Talence", ""])
+        self.assertEqual(rows[2], ["1", "1 avenue Jean Jaurès", "Talence", "33400"])
+        self.assertEqual(rows[4], ["3", "nowhere", "", ""])
+        self.assertEqual(len(rows), len(self.ADDRESS_LIST) + 1)
+
+    def test_get_chunks(self):
+        geocoder = BatchGeocoder(chunkSize=2)
+        self.assertEqual(geocoder.get_chunks(self.ADDRESS_LIST), [self.ADDRESS_LIST[0:2], self.ADDRESS_LIST[2:4], self.ADDRESS_LIST[4:5]])
+        self.assertEqual(geocoder.get_chunks([]), [])
+        self.assertEqual(BatchGeocoder(chunkSize=0).chunkSize, 1)
+
+    # Only rows with an ok status and a score of at least minScore are kept
+    def test_score_and_status_filtering(self):
+        positions = self.geocoder.geocode_batch(self.ADDRESS_LIST)
+        self.assertEqual(positions, {
+            "12 rue des Lilas, Talence, 33 400": (-0.59, 44.8),
+            "5 rue du Port, Bègles, 33130": (-0.55, 44.79)
+        })
+        self.assertEqual(len(self.server.uploads), 1)
+        self.assertIn("12 rue des Lilas".encode("utf-8"), self.server.uploads[0])
+
+    def test_min_score(self):
+        self.geocoder.minScore = 0.3
+        self.assertIn("1 avenue Jean Jaurès, Talence, 33400", self.geocoder.geocode_batch(self.ADDRESS_LIST))
+
+        self.geocoder.minScore = 0.98
+        self.assertEqual(self.geocoder.geocode_batch(self.ADDRESS_LIST), {})
+
+    def test_failed_upload(self):
+        self.server.status = 503
+        with self.assertRaises(Exception):
+            self.geocoder.geocode_batch(self.ADDRESS_LIST)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Check the grouping of close markers by zoom level
+# File    : test_Cluster.py
+# Date    : Oct. 18th, 2026
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import Logger
+from Cluster import ClusterIndex
+
+class TestClusterIndex(unittest.TestCase):
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    # Three members in the same street of Talence, one in Bordeaux, one in Paris
+    LONS = [-0.58000, -0.58001, -0.58002, -0.57000, 2.35000]
+    LATS = [44.80000, 44.80001, 44.80000, 44.84000, 48.85000]
+    CATEGORIES = ["Legumes", "Legumes", "Fruits", "Fruits", "Legumes"]
+
+    PARIS_BBOX = (2.0, 48.5, 2.7, 49.1)
+    TALENCE_BBOX = (-0.6, 44.79, -0.56, 44.81)
+
+    # =============
+    # Members
+    # =============
+
+    def setUp(self):
+        Logger.init("test")
+        self.index = ClusterIndex(self.LONS, self.LATS, self.CATEGORIES)
+
+    def assertClustersCoverPoints(self, clusterList):
+        self.assertEqual(sum(cluster[2] for cluster in clusterList), len(self.LONS))
+        for lon, lat, count, breakdown, pointIndex in clusterList:
+            self.assertEqual(sum(breakdown.values()), count)
+            self.assertEqual(pointIndex == None, count > 1)
+
+    # Above the max zoom, each point is alone and keeps its position and category
+    def test_points_alone_above_max_zoom(self):
+        clusterList = self.index.get_clusters(ClusterIndex.DEFAULT_MAX_ZOOM + 1)
+        self.assertEqual(len(clusterList), len(self.LONS))
+        self.assertClustersCoverPoints(clusterList)
+
+        for lon, lat, count, breakdown, pointIndex in clusterList:
+            self.assertAlmostEqual(lon, self.LONS[pointIndex])
+            self.assertAlmostEqual(lat, self.LATS[pointIndex])
+            self.assertEqual(breakdown, {self.CATEGORIES[pointIndex]: 1})
+
+    def test_close_points_merged(self):
+        clusterList = self.index.get_clusters(12)
+        self.assertEqual(len(clusterList), 3)
+        self.assertClustersCoverPoints(clusterList)
+
+        groupList = [cluster for cluster in clusterList if cluster[2] > 1]
+        self.assertEqual(len(groupList), 1)
+        lon, lat, count, breakdown, pointIndex = groupList[0]
+        self.assertEqual(count, 3)
+        self.assertEqual(breakdown, {"Legumes": 2, "Fruits": 1})
+        self.assertAlmostEqual(lon, sum(self.LONS[0:3]) / 3, places=6)
+        self.assertAlmostEqual(lat, sum(self.LATS[0:3]) / 3, places=6)
+
+        singleIndexes = sorted(cluster[4] for cluster in clusterList if cluster[2] == 1)
+        self.assertEqual(singleIndexes, [3, 4])
+
+    # Lower zooms never have more clusters and always count every point
+    def test_levels_nested(self):
+        previousCount = len(self.LONS)
+        for zoom in range(ClusterIndex.DEFAULT_MAX_ZOOM, ClusterIndex.DEFAULT_MIN_ZOOM - 1, -1):
+            clusterList = self.index.get_clusters(zoom)
+            self.assertClustersCoverPoints(clusterList)
+            self.assertLessEqual(len(clusterList), previousCount)
+            previousCount = len(clusterList)
+
+        # Bordeaux and Paris are in the same cell of the whole world
+        self.assertEqual(len(self.index.get_clusters(0)), 1)
+
+    def test_zoom_bounded(self):
+        self.assertEqual(self.index.get_clusters(-3), self.index.get_clusters(ClusterIndex.DEFAULT_MIN_ZOOM))
+        self.assertEqual(self.index.get_clusters(40), self.index.get_clusters(ClusterIndex.DEFAULT_MAX_ZOOM + 1))
+
+    def test_bbox(self):
+        for zoom in (6, 12, ClusterIndex.DEFAULT_MAX_ZOOM + 1):
+            clusterList = self.index.get_clusters(zoom, self.PARIS_BBOX)
+            self.assertEqual([cluster[4] for cluster in clusterList], [4])
+
+        clusterList = self.index.get_clusters(12, self.TALENCE_BBOX)
+        self.assertEqual([cluster[2] for cluster in clusterList], [3])
+
+        self.assertEqual(self.index.get_clusters(12, (10.0, 10.0, 11.0, 11.0)), [])
+
+    # Clusters of a box are the clusters of the whole world that are in it
+    def test_bbox_matches_whole_world(self):
+        west, south, east, north = self.TALENCE_BBOX
+        for zoom in range(ClusterIndex.DEFAULT_MIN_ZOOM, ClusterIndex.DEFAULT_MAX_ZOOM + 2):
+            expectedList = [cluster for cluster in self.index.get_clusters(zoom) if (west <= cluster[0] <= east) and (south <= cluster[1] <= north)]
+            self.assertEqual(self.index.get_clusters(zoom, self.TALENCE_BBOX), expectedList)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Check the persistent geocode cache and its eviction
+# File    : test_GeocodeCache.py
+# Date    : Oct. 18th, 2026
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import Logger
+from GeocodeCache import GeocodeCache, normalize_address
+
+class TestGeocodeCache(unittest.TestCase):
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    ADDRESS = "12 Av. de l'Église, Talence, 33400"
+    COORDS = (-0.5792, 44.8378)
+    DAY_S = 24 * 3600
+
+    # =============
+    # Members
+    # =============
+
+    def setUp(self):
+        Logger.init("test")
+        tmpDir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpDir.cleanup)
+        self.path = os.path.join(tmpDir.name, "geocode.sqlite")
+        self.cache = GeocodeCache(self.path, maxEntries=2)
+        self.addCleanup(self.cache.db.close)
+
+    # Move the stored and last used times of an address back in time
+    def age(self, address, days):
+        with self.cache.lock:
+            self.cache.db.execute(
+                "UPDATE geocode SET timestamp = timestamp - ?, lastUsed = lastUsed - ? WHERE address = ?",
+                (days * self.DAY_S, days * self.DAY_S, normalize_address(address))
+            )
+            self.cache.db.commit()
+
+    def get_last_used(self, address):
+        return self.cache.db.execute("SELECT lastUsed FROM geocode WHERE address = ?", (normalize_address(address),)).fetchone()[0]
+
+    def test_hit_and_miss(self):
+        self.assertEqual(self.cache.get(self.ADDRESS), (False, None))
+        self.cache.put(self.ADDRESS, self.COORDS)
+        self.assertEqual(self.cache.get(self.ADDRESS), (True, self.COORDS))
+        self.assertEqual((self.cache.get_hit_count(), self.cache.get_miss_count()), (1, 1))
+
+    def test_same_address_written_differently(self):
+        self.cache.put(self.ADDRESS, self.COORDS)
+        self.assertEqual(self.cache.get("12 avenue de l'eglise,  TALENCE, 33400"), (True, self.COORDS))
+
+    def test_unknown_address_is_a_hit(self):
+        self.cache.put(self.ADDRESS, None)
+        self.assertEqual(self.cache.get(self.ADDRESS), (True, None))
+
+    def test_unknown_address_expires_sooner(self):
+        self.cache.put(self.ADDRESS, None)
+        self.cache.put("1 rue des Lilas, Talence, 33400", self.COORDS)
+        self.age(self.ADDRESS, GeocodeCache.DEFAULT_NEGATIVE_TTL_DAYS + 1)
+        self.age("1 rue des Lilas, Talence, 33400", GeocodeCache.DEFAULT_NEGATIVE_TTL_DAYS + 1)
+
+        self.assertEqual(self.cache.get(self.ADDRESS), (False, None))
+        self.assertEqual(self.cache.get("1 rue des Lilas, Talence, 33400"), (True, self.COORDS))
+
+    def test_hits_are_written_in_batch(self):
+        self.cache.put(self.ADDRESS, self.COORDS)
+        self.age(self.ADDRESS, 1)
+        lastUsed = self.get_last_used(self.ADDRESS)
+
+        self.cache.get(self.ADDRESS)
+        self.assertEqual(self.get_last_used(self.ADDRESS), lastUsed)
+
+        self.cache.evict()
+        self.assertGreater(self.get_last_used(self.ADDRESS), lastUsed)
+
+    def test_evict_keeps_recently_used(self):
+        addressList = ["{0} rue des Lilas, Talence, 33400".format(number) for number in (1, 2, 3)]
+        for days, address in zip((3, 2, 1), addressList):
+            self.cache.put(address, self.COORDS)
+            self.age(address, days)
+
+        # Oldest one is used again, the one of 2 days ago is the least recently used
+        self.cache.get(addressList[0])
+        self.cache.evict()
+
+        self.assertEqual(self.cache.get(addressList[0]), (True, self.COORDS))
+        self.assertEqual(self.cache.get(addressList[1]), (False, None))
+        self.assertEqual(self.cache.get(addressList[2]), (True, self.COORDS))
+
+    def test_evict_removes_expired(self):
+        self.cache.put(self.ADDRESS, self.COORDS)
+        self.age(self.ADDRESS, GeocodeCache.DEFAULT_TTL_DAYS + 1)
+        self.cache.evict()
+        self.assertEqual(self.cache.db.execute("SELECT COUNT(*) FROM geocode").fetchone()[0], 0)
+
+    def test_survives_reopening(self):
+        self.cache.put(self.ADDRESS, self.COORDS)
+        otherCache = GeocodeCache(self.path)
+        self.addCleanup(otherCache.db.close)
+        self.assertEqual(otherCache.get(self.ADDRESS), (True, self.COORDS))
+
+if __name__ == '__main__':
+    unittest.main()
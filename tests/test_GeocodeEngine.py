@@ -0,0 +1,116 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Check the rate limit and retries of the geocoding engine
+# File    : test_GeocodeEngine.py
+# Date    : Oct. 18th, 2026
+
+import os
+import sys
+import time
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import Logger
+from GeocodeEngine import GeocodeEngine, TokenBucket
+
+class FakeLocation:
+
+    def __init__(self, longitude, latitude):
+        self.longitude = longitude
+        self.latitude = latitude
+
+# Answers from a dict, fails failCount times first, remembers request times
+class FakeGeocoder:
+
+    def __init__(self, locations, failCount=0):
+        self.locations = locations
+        self.failCount = failCount
+        self.requestTimes = []
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def geocode(self, address):
+        with self.lock:
+            self.requestTimes.append(time.monotonic())
+            self.queries.append(address)
+            if (self.failCount > 0):
+                self.failCount -= 1
+                raise TimeoutError("timed out")
+
+        coords = self.locations.get(address)
+        if (coords == None):
+            return None
+        return FakeLocation(*coords)
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_rate_shared_by_threads(self):
+        rate = 50
+        bucket = TokenBucket(rate)
+        startTime = time.monotonic()
+
+        threadList = [threading.Thread(target=lambda: [bucket.acquire() for i in range(5)]) for i in range(4)]
+        for thread in threadList:
+            thread.start()
+        for thread in threadList:
+            thread.join()
+
+        # First token is there at once, the 19 others come at the rate
+        self.assertGreaterEqual(time.monotonic() - startTime, 19 / rate * 0.95)
+
+class TestGeocodeEngine(unittest.TestCase):
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    RATE = 40
+
+    # =============
+    # Members
+    # =============
+
+    def setUp(self):
+        Logger.init("test")
+
+    def test_requests_follow_the_rate(self):
+        locations = {"{0} rue des Lilas, Talence, 33400".format(i): (-0.5, 44.8) for i in range(12)}
+        geocoder = FakeGeocoder(locations)
+        engine = GeocodeEngine(geocoder, workerCount=4, rate=self.RATE)
+
+        positions = engine.resolve(list(locations))
+        self.assertEqual(positions, locations)
+
+        # Never more than one request each 1 / rate seconds on average
+        requestTimes = sorted(geocoder.requestTimes)
+        self.assertGreaterEqual(requestTimes[-1] - requestTimes[0], (len(requestTimes) - 1) / self.RATE * 0.95)
+
+    def test_same_address_asked_once(self):
+        geocoder = FakeGeocoder({"1 Av. des Lilas, Talence, 33400": (-0.5, 44.8)})
+        engine = GeocodeEngine(geocoder, rate=self.RATE)
+
+        addressList = ["1 Av. des Lilas, Talence, 33400", "1 avenue des lilas, TALENCE, 33400", "1 Av. des Lilas, Talence, 33400"]
+        positions = engine.resolve(addressList)
+
+        self.assertEqual(geocoder.queries, ["1 Av. des Lilas, Talence, 33400"])
+        self.assertEqual(set(positions.values()), {(-0.5, 44.8)})
+        self.assertEqual(engine.get_saved_count(), 2)
+
+    def test_timeouts_are_retried(self):
+        geocoder = FakeGeocoder({"1 rue des Lilas, Talence, 33400": (-0.5, 44.8)}, failCount=2)
+        engine = GeocodeEngine(geocoder, rate=self.RATE, retryCount=2, backoff=0.01)
+
+        self.assertEqual(engine.resolve(["1 rue des Lilas, Talence, 33400"]), {"1 rue des Lilas, Talence, 33400": (-0.5, 44.8)})
+        self.assertEqual((engine.get_request_count(), engine.get_fail_count()), (3, 0))
+
+    def test_failure_after_retries(self):
+        geocoder = FakeGeocoder({}, failCount=5)
+        engine = GeocodeEngine(geocoder, rate=self.RATE, retryCount=1, backoff=0.01)
+
+        self.assertEqual(engine.resolve(["1 rue des Lilas, Talence, 33400"]), {"1 rue des Lilas, Talence, 33400": None})
+        self.assertEqual((engine.get_request_count(), engine.get_fail_count()), (2, 1))
+
+if __name__ == '__main__':
+    unittest.main()
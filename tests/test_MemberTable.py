@@ -0,0 +1,60 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Check that rows of a MemberTable read like the members they come from
+# File    : test_MemberTable.py
+# Date    : Oct. 18th, 2026
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from AmapMember import AmapMember
+from MemberTable import MemberTable
+
+# Getters a MemberView must answer like AmapMember
+GETTERS = [
+    "get_display_name", "get_address", "get_display_address", "get_map_position", "get_color", "get_shape",
+    "get_phone", "get_email", "get_type_panier", "get_role", "is_on_map", "is_close_to_home"
+]
+
+def create_member(name, firstname, address, coords, color, shape, typePanier, role, isOnMap, isCloseToHome):
+    member = AmapMember()
+    member.add_people(name, firstname)
+    member.set_address(address)
+    member.set_city("Talence")
+    member.set_postal_code(33400.0)
+    member.set_map_position(coords)
+    member.set_marker(color, shape)
+    member.set_phone("0601020304")
+    member.set_email(firstname.lower() + "@example.org")
+    member.set_type_panier(typePanier)
+    member.set_role(role)
+    member.set_on_map(isOnMap)
+    member.set_close_to_home(isCloseToHome)
+    return member
+
+class TestMemberView(unittest.TestCase):
+
+    def setUp(self):
+        self.memberList = [
+            create_member("Martin", "Jean", "12 rue des Lilas", (-0.6, 44.8), "red", "circle", "Grand", "", True, False),
+            create_member("Lefèvre", "Anaïs", "3 allée des Pins", None, "blue", "star", "Petit", "Bureau", False, True),
+            create_member("Durand", "Paul", "", (-0.5, 44.9), "red", "triangle", "", "Bureau", True, True)
+        ]
+        self.memberTable = MemberTable(self.memberList)
+
+    def test_getters(self):
+        for index, member in enumerate(self.memberList):
+            view = self.memberTable.get_view(index)
+            for getter in GETTERS:
+                with self.subTest(index=index, getter=getter):
+                    self.assertEqual(getattr(view, getter)(), getattr(member, getter)())
+
+    def test_views_order(self):
+        views = self.memberTable.get_views([2, 0])
+        self.assertEqual([view.get_display_name() for view in views], ["DURAND Paul", "MARTIN Jean"])
+
+if __name__ == '__main__':
+    unittest.main()
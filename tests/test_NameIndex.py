@@ -0,0 +1,50 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Check how ODS names are matched to members
+# File    : test_NameIndex.py
+# Date    : Oct. 18th, 2026
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from NameIndex import NameIndex
+
+# Only what NameIndex reads from AmapMember
+class FakeMember:
+
+    def __init__(self, people):
+        self.people = people
+
+    def get_people(self):
+        return self.people
+
+class TestNameIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.single = FakeMember([("Martin", "Jean")])
+        self.couple = FakeMember([("Martin", "Jean"), ("Martin", "Marie")])
+        self.mixed = FakeMember([("Durand", "Paul"), ("Petit", "Anne")])
+        self.compound = FakeMember([("Durand-Petit", "Lou")])
+        self.nameIndex = NameIndex([self.single, self.couple, self.mixed, self.compound])
+
+    def test_single_name(self):
+        self.assertEqual(self.nameIndex.find_candidates("MARTIN"), [self.single, self.couple])
+
+    def test_couple_sharing_surname(self):
+        self.assertEqual(self.nameIndex.find_candidates("Martin", "MARTIN"), [self.couple])
+
+    def test_couple_before_compound_name(self):
+        couple = FakeMember([("Durand-Roux", "Paul"), ("Petit-Roux", "Anne")])
+        nameIndex = NameIndex([self.compound, couple])
+        self.assertEqual(nameIndex.find_candidates("Durand", "Petit"), [couple])
+
+    def test_same_person_when_no_couple(self):
+        nameIndex = NameIndex([self.compound])
+        self.assertEqual(nameIndex.find_candidates("Petit", "Durand"), [self.compound])
+        self.assertEqual(nameIndex.find_candidates("Petit", "Martin"), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Check the side bar of PNG outputs
+# File    : test_Painter.py
+# Date    : Oct. 18th, 2026
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PIL import Image
+from PIL import ImageFont
+import Logger
+from MapGenerator import MapGenerator
+from Painter import Painter
+from StripPainter import StripPainter
+
+truetype = ImageFont.truetype
+
+# Arial.ttf is not shipped with the sources, use the PIL font at the same size
+def load_font(font, size, *args, **kwargs):
+    if (font == "Arial.ttf"):
+        return ImageFont.load_default(size)
+    return truetype(font, size, *args, **kwargs)
+
+class TestSideBar(unittest.TestCase):
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    CENTER = (-0.5792, 44.8378)
+    ASKED_SIZE = (1500, 1500)
+    FITTED_SIZE = (521, 529)                     # What fit_map() gave for 500 members
+    MEMBER_COUNT = 500
+
+    # =============
+    # Members
+    # =============
+
+    def setUp(self):
+        Logger.init("test")
+        patcher = mock.patch.object(ImageFont, "truetype", load_font)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.markerList = [
+            ("MEMBER{0} Prénom, CONJ{0} Prénom".format(i), self.CENTER, "#FF0000", "circle")
+            for i in range(0, self.MEMBER_COUNT)
+        ]
+
+    # Same side bar as amaping.paint_png() for a map of mapSize
+    def get_legend_page_count(self, mapSize):
+        mapGen = MapGenerator(center=self.CENTER, zoomLevel=13, mapSize=mapSize)
+        mapGen.image = Image.new("RGB", mapSize, 0xFFFFFF)
+
+        painter = Painter(mapGen=mapGen)
+        painter.add_side_bar(int(self.ASKED_SIZE[0] / 3), sideBarHeight=self.ASKED_SIZE[1])
+        painter.add_markers(self.markerList)
+        pageCount = painter.get_legend_page_count()
+        painter.close()
+
+        return pageCount
+
+    def get_strip_legend_page_count(self, mapSize):
+        mapGen = MapGenerator(center=self.CENTER, zoomLevel=13, mapSize=mapSize)
+        painter = StripPainter(mapGen, int(self.ASKED_SIZE[0] / 3), sideBarHeight=self.ASKED_SIZE[1])
+
+        legend = painter.create_legend()
+        legend.layout([marker[0] for marker in self.markerList])
+        return legend.pageCount
+
+    def test_fit_keeps_legend_pages(self):
+        self.assertEqual(self.get_legend_page_count(self.FITTED_SIZE), self.get_legend_page_count(self.ASKED_SIZE))
+
+    def test_fit_keeps_strip_legend_pages(self):
+        self.assertEqual(self.get_strip_legend_page_count(self.FITTED_SIZE), self.get_strip_legend_page_count(self.ASKED_SIZE))
+
+    def test_side_bar_extends_fitted_map(self):
+        mapGen = MapGenerator(center=self.CENTER, zoomLevel=13, mapSize=self.FITTED_SIZE)
+        mapGen.image = Image.new("RGB", self.FITTED_SIZE, 0x000000)
+
+        painter = Painter(mapGen=mapGen)
+        painter.add_side_bar(500, sideBarHeight=self.ASKED_SIZE[1])
+        self.assertEqual(painter.img.size, (self.FITTED_SIZE[0] + 500, self.ASKED_SIZE[1]))
+        painter.close()
+
+if __name__ == "__main__":
+    unittest.main()
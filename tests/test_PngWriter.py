@@ -0,0 +1,93 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Check that PNG files streamed by strips read back as written
+# File    : test_PngWriter.py
+# Date    : Oct. 18th, 2026
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import Logger
+from StripPainter import PngWriter
+
+class TestPngWriter(unittest.TestCase):
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    WIDTH = 301
+    STRIP_HEIGHTS = [64, 1, 100, 35]
+
+    # =============
+    # Members
+    # =============
+
+    def setUp(self):
+        Logger.init("test")
+        tmpDir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpDir.cleanup)
+        self.path = os.path.join(tmpDir.name, "map.png")
+
+        # Noise and flat areas, so filtered bytes wrap around both ways
+        random = numpy.random.default_rng(12)
+        self.pixels = random.integers(0, 256, (sum(self.STRIP_HEIGHTS), self.WIDTH, 3), dtype=numpy.uint8)
+        self.pixels[20:80, 50:200] = (255, 255, 255)
+        self.pixels[120:130, :] = (0, 0, 0)
+
+    def write_strips(self, writer):
+        top = 0
+        for height in self.STRIP_HEIGHTS:
+            writer.write_image(Image.fromarray(self.pixels[top:top + height], "RGB"))
+            top += height
+
+    def read_back(self):
+        with Image.open(self.path) as img:
+            self.assertEqual(img.mode, "RGB")
+            self.assertEqual(img.size, (self.WIDTH, len(self.pixels)))
+            return numpy.asarray(img)
+
+    def test_round_trip(self):
+        writer = PngWriter(self.path, self.WIDTH, len(self.pixels))
+        self.write_strips(writer)
+        writer.close()
+
+        numpy.testing.assert_array_equal(self.read_back(), self.pixels)
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+    # Data is split in many IDAT chunks
+    def test_round_trip_small_chunks(self):
+        writer = PngWriter(self.path, self.WIDTH, len(self.pixels))
+        writer.CHUNK_SIZE = 1000
+        self.write_strips(writer)
+        writer.close()
+
+        numpy.testing.assert_array_equal(self.read_back(), self.pixels)
+
+    def test_bad_strip_width(self):
+        writer = PngWriter(self.path, self.WIDTH, len(self.pixels))
+        self.addCleanup(writer.file.close)
+        with self.assertRaises(RuntimeError):
+            writer.write_image(Image.new("RGB", (self.WIDTH - 1, 10)))
+        with self.assertRaises(RuntimeError):
+            writer.write_image(Image.new("RGB", (self.WIDTH, len(self.pixels) + 1)))
+
+    # A file missing rows is never written
+    def test_missing_rows(self):
+        writer = PngWriter(self.path, self.WIDTH, len(self.pixels))
+        writer.write_image(Image.fromarray(self.pixels[:10], "RGB"))
+        with self.assertRaises(RuntimeError):
+            writer.close()
+
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+if __name__ == '__main__':
+    unittest.main()
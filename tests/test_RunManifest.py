@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Check that unchanged CSV rows are reused from the previous run
+# File    : test_RunManifest.py
+# Date    : Oct. 18th, 2026
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import Logger
+from RunManifest import RunManifest
+
+class TestRunManifest(unittest.TestCase):
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    SETTINGS = ("home", 5)
+
+    # =============
+    # Members
+    # =============
+
+    def setUp(self):
+        Logger.init("test")
+        tmpDir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpDir.cleanup)
+        self.path = os.path.join(tmpDir.name, "manifest.obj")
+
+        # Previous run: two rows done, one failed
+        manifest = RunManifest(self.path, self.SETTINGS)
+        for rowKey in ("1", "2", "3"):
+            self.assertEqual(manifest.get(rowKey, "hash" + rowKey), None)
+        manifest.set("1", "hash1", ["member1", []])
+        manifest.set("2", "hash2", ["member2", []])
+        manifest.set("3", "hash3", ["member3", []], failed=True)
+        manifest.save()
+
+    def get_counts(self, manifest):
+        return (manifest.unchangedCount, manifest.addedCount, manifest.modifiedCount, manifest.retriedCount)
+
+    def test_unchanged_row_is_reused(self):
+        manifest = RunManifest(self.path, self.SETTINGS)
+        self.assertEqual(manifest.get("1", "hash1"), ["member1", []])
+        self.assertEqual(self.get_counts(manifest), (1, 0, 0, 0))
+
+    def test_changed_and_new_rows_are_processed(self):
+        manifest = RunManifest(self.path, self.SETTINGS)
+        self.assertEqual(manifest.get("2", "otherHash"), None)
+        self.assertEqual(manifest.get("4", "hash4"), None)
+        self.assertEqual(self.get_counts(manifest), (0, 1, 1, 0))
+
+    def test_failed_row_is_retried(self):
+        manifest = RunManifest(self.path, self.SETTINGS)
+        self.assertEqual(manifest.get("3", "hash3"), None)
+        self.assertEqual(self.get_counts(manifest), (0, 0, 0, 1))
+
+    def test_duplicated_and_missing_ids_are_processed(self):
+        manifest = RunManifest(self.path, self.SETTINGS)
+        self.assertEqual(manifest.get("1", "hash1"), ["member1", []])
+        self.assertEqual(manifest.get("1", "hash1"), None)
+        self.assertEqual(manifest.get(None, "hash"), None)
+
+    def test_other_settings_process_everything(self):
+        manifest = RunManifest(self.path, ("otherHome", 5))
+        self.assertEqual(manifest.get("1", "hash1"), None)
+
+    def test_removed_rows_are_forgotten(self):
+        manifest = RunManifest(self.path, self.SETTINGS)
+        manifest.get("1", "hash1")
+        manifest.save()
+
+        manifest = RunManifest(self.path, self.SETTINGS)
+        self.assertEqual(manifest.get("2", "hash2"), None)
+        self.assertEqual(manifest.get("1", "hash1"), ["member1", []])
+
+    def test_unreadable_file_is_ignored(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a pickle")
+
+        manifest = RunManifest(self.path, self.SETTINGS)
+        self.assertEqual(manifest.get("1", "hash1"), None)
+        self.assertEqual(self.get_counts(manifest), (0, 1, 0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Check the persistent tile cache and its eviction
+# File    : test_TileCache.py
+# Date    : Oct. 18th, 2026
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import Logger
+from SqliteCache import SqliteCache
+from TileCache import TileCache
+
+class TestTileCache(unittest.TestCase):
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    TEMPLATE = "http://127.0.0.1/{z}/{x}/{y}.png"
+    TILE_SIZE = 400 * 1024                       # 3 tiles don't fit in 1 MB
+    DAY_S = 24 * 3600
+
+    # =============
+    # Members
+    # =============
+
+    def setUp(self):
+        Logger.init("test")
+        tmpDir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpDir.cleanup)
+        self.tmpDir = tmpDir.name
+        self.cache = TileCache(os.path.join(self.tmpDir, "tiles.sqlite"), maxSizeMb=1)
+        self.addCleanup(self.cache.db.close)
+
+    # Move the stored and last used times of a tile back in time
+    def age(self, x, days):
+        with self.cache.lock:
+            self.cache.db.execute(
+                "UPDATE tile SET timestamp = timestamp - ?, lastUsed = lastUsed - ? WHERE x = ?",
+                (days * self.DAY_S, days * self.DAY_S, x)
+            )
+            self.cache.db.commit()
+
+    def test_put_and_get(self):
+        self.assertEqual(self.cache.get(self.TEMPLATE, 13, 1, 2), None)
+        self.cache.put(self.TEMPLATE, 13, 1, 2, b"png", etag="abc")
+
+        tile = self.cache.get(self.TEMPLATE, 13, 1, 2)
+        self.assertEqual((tile["data"], tile["etag"], tile["isFresh"]), (b"png", "abc", True))
+        self.assertTrue(self.cache.contains(self.TEMPLATE, 13, 1, 2))
+        self.assertFalse(self.cache.contains(self.TEMPLATE, 13, 2, 1))
+
+    def test_old_tile_is_revalidated(self):
+        self.cache.put(self.TEMPLATE, 13, 1, 2, b"png")
+        self.age(1, TileCache.DEFAULT_MAX_AGE_DAYS + 1)
+        self.assertFalse(self.cache.get(self.TEMPLATE, 13, 1, 2)["isFresh"])
+
+        self.cache.revalidate(self.TEMPLATE, 13, 1, 2)
+        self.assertTrue(self.cache.get(self.TEMPLATE, 13, 1, 2)["isFresh"])
+
+    def test_evict_least_recently_used(self):
+        for x, days in ((1, 3), (2, 2), (3, 1)):
+            self.cache.put(self.TEMPLATE, 13, x, 0, bytes(self.TILE_SIZE))
+            self.age(x, days)
+
+        # Oldest tile is used again, the one of 2 days ago goes
+        self.cache.get(self.TEMPLATE, 13, 1, 0)
+        self.cache.evict()
+
+        self.assertEqual([self.cache.contains(self.TEMPLATE, 13, x, 0) for x in (1, 2, 3)], [True, False, True])
+
+    def test_evict_under_max_size(self):
+        self.cache.put(self.TEMPLATE, 13, 1, 0, bytes(self.TILE_SIZE))
+        self.cache.evict()
+        self.assertTrue(self.cache.contains(self.TEMPLATE, 13, 1, 0))
+
+    def test_base_cache_keeps_everything(self):
+        cache = SqliteCache(os.path.join(self.tmpDir, "base.sqlite"), ["CREATE TABLE item (key TEXT PRIMARY KEY, lastUsed REAL)"])
+        cache.LAST_USED_QUERY = "UPDATE item SET lastUsed = ? WHERE key = ?"
+        cache.db.execute("INSERT INTO item VALUES ('a', 0)")
+
+        with cache.lock:
+            cache.touch(("a",), 12.0)
+        cache.close()
+
+        cache = SqliteCache(os.path.join(self.tmpDir, "base.sqlite"), [])
+        self.assertEqual(cache.db.execute("SELECT key, lastUsed FROM item").fetchall(), [("a", 12.0)])
+        cache.db.close()
+
+if __name__ == '__main__':
+    unittest.main()
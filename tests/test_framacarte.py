@@ -0,0 +1,150 @@
+#!/usr/bin/python
+# Author  : David DEVANT
+# Desc    : Check the streamed uMap file against the geojson document it replaces
+# File    : test_framacarte.py
+# Date    : Oct. 18th, 2026
+
+import os
+import sys
+import io
+import json
+import unittest
+
+import geojson
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import Logger
+import framacarte
+
+class TestUMap(unittest.TestCase):
+
+    # =============
+    # CONSTANTS
+    # =============
+
+    # (name, pos, color, shape, description)
+    MARKERS = {
+        "Légumes": [
+            ("Salle Brama", (-0.5893993377685548, 44.81928998732381), "red", "home", ""),
+            ("Zoé Müller", (-0.581234567, 44.801234567), "green", "circle", "Tél: 06 00 00 00 00\nzoe@example.com"),
+            ("Jean \"JJ\" Dupont", (-0.57, 44.84), "blue", "star", "")
+        ],
+        "Œufs": [
+            ("Anne", (2.3522219, 48.856614), "#ff8800", "unknown", "<b>Rôle</b>")
+        ],
+        "Vide": []
+    }
+
+    # =============
+    # Members
+    # =============
+
+    def setUp(self):
+        Logger.init("test")
+
+    # Document written by the geojson module before the file was streamed
+    def get_geojson_dump(self, name, precision):
+        umapContent = framacarte.UMap(name).umapContent
+        umapContent["layers"] = []
+        for collectionName, markerList in self.MARKERS.items():
+            featureList = []
+            for markerName, pos, color, shape, description in markerList:
+                properties = {
+                    "name": markerName,
+                    "description": description,
+                    "_umap_options": {
+                        "color": color,
+                        "iconClass": "Default" if (shape == "home") else "Drop",
+                        "iconUrl": framacarte.convert_icon(shape)
+                    }
+                }
+                featureList.append(geojson.Feature(geometry=geojson.Point(pos, precision=precision), properties=properties))
+
+            layer = geojson.FeatureCollection(featureList)
+            layer["_umap_options"] = {
+                "displayOnLoad": True,
+                "browsable": True,
+                "remoteData": {},
+                "name": collectionName
+            }
+            umapContent["layers"].append(layer)
+
+        return geojson.dumps(umapContent, indent=2, ensure_ascii=False)
+
+    def create_umap(self, compact):
+        umap = framacarte.UMap("Test", compact=compact)
+        for collectionName, markerList in self.MARKERS.items():
+            collection = framacarte.Collection(collectionName)
+            for marker in markerList:
+                collection.add_marker(*marker)
+            umap.add_collection(collection)
+        return umap
+
+    def write(self, umap):
+        outputFile = io.StringIO()
+        umap.write_to(outputFile)
+        return outputFile.getvalue()
+
+    # Indented file is the same text as before
+    def test_indented_same_as_geojson(self):
+        text = self.write(self.create_umap(False))
+        self.assertEqual(text, self.get_geojson_dump("Test", framacarte.UMap.DEFAULT_PRECISION))
+
+    # Compact file has the same content with less digits and no spaces
+    def test_compact_same_content(self):
+        text = self.write(self.create_umap(True))
+        document = json.loads(text)
+        self.assertEqual(document, json.loads(self.get_geojson_dump("Test", framacarte.UMap.COMPACT_PRECISION)))
+        self.assertEqual(text, json.dumps(document, ensure_ascii=False, separators=(",", ":")))
+
+    def test_no_layer(self):
+        for compact in (False, True):
+            umap = framacarte.UMap("Test", compact=compact)
+            document = json.loads(self.write(umap))
+            self.assertEqual(document["layers"], [])
+            self.assertEqual(document["properties"]["name"], "Test")
+
+    def test_layer_zooms(self):
+        umap = framacarte.UMap("Test")
+        umap.add_collection(framacarte.Collection("Groupes", fromZoom=3, toZoom=12))
+        umap.add_collection(framacarte.Collection("Membres", fromZoom=13))
+        layerList = json.loads(self.write(umap))["layers"]
+        self.assertEqual((layerList[0]["_umap_options"]["fromZoom"], layerList[0]["_umap_options"]["toZoom"]), (3, 12))
+        self.assertEqual(layerList[1]["_umap_options"]["fromZoom"], 13)
+        self.assertNotIn("toZoom", layerList[1]["_umap_options"])
+
+    # Markers of a source are built each time the file is written, after the added ones
+    def test_marker_source(self):
+        callList = []
+
+        def iter_markers():
+            callList.append(len(callList))
+            for name, pos, color, shape, description in self.MARKERS["Légumes"][1:]:
+                yield framacarte.create_marker(name, pos, color, shape, description)
+
+        collection = framacarte.Collection("Légumes", markerSource=iter_markers)
+        collection.add_marker(*self.MARKERS["Légumes"][0])
+        umap = framacarte.UMap("Test")
+        umap.add_collection(collection)
+        for collectionName in ("Œufs", "Vide"):
+            otherCollection = framacarte.Collection(collectionName)
+            for marker in self.MARKERS[collectionName]:
+                otherCollection.add_marker(*marker)
+            umap.add_collection(otherCollection)
+        self.assertEqual(callList, [])
+
+        expected = self.get_geojson_dump("Test", framacarte.UMap.DEFAULT_PRECISION)
+        self.assertEqual(self.write(umap), expected)
+        self.assertEqual(self.write(umap), expected)
+        self.assertEqual(callList, [0, 1])
+
+    def test_cluster_marker(self):
+        collection = framacarte.Collection("Groupes")
+        collection.add_cluster((-0.58, 44.8), 12, "purple")
+        feature = collection.get_json_obj()["features"][0]
+        self.assertEqual(feature["properties"]["name"], "12 membres")
+        self.assertEqual(feature["properties"]["_umap_options"]["iconUrl"], "12")
+
+if __name__ == '__main__':
+    unittest.main()